@@ -0,0 +1,185 @@
+"""Admission control for the write routes (virtual waiting room).
+
+``AdmissionGate`` lets at most ``max_inflight`` write requests run at once in
+this process.  Anyone else takes a numbered ticket and joins a FIFO queue;
+the request waits up to ``wait`` seconds in-process for its turn and is
+otherwise answered with a waiting page that carries the ticket, so the
+browser can come back for the same place in line instead of starting over.
+A free slot goes to the lowest ticket that is actually waiting, so a holder
+who is between retries does not stall the line, and is first again when it
+comes back.
+Tickets whose holder does not return within ``ticket_ttl`` are dropped, and
+arrivals beyond ``max_queue`` are shed with ``QueueFull`` (503).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from markupsafe import escape
+
+
+class QueueFull(Exception):
+    """The waiting room is full; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('admission queue is full')
+        self.retry_after = retry_after
+
+
+class Admission:
+    __slots__ = ('admitted', 'ticket', 'position', 'retry_after', 'started')
+
+    def __init__(self, admitted, ticket=None, position=0, retry_after=0, started=None):
+        self.admitted = admitted
+        self.ticket = ticket
+        self.position = position
+        self.retry_after = retry_after
+        self.started = started
+
+
+class AdmissionGate:
+    def __init__(self, max_inflight=8, max_queue=500, wait=2.0, ticket_ttl=30.0, max_retry_after=10):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.wait = wait
+        self.ticket_ttl = ticket_ttl
+        self.max_retry_after = max_retry_after
+        self._cond = threading.Condition()
+        self._queue = OrderedDict()  # ticket -> [issued_at, last_seen]
+        self._waiting = set()        # tickets whose holder is blocked in admit()
+        self._next_ticket = 1
+        self._inflight = 0
+        self._service_time = 0.05    # moving average of an admitted request, seconds
+        self._stats = {
+            'admitted': 0,
+            'admitted_immediately': 0,
+            'queued': 0,
+            'waiting_pages': 0,
+            'rejected': 0,
+            'abandoned': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _expire(self, now):
+        stale = [t for t, (_, seen) in self._queue.items()
+                 if now - seen > self.ticket_ttl and t not in self._waiting]
+        for ticket in stale:
+            del self._queue[ticket]
+        if stale:
+            self._stats['abandoned'] += len(stale)
+            self._cond.notify_all()
+
+    def _retry_after(self, position):
+        estimate = math.ceil(position * self._service_time / max(self.max_inflight, 1))
+        return max(1, min(self.max_retry_after, estimate))
+
+    def _position(self, ticket):
+        for position, queued in enumerate(self._queue, 1):
+            if queued == ticket:
+                return position
+        return 0
+
+    def _can_enter(self, ticket):
+        return self._inflight < self.max_inflight and ticket == min(self._waiting)
+
+    def admit(self, ticket=None):
+        """Admit the caller or hand back its place in line.
+
+        ``ticket`` is the number from an earlier waiting page, if any; an
+        unknown or expired ticket joins the back of the queue.  Raises
+        ``QueueFull`` when there is no room left to wait.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._expire(now)
+            if ticket in self._queue:
+                self._queue[ticket][1] = now
+            elif not self._queue and self._inflight < self.max_inflight:
+                self._inflight += 1
+                self._stats['admitted'] += 1
+                self._stats['admitted_immediately'] += 1
+                return Admission(True, started=now)
+            elif len(self._queue) >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise QueueFull(self._retry_after(len(self._queue)))
+            else:
+                ticket = self._next_ticket
+                self._next_ticket += 1
+                self._queue[ticket] = [now, now]
+                self._stats['queued'] += 1
+
+            deadline = now + self.wait
+            self._waiting.add(ticket)
+            try:
+                while not self._can_enter(ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(min(remaining, 1.0))
+                    self._expire(time.monotonic())
+                admitted = self._can_enter(ticket)
+            finally:
+                self._waiting.discard(ticket)
+            now = time.monotonic()
+            if admitted:
+                issued = self._queue.pop(ticket, [now])[0]
+                self._inflight += 1
+                waited = now - issued
+                self._stats['admitted'] += 1
+                self._stats['wait_time_total'] += waited
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+                self._cond.notify_all()  # the next ticket may be able to go too
+                return Admission(True, ticket, started=now)
+            self._queue.setdefault(ticket, [now, now])[1] = now
+            position = self._position(ticket)
+            self._stats['waiting_pages'] += 1
+            return Admission(False, ticket, position, self._retry_after(position))
+
+    def release(self, admission):
+        with self._cond:
+            self._inflight -= 1
+            elapsed = time.monotonic() - admission.started
+            self._service_time = 0.9 * self._service_time + 0.1 * elapsed
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            self._expire(time.monotonic())
+            data = dict(self._stats)
+            waited = data['admitted'] - data['admitted_immediately']
+            data.update({
+                'inflight': self._inflight,
+                'max_inflight': self.max_inflight,
+                'queue_depth': len(self._queue),
+                'max_queue': self.max_queue,
+                'service_time_avg': self._service_time,
+                'wait_time_avg': data['wait_time_total'] / waited if waited else 0.0,
+            })
+        return data
+
+
+_WAITING_PAGE = """<!doctype html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Please wait</title></head>
+<body>
+<h1>You are in line</h1>
+<p>Lots of people are signing up right now. Your place in line: <strong>{position}</strong>.</p>
+<p>This page will try again in {retry_after} seconds; please keep it open.</p>
+<form method="post" action="{action}">
+{fields}
+<noscript><button type="submit">Try again</button></noscript>
+</form>
+<script>setTimeout(function () {{ document.forms[0].submit(); }}, {delay});</script>
+</body>
+</html>
+"""
+
+
+def waiting_page(action, fields, position, retry_after):
+    """HTML that resubmits ``fields`` (the original form plus the ticket token) to ``action``."""
+    inputs = '\n'.join('<input type="hidden" name="%s" value="%s">' % (escape(name), escape(value))
+                       for name, value in fields)
+    return _WAITING_PAGE.format(position=position, retry_after=retry_after, action=escape(action),
+                                fields=inputs, delay=int(retry_after * 1000))
@@ -0,0 +1,233 @@
+"""Admin analytics summaries.
+
+``CollegeSummary``, ``DailyRegistrations`` and ``HallSummary`` (migration
+0010) hold running totals per college, per registration day and per hall;
+per-event totals are the ``EventCounter`` rows from counters.py.  The
+registration, booking and user-deletion paths update them inside their own
+transaction, so ``summary`` reads a few rows per college, day, hall and
+event however many registrations there are.  ``rebuild`` recomputes all of
+them from the base tables (``flask db refresh-analytics``), for bulk loads
+or as a periodic safety net.
+"""
+import datetime
+
+_REGISTER_DAY = """
+    INSERT INTO DailyRegistrations (day, registrations) VALUES (?, 1)
+    ON CONFLICT (day) DO UPDATE SET registrations = DailyRegistrations.registrations + 1
+"""
+_REGISTER_COLLEGE = """
+    INSERT INTO CollegeSummary (college_name, registrations)
+    SELECT college_name, 1 FROM ExternalParticipant WHERE email = ?
+    ON CONFLICT (college_name) DO UPDATE SET registrations = CollegeSummary.registrations + 1
+"""
+_JOIN_COLLEGE = """
+    INSERT INTO CollegeSummary (college_name, participants) VALUES (?, 1)
+    ON CONFLICT (college_name) DO UPDATE SET participants = CollegeSummary.participants + 1
+"""
+_BOOK_HALL = """
+    INSERT INTO HallSummary (name, bookings, revenue) VALUES (?, 1, ?)
+    ON CONFLICT (name) DO UPDATE SET
+        bookings = HallSummary.bookings + 1,
+        revenue = HallSummary.revenue + excluded.revenue
+"""
+_BOOK_COLLEGE = """
+    INSERT INTO CollegeSummary (college_name, bookings, revenue)
+    SELECT college_name, 1, ? FROM ExternalParticipant WHERE email = ?
+    ON CONFLICT (college_name) DO UPDATE SET
+        bookings = CollegeSummary.bookings + 1,
+        revenue = CollegeSummary.revenue + excluded.revenue
+"""
+
+# {targets} names a table or WITH query of (email, role) rows about to be
+# deleted; these run before their registrations and bookings go, one grouped
+# UPDATE per summary.
+_FORGET_DAYS = """
+    UPDATE DailyRegistrations SET registrations = DailyRegistrations.registrations - gone.registrations
+    FROM (SELECT DATE(er.registered_at) AS day, COUNT(*) AS registrations
+          FROM {targets} t
+          CROSS JOIN EventRegistration er
+          WHERE er.student_email = t.email AND er.registered_at IS NOT NULL
+          GROUP BY DATE(er.registered_at)) AS gone
+    WHERE DailyRegistrations.day = gone.day
+"""
+_FORGET_COLLEGES = """
+    UPDATE CollegeSummary SET
+        participants = CollegeSummary.participants - gone.participants,
+        registrations = CollegeSummary.registrations - gone.registrations,
+        bookings = CollegeSummary.bookings - gone.bookings,
+        revenue = CollegeSummary.revenue - gone.revenue
+    FROM (SELECT ep.college_name,
+                 COUNT(*) AS participants,
+                 COALESCE(SUM((SELECT COUNT(*) FROM EventRegistration er WHERE er.student_email = ep.email)), 0)
+                     AS registrations,
+                 COALESCE(SUM((SELECT COUNT(*) FROM Accomadation a WHERE a.email = ep.email)), 0) AS bookings,
+                 COALESCE(SUM((SELECT COALESCE(SUM(a.price), 0) FROM Accomadation a WHERE a.email = ep.email)), 0)
+                     AS revenue
+          FROM ExternalParticipant ep
+          JOIN {targets} t ON t.email = ep.email
+          WHERE t.role = 'EXTERNAL'
+          GROUP BY ep.college_name) AS gone
+    WHERE CollegeSummary.college_name = gone.college_name
+"""
+_FORGET_HALLS = """
+    UPDATE HallSummary SET
+        bookings = HallSummary.bookings - gone.bookings,
+        revenue = HallSummary.revenue - gone.revenue
+    FROM (SELECT a.name_hall, COUNT(*) AS bookings, COALESCE(SUM(a.price), 0) AS revenue
+          FROM {targets} t
+          CROSS JOIN Accomadation a
+          WHERE a.email = t.email
+          GROUP BY a.name_hall) AS gone
+    WHERE HallSummary.name = gone.name_hall
+"""
+# Bookings removed on their own (the hall audit's orphaned bookings).
+_UNBOOK_HALL = """
+    UPDATE HallSummary SET bookings = bookings - 1, revenue = revenue - ? WHERE name = ?
+"""
+_UNBOOK_COLLEGE = """
+    UPDATE CollegeSummary SET bookings = bookings - 1, revenue = revenue - ?
+    WHERE college_name = (SELECT college_name FROM ExternalParticipant WHERE email = ?)
+"""
+
+# Rows that dropped to zero go, as a rebuild would not have them.
+_PRUNE = (
+    "DELETE FROM CollegeSummary WHERE participants = 0",
+    "DELETE FROM DailyRegistrations WHERE registrations = 0",
+    "DELETE FROM HallSummary WHERE bookings = 0",
+)
+
+_REBUILD = (
+    "DELETE FROM CollegeSummary",
+    """
+    INSERT INTO CollegeSummary (college_name, participants, registrations, bookings, revenue)
+    SELECT ep.college_name,
+           COUNT(*),
+           COALESCE(SUM((SELECT COUNT(*) FROM EventRegistration er WHERE er.student_email = ep.email)), 0),
+           COALESCE(SUM((SELECT COUNT(*) FROM Accomadation a WHERE a.email = ep.email)), 0),
+           COALESCE(SUM((SELECT COALESCE(SUM(a.price), 0) FROM Accomadation a WHERE a.email = ep.email)), 0)
+    FROM ExternalParticipant ep
+    GROUP BY ep.college_name
+    """,
+    "DELETE FROM DailyRegistrations",
+    """
+    INSERT INTO DailyRegistrations (day, registrations)
+    SELECT DATE(registered_at), COUNT(*)
+    FROM EventRegistration
+    WHERE registered_at IS NOT NULL
+    GROUP BY DATE(registered_at)
+    """,
+    "DELETE FROM HallSummary",
+    """
+    INSERT INTO HallSummary (name, bookings, revenue)
+    SELECT a.name_hall, COUNT(*), COALESCE(SUM(a.price), 0)
+    FROM Accomadation a
+    JOIN Hall h ON h.name = a.name_hall
+    GROUP BY a.name_hall
+    """,
+)
+
+# The analytics page reads only these (summary tables, one row per entity).
+_TOP_EVENTS = """
+    SELECT event, registrations, student_registrations, external_registrations, volunteers, capacity
+    FROM EventCounter
+    ORDER BY registrations DESC, event
+    LIMIT ?
+"""
+_TOTALS = """
+    SELECT COUNT(*) AS events,
+           COALESCE(SUM(registrations), 0) AS registrations,
+           COALESCE(SUM(student_registrations), 0) AS student_registrations,
+           COALESCE(SUM(external_registrations), 0) AS external_registrations,
+           COALESCE(SUM(volunteers), 0) AS volunteers
+    FROM EventCounter
+"""
+_COLLEGES = """
+    SELECT college_name, participants, registrations, bookings, revenue
+    FROM CollegeSummary
+    ORDER BY registrations DESC, college_name
+    LIMIT ?
+"""
+_DAYS = "SELECT day, registrations FROM DailyRegistrations ORDER BY day"
+_HALLS = """
+    SELECT h.name, h.capacity, h.vacancy, COALESCE(hs.bookings, 0) AS bookings, COALESCE(hs.revenue, 0) AS revenue
+    FROM Hall h
+    LEFT JOIN HallSummary hs ON hs.name = h.name
+    ORDER BY h.name
+"""
+
+
+def record_registration(cursor, email, role, when=None):
+    when = when or datetime.datetime.now()
+    cursor.execute(_REGISTER_DAY, (when.date().isoformat(),))
+    if role == 'EXTERNAL':
+        cursor.execute(_REGISTER_COLLEGE, (email,))
+
+
+def record_participant(cursor, college_name):
+    cursor.execute(_JOIN_COLLEGE, (college_name,))
+
+
+def record_booking(cursor, email, hall, price):
+    cursor.execute(_BOOK_HALL, (hall, price or 0))
+    cursor.execute(_BOOK_COLLEGE, (price or 0, email))
+
+
+def forget_bookings(cursor, bookings):
+    """Take deleted ``(email, hall, price)`` bookings out of the hall and college summaries."""
+    if bookings:
+        cursor.executemany(_UNBOOK_HALL, [(price or 0, hall) for _, hall, price in bookings])
+        cursor.executemany(_UNBOOK_COLLEGE, [(price or 0, email) for email, _, price in bookings])
+        cursor.execute(_PRUNE[2])
+
+
+def forget_users_sql(targets):
+    return tuple(sql.format(targets=targets) for sql in (_FORGET_DAYS, _FORGET_COLLEGES, _FORGET_HALLS))
+
+
+def forget_users(cursor, targets, prefix='', params=()):
+    """Subtract everything the users in ``targets`` contributed, before their rows are deleted.
+
+    ``prefix`` is a ``WITH`` clause defining ``targets``, bound with ``params``.
+    """
+    for sql in forget_users_sql(targets):
+        cursor.execute(prefix + sql, params)
+    for sql in _PRUNE:
+        cursor.execute(sql)
+
+
+def rebuild(db):
+    """Recompute every summary table from the base tables in one transaction."""
+    cursor = db.cursor()
+    try:
+        for sql in _REBUILD:
+            cursor.execute(sql)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _day(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def summary(cursor, top=20):
+    """Everything the analytics page shows, read from the summary tables."""
+    cursor.execute(_TOTALS)
+    totals = dict(cursor.fetchone())
+    cursor.execute(_TOP_EVENTS, (top,))
+    events = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(_COLLEGES, (top,))
+    colleges = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(_DAYS)
+    days = [{'day': _day(row['day']), 'registrations': row['registrations']} for row in cursor.fetchall()]
+    cursor.execute(_HALLS)
+    halls = []
+    for row in cursor.fetchall():
+        hall = dict(row)
+        beds = hall['capacity'] if hall['capacity'] is not None else hall['bookings'] + max(hall['vacancy'] or 0, 0)
+        hall['occupancy'] = round(100.0 * hall['bookings'] / beds, 1) if beds else 0.0
+        halls.append(hall)
+    totals['bookings'] = sum(h['bookings'] for h in halls)
+    totals['revenue'] = sum(h['revenue'] for h in halls)
+    return {'totals': totals, 'events': events, 'colleges': colleges, 'days': days, 'halls': halls}
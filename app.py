@@ -1,10 +1,12 @@
 import os
-from datetime import date
-from flask import Flask, request, session, redirect, url_for, render_template, flash
+from datetime import date, datetime
+import click
+from flask import Flask, request, session, redirect, url_for, render_template, flash, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_mail import Mail, Message
+from flask_mail import Mail
 from werkzeug.security import generate_password_hash, check_password_hash
 from config import Config
+from outbox import OutboxSender
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -80,6 +82,27 @@ class Accommodation(db.Model):
     price = db.Column(db.Integer)
 
 
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    __table_args__ = (db.Index('ix_email_outbox_due', 'sent_at', 'next_attempt_at'),)
+
+
+outbox_sender = OutboxSender(app, db, EmailOutbox, mail,
+                             batch_size=app.config['OUTBOX_BATCH_SIZE'],
+                             poll_interval=app.config['OUTBOX_POLL_INTERVAL'],
+                             max_attempts=app.config['OUTBOX_MAX_ATTEMPTS'],
+                             backoff_base=app.config['OUTBOX_BACKOFF_BASE'])
+
+
 @app.route('/')
 def homepage():
     events = Event.query.order_by(Event.date).all()
@@ -121,8 +144,8 @@ def student_registration():
         hashed = generate_password_hash(password)
         db.session.add(CustomUser(email=email, password=hashed, role='STUDENT'))
         db.session.add(Student(email=email, name=name, roll_number=roll_number))
-        db.session.commit()
         send_email(email, 'Welcome to CFMS', 'You have registered as Student.')
+        db.session.commit()
         flash('Student registered successfully! Please login.', 'success')
         return redirect(url_for('login'))
     return render_template('register_student.html', error='')
@@ -143,8 +166,8 @@ def external_registration():
         hashed = generate_password_hash(password)
         db.session.add(CustomUser(email=email, password=hashed, role='EXTERNAL'))
         db.session.add(ExternalParticipant(email=email, name=name, college_name=college_name))
-        db.session.commit()
         send_email(email, 'Welcome to CFMS', 'You have registered as External Participant.')
+        db.session.commit()
         flash('External participant registered successfully! Please login.', 'success')
         return redirect(url_for('login'))
     return render_template('register_external.html', error='')
@@ -164,8 +187,8 @@ def organiser_registration():
         hashed = generate_password_hash(password)
         db.session.add(CustomUser(email=email, password=hashed, role='ORGANIZER'))
         # organiser row auto-created by Postgres trigger (init.sql)
-        db.session.commit()
         send_email(email, 'Welcome to CFMS', 'You have registered as Organizer.')
+        db.session.commit()
         flash('Organizer registered successfully! Please login.', 'success')
         return redirect(url_for('login'))
     return render_template('register_organiser.html', error='')
@@ -197,8 +220,8 @@ def event_registration():
     exists = EventRegistration.query.filter_by(event_id=event_id, student_email=email).first()
     if not exists:
         db.session.add(EventRegistration(event_id=event_id, student_email=email))
-        db.session.commit()
         send_email(email, 'Event Registration', 'Registered for event.')
+        db.session.commit()
         flash('Registered successfully for the event!', 'success')
     else:
         flash('Already registered for this event.', 'warning')
@@ -218,85 +241,253 @@ def book_accommodation():
     ep = ExternalParticipant.query.get(email)
     db.session.add(Accommodation(participant_name=ep.name, email=email, hall_id=hall_id, price=hall.price))
     hall.vacancy -= 1
-    db.session.commit()
     send_email(email, 'Accommodation Booked', f'Hall: {hall.name}')
+    db.session.commit()
     flash('Accommodation booked', 'success')
     return redirect(url_for('dashboard'))
 
 
 def send_email(recipient, subject, body):
+    """Queue an email in the current session; it is sent after the caller commits."""
+    db.session.add(EmailOutbox(recipient=recipient, subject=subject, body=body))
+
+
+@app.route('/admin/outbox/')
+def outbox_stats():
+    if session.get('user_role') != 'ADMIN':
+        return redirect(url_for('login'))
+    return jsonify(outbox_sender.stats())
+
+
+@click.command('outbox-worker')
+def outbox_worker_command():
+    """Send queued emails until interrupted; run one next to the web workers."""
+    # `app` is rebound further down; the sender keeps the app it was built with.
+    with outbox_sender.app.app_context():
+        db.create_all()
+    click.echo('Draining the email outbox every %gs (Ctrl+C to stop).' % outbox_sender.poll_interval)
     try:
-        if not app.config.get('MAIL_USERNAME'):
-            print(f'[EMAIL-DEV] To: {recipient} | {subject} | {body}')
-            return
-        msg = Message(subject=subject, recipients=[recipient], body=body)
-        mail.send(msg)
-    except Exception as e:
-        print('Email send failed:', e)
+        outbox_sender.run()
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        outbox_sender.start()
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', '8000')), debug=True)
 import os
 import datetime
 import sqlite3
 import re
-from flask import Flask, request, session, redirect, url_for, render_template, flash, g
+import hashlib
+import hmac
+import functools
+import time
+import click
+from flask import (Flask, request, session, redirect, url_for, render_template, flash, g, jsonify, make_response,
+                   stream_with_context)
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from itsdangerous import URLSafeSerializer, BadSignature
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_batch
 except Exception:  # psycopg2 is optional
     psycopg2 = None
     RealDictCursor = None
+    execute_batch = None
+from db_pool import ConnectionPool, PoolTimeout, ThreadLocalConnections
+from cache import EventCatalog
+from page_cache import PageCache, DataVersions
+from booking import book_hall, BookingError
+from winners import compute_winners
+from bulk_import import ParticipantImporter
+from bulk_delete import delete_users
+from hall_audit import HallAuditor
+from passwords import PasswordHasher, HasherBusy
+from roster import RosterService
+from pagination import page_args, fetch_page, paginate_sorted
+from exports import EXPORTS, FORMATS, stream_export
+from vacancy_feed import VacancyFeed, FeedFull
+from admission import AdmissionGate, QueueFull, waiting_page
+import migrate
+import analytics
+import counters
+import hall_audit
+import sqlite_profile
+import statements
+import instrumentation
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 STATIC_DIR = os.path.join(os.path.dirname(BASE_DIR), 'dbms', 'project', 'myapp', 'static')
-DATABASE = os.path.join(BASE_DIR, 'cfms.db')
+DATABASE = os.getenv('SQLITE_PATH', os.path.join(BASE_DIR, 'cfms.db'))
 DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{DATABASE}')
 IS_POSTGRES = DATABASE_URL.startswith('postgres')
+DB_DIALECT = 'postgres' if IS_POSTGRES else 'sqlite'
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', '30'))
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'production')
+PG_PREPARE_THRESHOLD = int(os.getenv('PG_PREPARE_THRESHOLD', '0'))
+PG_PREPARED_MAX = int(os.getenv('PG_PREPARED_MAX', '100'))
+EVENT_CACHE_TTL = float(os.getenv('EVENT_CACHE_TTL', '60'))
+ROSTER_CACHE_TTL = float(os.getenv('ROSTER_CACHE_TTL', '30'))
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '10'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+VACANCY_RESYNC_SECONDS = float(os.getenv('VACANCY_RESYNC_SECONDS', '30'))
+VACANCY_STREAM_HEARTBEAT = float(os.getenv('VACANCY_STREAM_HEARTBEAT', '15'))
+VACANCY_STREAM_MAX = int(os.getenv('VACANCY_STREAM_MAX', '5000'))
+ADMISSION_MAX_INFLIGHT = int(os.getenv('ADMISSION_MAX_INFLIGHT', '8'))
+ADMISSION_QUEUE = int(os.getenv('ADMISSION_QUEUE', '500'))
+ADMISSION_WAIT = float(os.getenv('ADMISSION_WAIT', '2'))
+ADMISSION_TICKET_TTL = float(os.getenv('ADMISSION_TICKET_TTL', '30'))
+ANALYTICS_TOP = int(os.getenv('ANALYTICS_TOP', '20'))
+HALL_AUDIT_INTERVAL = float(os.getenv('HALL_AUDIT_INTERVAL', '0'))
+HALL_AUDIT_REPAIR = os.getenv('HALL_AUDIT_REPAIR', '0') == '1'
+OUTBOX_AUTOSTART = os.getenv('OUTBOX_AUTOSTART', '0') == '1'
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', '5000'))
+PAGE_CACHE_TTL = float(os.getenv('PAGE_CACHE_TTL', '30'))
+JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR', '')
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '64'))
 
 app = Flask(__name__, template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+db_cli = AppGroup('db', help='Database schema and maintenance commands.')
+if JINJA_BYTECODE_CACHE_DIR:
+    # Compiled templates survive restarts and are shared by the workers.
+    os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+
+# Shared by every dashboard; anything that writes Event rows must call
+# event_catalog.invalidate() after committing.
+event_catalog = EventCatalog(ttl=EVENT_CACHE_TTL)
+
+# Per-event participants/volunteers/organisers; registration, volunteer and
+# delete paths invalidate it.
+roster_service = RosterService(ttl=ROSTER_CACHE_TTL)
+
+password_hasher = PasswordHasher(method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                                 max_queue=PASSWORD_HASH_QUEUE)
+
+# Live hall vacancy for /hall_portal/stream/; booking and delete paths
+# publish the vacancy they committed.
+vacancy_feed = VacancyFeed(resync_interval=VACANCY_RESYNC_SECONDS, max_subscribers=VACANCY_STREAM_MAX)
+
+# Rendered pages and template fragments (see cached_page and cached_fragment).
+# Entries are keyed by the versions of the data they show; writers bump them
+# (publish_vacancy bumps 'halls', 'events' follows the event catalog).
+page_cache = PageCache(max_bytes=PAGE_CACHE_MAX_BYTES, max_entries=PAGE_CACHE_MAX_ENTRIES, ttl=PAGE_CACHE_TTL)
+page_versions = DataVersions()
+
+def publish_vacancy(changes):
+    """Push committed hall vacancy to streams and retire cached hall pages."""
+    page_versions.bump('halls')
+    vacancy_feed.publish(changes)
+
+# Registration and booking writes admitted at once; the rest queue for a
+# slot (see admission_controlled).
+admission_gate = AdmissionGate(max_inflight=ADMISSION_MAX_INFLIGHT, max_queue=ADMISSION_QUEUE,
+                               wait=ADMISSION_WAIT, ticket_ttl=ADMISSION_TICKET_TTL)
+admission_tokens = URLSafeSerializer(app.secret_key, salt='cfms-admission')
+
+def run_hall_audit():
+    """Scheduled hall audit (and repair with HALL_AUDIT_REPAIR); account problems are only reported."""
+    with app.app_context():
+        db = get_db()
+        report = hall_audit.audit(db)
+        repaired = {}
+        if HALL_AUDIT_REPAIR and hall_audit.problems(report, accounts=False):
+            repaired = hall_audit.repair(db, report, is_postgres=IS_POSTGRES)
+            if repaired:
+                publish_vacancy(repaired)
+    return report, repaired
+
+# Started by the first request when HALL_AUDIT_INTERVAL is set.
+hall_auditor = HallAuditor(run_hall_audit, HALL_AUDIT_INTERVAL, log=lambda message: app.logger.warning(message))
+
+# Per-route latency, DB time and query counts, served at /metrics.
+metrics = instrumentation.Metrics()
+
+# Role tables keep their own copy of the password column.
+ROLE_TABLES = {'STUDENT': 'Student', 'EXTERNAL': 'ExternalParticipant', 'ORGANIZER': 'Organiser'}
 
 class ParamCursor:
     """Cursor adapter that lets us keep '?' placeholders even on Postgres."""
-    def __init__(self, real_cursor, is_postgres):
+    def __init__(self, real_cursor, is_postgres, prepare=False):
         self._cur = real_cursor
         self._is_pg = is_postgres
+        self._prepare = prepare
 
     def execute(self, query, params=None):
-        if self._is_pg and query is not None:
-            query = query.replace('?', '%s')
-        return self._cur.execute(query, params or [])
+        started = time.perf_counter()
+        try:
+            if self._is_pg and query is not None:
+                statement = statements.translate(query)
+                if self._prepare:
+                    return statements.execute(self._cur, statement, params or [])
+                return self._cur.execute(statement.pyformat, params or [])
+            return self._cur.execute(query, params or [])
+        finally:
+            instrumentation.record_query(query, time.perf_counter() - started)
 
     def executemany(self, query, seq_of_params):
-        if self._is_pg and query is not None:
-            query = query.replace('?', '%s')
-        return self._cur.executemany(query, seq_of_params)
+        started = time.perf_counter()
+        try:
+            if self._is_pg and query is not None:
+                # psycopg2's executemany is one round trip per row; batch them
+                return execute_batch(self._cur, statements.translate(query).pyformat, seq_of_params,
+                                     page_size=500)
+            return self._cur.executemany(query, seq_of_params)
+        finally:
+            instrumentation.record_query(query, time.perf_counter() - started)
+
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            instrumentation.record_fetch(time.perf_counter() - started)
 
     def fetchone(self):
-        return self._cur.fetchone()
+        return self._timed_fetch(self._cur.fetchone)
 
     def fetchall(self):
-        return self._cur.fetchall()
+        return self._timed_fetch(self._cur.fetchall)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(self._cur.fetchmany, size or self._cur.arraysize)
 
     def __getattr__(self, item):
         return getattr(self._cur, item)
 
 
 class DbWrapper:
-    def __init__(self, conn, is_postgres):
+    def __init__(self, conn, is_postgres, pool=None):
         self._conn = conn
         self._is_pg = is_postgres
+        self._pool = pool
         self.row_factory = sqlite3.Row if not is_postgres else None
 
-    def cursor(self):
+    def cursor(self, name=None):
+        """``name`` asks Postgres for a server-side cursor; SQLite cursors already stream."""
         if self._is_pg:
-            return ParamCursor(self._conn.cursor(cursor_factory=RealDictCursor), True)
+            # Named cursors run DECLARE, which cannot take a prepared statement
+            return ParamCursor(self._conn.cursor(name=name, cursor_factory=RealDictCursor), True,
+                               prepare=name is None)
         cur = self._conn.cursor()
         return ParamCursor(cur, False)
 
@@ -307,30 +498,76 @@ class DbWrapper:
         return self._conn.rollback()
 
     def close(self):
+        if self._pool is not None:
+            return self._pool.release(self._conn)
         return self._conn.close()
 
     def executescript(self, script):
         if not self._is_pg:
             return self._conn.executescript(script)
-        # Split on semicolons; execute non-empty statements
-        statements = [s.strip() for s in script.split(';') if s.strip()]
+        # psycopg2 runs a multi-statement string in the current transaction
         with self._conn.cursor() as c:
-            for stmt in statements:
-                c.execute(stmt)
+            c.execute(script)
+
+
+_pg_pool = None
+
+
+def _ping_pg(conn):
+    """Liveness check run on checkout of an idle pooled connection."""
+    if conn.closed:
+        return False
+    with conn.cursor() as c:
+        c.execute('SELECT 1')
+    conn.rollback()
+
+
+def _connect_pg():
+    if not PG_PREPARE_THRESHOLD:
+        return psycopg2.connect(DATABASE_URL)
+    conn = psycopg2.connect(DATABASE_URL, connection_factory=statements.PreparingConnection)
+    conn.prepared = statements.PreparedStatements(PG_PREPARE_THRESHOLD, PG_PREPARED_MAX)
+    return conn
+
+
+def get_pg_pool():
+    """Return this process's Postgres pool, creating it after a fork."""
+    global _pg_pool
+    if psycopg2 is None:
+        raise RuntimeError('psycopg2-binary is required for PostgreSQL support')
+    if _pg_pool is None or _pg_pool.pid != os.getpid():
+        _pg_pool = ConnectionPool(_connect_pg,
+                                  minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                                  timeout=DB_POOL_TIMEOUT, ping=_ping_pg,
+                                  ping_interval=DB_POOL_PING_INTERVAL)
+    return _pg_pool
+
+
+_sqlite_connections = None
+
+
+def get_sqlite_connections():
+    """Per-thread SQLite connections, or None for the legacy connect-per-request profile."""
+    global _sqlite_connections
+    if SQLITE_PROFILE == 'legacy':
+        return None
+    if _sqlite_connections is None:
+        _sqlite_connections = ThreadLocalConnections(lambda: sqlite_profile.connect(DATABASE, SQLITE_PROFILE))
+    return _sqlite_connections
 
 
 def get_db():
     """Get database connection (SQLite default, optional Postgres via DATABASE_URL)."""
     if 'db' not in g:
         if IS_POSTGRES:
-            if psycopg2 is None:
-                raise RuntimeError('psycopg2-binary is required for PostgreSQL support')
-            conn = psycopg2.connect(DATABASE_URL)
-            g.db = DbWrapper(conn, True)
+            pool = get_pg_pool()
+            g.db = DbWrapper(pool.acquire(), True, pool)
         else:
-            conn = sqlite3.connect(DATABASE)
-            conn.row_factory = sqlite3.Row
-            g.db = DbWrapper(conn, False)
+            connections = get_sqlite_connections()
+            if connections is None:
+                g.db = DbWrapper(sqlite_profile.connect(DATABASE, 'legacy'), False)
+            else:
+                g.db = DbWrapper(connections.acquire(), False, connections)
         g.is_postgres = IS_POSTGRES
     return g.db
 
@@ -342,225 +579,402 @@ def close_db(e=None):
 
 app.teardown_appcontext(close_db)
 
-def init_db():
-    """Initialize database with tables and sample data"""
-    db = get_db()
+@app.before_request
+def start_query_profile():
+    """Attribute the statements of this request to its route"""
+    hall_auditor.start()
+    if OUTBOX_AUTOSTART:
+        outbox_sender.start()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    slow = SLOW_QUERY_MS / 1000.0 if SLOW_QUERY_MS > 0 else None
+    g.query_profile, g.query_profile_token = instrumentation.start_request(route, slow)
+
+@app.after_request
+def finish_query_profile(response):
+    """Record route metrics and report DB time in a Server-Timing header"""
+    profile = g.get('query_profile')
+    if profile is None:
+        return response
+    elapsed = metrics.observe(profile, request.method, response.status_code)
+    slowest, slowest_sql = profile.slowest
+    response.headers['Server-Timing'] = 'db;dur=%.1f;desc="%d queries", slowest-query;dur=%.1f, total;dur=%.1f' % (
+        profile.db_time * 1000, profile.queries, slowest * 1000, elapsed * 1000)
+    if app.debug:
+        if slowest_sql is not None:
+            app.logger.debug('%s %s: %d queries, %.1f ms in the database, slowest %.1f ms: %s', request.method,
+                             profile.route, profile.queries, profile.db_time * 1000, slowest * 1000, slowest_sql)
+        if N_PLUS_ONE_THRESHOLD > 0:
+            for sql, count in profile.repeated(N_PLUS_ONE_THRESHOLD):
+                app.logger.warning('Possible N+1 on %s: statement ran %d times: %s', profile.route, count, sql)
+    return response
+
+@app.teardown_request
+def end_query_profile(e=None):
+    token = g.pop('query_profile_token', None)
+    if token is not None:
+        instrumentation.end_request(token)
+
+@app.errorhandler(PoolTimeout)
+def pool_timeout(e):
+    """Every pooled connection is busy; ask the client to retry shortly."""
+    return 'Server busy, please retry shortly', 503, {'Retry-After': '1'}
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    """The password hashing queue is full (login/registration rush)."""
+    return 'Server busy, please retry shortly', 503, {'Retry-After': '2'}
+
+@app.errorhandler(QueueFull)
+def admission_queue_full(e):
+    """The waiting room for registration and booking is full; shed the request."""
+    return 'Too many people are signing up right now, please retry shortly', 503, {
+        'Retry-After': str(e.retry_after)}
+
+@app.errorhandler(FeedFull)
+def feed_full(e):
+    """This worker already serves as many vacancy streams as it is allowed."""
+    return 'Too many live connections, please retry shortly', 503, {'Retry-After': '10'}
+
+def collect_stats():
+    """Per-process runtime statistics for operators."""
+    stats = {'pid': os.getpid()}
+    if IS_POSTGRES and _pg_pool is not None:
+        stats['db_pool'] = _pg_pool.stats()
+        stats['statements'] = statements.stats()
+    if not IS_POSTGRES:
+        stats['sqlite'] = {'profile': SQLITE_PROFILE}
+        if _sqlite_connections is not None:
+            stats['sqlite'].update(_sqlite_connections.stats())
+    stats['event_catalog'] = event_catalog.stats()
+    stats['roster_cache'] = roster_service.stats()
+    stats['password_hasher'] = password_hasher.stats()
+    stats['vacancy_feed'] = vacancy_feed.stats()
+    stats['admission'] = admission_gate.stats()
+    stats['hall_audit'] = hall_auditor.stats()
+    stats['page_cache'] = page_cache.stats()
+    return stats
+
+def admission_controlled(view):
+    """Run ``view`` only when the admission gate has a free write slot.
+
+    Requests beyond the slot limit queue in arrival order.  One that is not
+    admitted within ADMISSION_WAIT gets a waiting page that resubmits its
+    form with a signed ticket token, keeping its place in line.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMISSION_MAX_INFLIGHT <= 0:
+            return view(*args, **kwargs)
+        ticket = None
+        token = request.form.get('admission_token')
+        if token:
+            try:
+                pid, ticket = admission_tokens.loads(token)
+            except (BadSignature, ValueError, TypeError):
+                ticket = None
+            else:
+                if pid != os.getpid():
+                    ticket = None  # issued by another worker; its queue is not ours
+        admission = admission_gate.admit(ticket)
+        if not admission.admitted:
+            fields = [(k, v) for k, v in request.form.items(multi=True) if k != 'admission_token']
+            fields.append(('admission_token', admission_tokens.dumps([os.getpid(), admission.ticket])))
+            body = waiting_page(request.path, fields, admission.position, admission.retry_after)
+            return body, 202, {'Retry-After': str(admission.retry_after), 'Cache-Control': 'no-store'}
+        try:
+            return view(*args, **kwargs)
+        finally:
+            admission_gate.release(admission)
+    return wrapper
+
+def data_version(source):
+    if source == 'events':
+        return event_catalog.snapshot(get_db)['etag']
+    return page_versions.get(source)
+
+def _cache_key(name, sources):
+    return (name, request.query_string, session.get('user_role'), tuple(data_version(s) for s in sources))
+
+def cached_page(*sources):
+    """Serve the view's rendered page from the page cache.
+
+    Entries are keyed by endpoint, query string, the viewer's role and the
+    versions of ``sources``, so a cached view must not render anything
+    specific to one user.  Only successful GETs are stored; pages carrying
+    flash messages are rendered and not cached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not page_cache.enabled or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            key = _cache_key(request.endpoint, sources)
+            hit = page_cache.get('page', key)
+            if hit is not None:
+                body, mimetype = hit
+                response = app.response_class(body, mimetype=mimetype)
+                response.headers['X-Page-Cache'] = 'hit'
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                body = response.get_data()
+                page_cache.set('page', key, (body, response.mimetype), size=len(body))
+                response.headers['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+@app.template_global()
+def cached_fragment(template, *sources, **context):
+    """Render a shared block once per data version, e.g. the event list:
+    ``{{ cached_fragment('fragments/event_list.html', 'events', events=events) }}``.
+
+    The key is the template, query string, role and ``sources`` versions;
+    ``context`` is not part of it, so pass only what those versions cover.
+    """
+    if not page_cache.enabled:
+        return Markup(render_template(template, **context))
+    key = _cache_key(template, sources)
+    html = page_cache.get('fragment', key)
+    if html is None:
+        html = Markup(render_template(template, **context))
+        page_cache.set('fragment', key, html, size=len(html.encode('utf-8')))
+    return html
+
+def render_event_page(template, with_counts=False):
+    """Render an event listing from the catalog cache with HTTP validators.
+
+    The ETag combines the catalog content hash with the template and the
+    viewer, so a repeat view of an unchanged catalog is answered with 304
+    without rendering.  Pages carrying flash messages are never validated.
+    Events are paged with ``after``/``before``/``limit`` cursors.
+    ``with_counts`` adds the page's EventCounter rows as ``counts`` (and to
+    the ETag, since they change with every registration); such pages carry
+    no Last-Modified, which would only reflect the catalog.
+    """
+    snapshot = event_catalog.snapshot(get_db)
+    after, before, size = page_args(request.args)
+    page = paginate_sorted(snapshot['rows'], 'name', after, before, size)
+    counts = counters.counts(get_db().cursor(), [e['name'] for e in page.items]) if with_counts else None
+    if session.get('_flashes'):
+        return render_template(template, events=page.items, page=page, counts=counts)
+
+    key = '%s:%s:%s:%s:%r' % (snapshot['etag'], template, session.get('user_email', ''),
+                              request.query_string.decode('latin-1'), sorted(counts.items()) if counts else None)
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    last_modified = datetime.datetime.fromtimestamp(int(snapshot['last_modified']), datetime.timezone.utc)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif with_counts:
+        not_modified = False
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
 
-    # Create tables (differences for AUTOINCREMENT vs SERIAL)
-    if IS_POSTGRES:
-        schema = '''
-        CREATE TABLE IF NOT EXISTS CustomUser (
-            email VARCHAR(100) PRIMARY KEY,
-            password VARCHAR(100) NOT NULL,
-            role VARCHAR(20) NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS Student (
-            email VARCHAR(100) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            roll_number VARCHAR(20) NOT NULL,
-            password VARCHAR(100) NOT NULL,
-            FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS ExternalParticipant (
-            email VARCHAR(100) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            college_name VARCHAR(100) NOT NULL,
-            password VARCHAR(100) NOT NULL,
-            FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS Organiser (
-            email VARCHAR(100) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            password VARCHAR(100) NOT NULL,
-            FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS Event (
-            name VARCHAR(200) PRIMARY KEY,
-            description TEXT,
-            date DATE DEFAULT CURRENT_DATE,
-            time TIME,
-            location VARCHAR(200)
-        );
-
-        CREATE TABLE IF NOT EXISTS EventRegistration (
-            event VARCHAR(200),
-            student_email VARCHAR(100),
-            FOREIGN KEY (event) REFERENCES Event (name) ON DELETE CASCADE,
-            FOREIGN KEY (student_email) REFERENCES CustomUser (email) ON DELETE CASCADE,
-            UNIQUE(event, student_email)
-        );
-
-        CREATE TABLE IF NOT EXISTS Hall (
-            name VARCHAR(100) PRIMARY KEY,
-            location VARCHAR(200),
-            vacancy INTEGER DEFAULT 50,
-            price INTEGER DEFAULT 200
-        );
-
-        CREATE TABLE IF NOT EXISTS Accomadation (
-            id SERIAL PRIMARY KEY,
-            name_par VARCHAR(100) NOT NULL,
-            email VARCHAR(100) NOT NULL,
-            date DATE DEFAULT CURRENT_DATE,
-            name_hall VARCHAR(100) NOT NULL,
-            price INTEGER,
-            FOREIGN KEY (email) REFERENCES ExternalParticipant (email) ON DELETE CASCADE,
-            FOREIGN KEY (name_hall) REFERENCES Hall (name) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS Volunteer (
-            event_name VARCHAR(100),
-            student_name VARCHAR(100),
-            student_email VARCHAR(100),
-            FOREIGN KEY (event_name) REFERENCES Event (name) ON DELETE CASCADE,
-            FOREIGN KEY (student_email) REFERENCES Student (email) ON DELETE CASCADE,
-            PRIMARY KEY(event_name, student_email)
-        );
-
-        CREATE TABLE IF NOT EXISTS Event_has_organiser (
-            event_name VARCHAR(100),
-            org_name VARCHAR(100),
-            org_email VARCHAR(100),
-            FOREIGN KEY (event_name) REFERENCES Event (name) ON DELETE CASCADE,
-            FOREIGN KEY (org_email) REFERENCES Organiser (email) ON DELETE CASCADE,
-            PRIMARY KEY(event_name, org_email)
-        );
-
-        CREATE TABLE IF NOT EXISTS Winners (
-            event VARCHAR(200) PRIMARY KEY,
-            name_par VARCHAR(100),
-            email VARCHAR(100)
-        );
-        '''
+    if not_modified:
+        response = app.response_class(status=304)
     else:
-        schema = '''
-        CREATE TABLE IF NOT EXISTS CustomUser (
-            email VARCHAR(100) PRIMARY KEY,
-            password VARCHAR(100) NOT NULL,
-            role VARCHAR(20) NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS Student (
-            email VARCHAR(100) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            roll_number VARCHAR(20) NOT NULL,
-            password VARCHAR(100) NOT NULL,
-            FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS ExternalParticipant (
-            email VARCHAR(100) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            college_name VARCHAR(100) NOT NULL,
-            password VARCHAR(100) NOT NULL,
-            FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS Organiser (
-            email VARCHAR(100) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            password VARCHAR(100) NOT NULL,
-            FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS Event (
-            name VARCHAR(200) PRIMARY KEY,
-            description TEXT,
-            date DATE DEFAULT CURRENT_DATE,
-            time TIME,
-            location VARCHAR(200)
-        );
-
-        CREATE TABLE IF NOT EXISTS EventRegistration (
-            event VARCHAR(200),
-            student_email VARCHAR(100),
-            FOREIGN KEY (event) REFERENCES Event (name) ON DELETE CASCADE,
-            FOREIGN KEY (student_email) REFERENCES CustomUser (email) ON DELETE CASCADE,
-            UNIQUE(event, student_email)
-        );
-
-        CREATE TABLE IF NOT EXISTS Hall (
-            name VARCHAR(100) PRIMARY KEY,
-            location VARCHAR(200),
-            vacancy INTEGER DEFAULT 50,
-            price INTEGER DEFAULT 200
-        );
-
-        CREATE TABLE IF NOT EXISTS Accomadation (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name_par VARCHAR(100) NOT NULL,
-            email VARCHAR(100) NOT NULL,
-            date DATE DEFAULT CURRENT_DATE,
-            name_hall VARCHAR(100) NOT NULL,
-            price INTEGER,
-            FOREIGN KEY (email) REFERENCES ExternalParticipant (email) ON DELETE CASCADE,
-            FOREIGN KEY (name_hall) REFERENCES Hall (name) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS Volunteer (
-            event_name VARCHAR(100),
-            student_name VARCHAR(100),
-            student_email VARCHAR(100),
-            FOREIGN KEY (event_name) REFERENCES Event (name) ON DELETE CASCADE,
-            FOREIGN KEY (student_email) REFERENCES Student (email) ON DELETE CASCADE,
-            PRIMARY KEY(event_name, student_email)
-        );
-
-        CREATE TABLE IF NOT EXISTS Event_has_organiser (
-            event_name VARCHAR(100),
-            org_name VARCHAR(100),
-            org_email VARCHAR(100),
-            FOREIGN KEY (event_name) REFERENCES Event (name) ON DELETE CASCADE,
-            FOREIGN KEY (org_email) REFERENCES Organiser (email) ON DELETE CASCADE,
-            PRIMARY KEY(event_name, org_email)
-        );
-
-        CREATE TABLE IF NOT EXISTS Winners (
-            event VARCHAR(200) PRIMARY KEY,
-            name_par VARCHAR(100),
-            email VARCHAR(100)
-        );
-        '''
-
-    db.executescript(schema)
-    
-    # Insert sample data if tables are empty
+        response = make_response(render_template(template, events=page.items, page=page, counts=counts))
+    response.set_etag(etag)
+    if not with_counts:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+def init_db(log=None):
+    """Apply any pending schema migrations (run once at startup, never per request)"""
+    applied = migrate.upgrade(get_db(), DB_DIALECT, log=log)
+    if applied:
+        event_catalog.invalidate()
+    return applied
+
+@db_cli.command('upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = init_db(log=click.echo)
+    click.echo('Applied %d migration(s).' % len(applied) if applied else 'Database is up to date.')
+
+@db_cli.command('verify')
+def db_verify_command():
+    """Exit non-zero unless the database is at the latest schema version."""
+    try:
+        migrate.verify(get_db(), DB_DIALECT)
+    except migrate.MigrationError as e:
+        raise click.ClickException(str(e))
+    click.echo('Database is up to date.')
+
+@db_cli.command('generate')
+@click.option('--users', default=100000, show_default=True, help='Users across all roles.')
+@click.option('--registrations', default=1000000, show_default=True, help='EventRegistration rows.')
+@click.option('--events', default=500, show_default=True)
+@click.option('--halls', default=50, show_default=True)
+@click.option('--seed', default=42, show_default=True, help='Same seed, same data.')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+def db_generate_command(users, registrations, events, halls, seed, password):
+    """Fill a fresh database with skewed synthetic data for scale testing."""
+    from datagen import Generator, GenerationError
+    init_db()
+    started = time.perf_counter()
+    generator = Generator(users=users, registrations=registrations, events=events, halls=halls, seed=seed,
+                          password_hash=generate_password_hash(password, PASSWORD_HASH_METHOD))
+    try:
+        counts = generator.generate(get_db(), is_postgres=IS_POSTGRES, log=click.echo)
+    except GenerationError as e:
+        raise click.ClickException(str(e))
+    counters.rebuild(get_db())
+    analytics.rebuild(get_db())
+    event_catalog.invalidate()
+    roster_service.invalidate()
+    click.echo('Generated %d rows in %.1fs.' % (sum(counts.values()), time.perf_counter() - started))
+
+@db_cli.command('reconcile-counters')
+@click.option('--fix', is_flag=True, help='Recount the events that drifted.')
+def db_reconcile_counters_command(fix):
+    """Compare EventCounter with the registration and volunteer rows."""
+    found = counters.reconcile(get_db(), fix=fix)
+    for event, column, stored, actual in found:
+        click.echo('%s: %s is %d, rows say %d' % (event, column, stored, actual))
+    if not found:
+        click.echo('Event counters match the rows.')
+    elif fix:
+        click.echo('Recounted %d event(s).' % len({f[0] for f in found}))
+    else:
+        raise click.ClickException('%d counter(s) drifted; rerun with --fix' % len(found))
+
+@db_cli.command('refresh-analytics')
+def db_refresh_analytics_command():
+    """Recompute the admin analytics summary tables from scratch."""
+    started = time.perf_counter()
+    analytics.rebuild(get_db())
+    click.echo('Analytics summaries rebuilt in %.1fs.' % (time.perf_counter() - started))
+
+@db_cli.command('audit-halls')
+@click.option('--fix', is_flag=True, help='Recount drifted halls and delete orphaned bookings.')
+@click.option('--fix-accounts', is_flag=True, help='With --fix, also delete accounts missing their role row.')
+def db_audit_halls_command(fix, fix_accounts):
+    """Check hall vacancy against bookings; report orphaned bookings and broken accounts."""
+    db = get_db()
+    report = hall_audit.audit(db)
+    click.echo('Audited %d hall(s) and %d booking(s) in %.0f ms.' % (report['halls'], report['bookings'],
+                                                                    report['elapsed'] * 1000))
+    for d in report['drift']:
+        click.echo('%s: vacancy %d, expected %d (capacity %d, %d booking(s))' % (
+            d['hall'], d['vacancy'], d['expected'], d['capacity'], d['bookings']))
+    for hall in report['unknown_capacity']:
+        click.echo('%s: no capacity set' % hall)
+    for hall in report['overbooked']:
+        click.echo('%s: more bookings than beds' % hall)
+    for o in report['orphaned_bookings']:
+        click.echo('Booking %d (%s in %s): %s' % (o['id'], o['email'], o['name_hall'], o['reason']))
+    for a in report['broken_accounts']:
+        click.echo('Account %s (%s) has no role row' % (a['email'], a['role']))
+    found = hall_audit.problems(report)
+    if not found:
+        click.echo('Hall occupancy matches the bookings.')
+    elif fix:
+        repaired = hall_audit.repair(db, report, is_postgres=IS_POSTGRES, accounts=fix_accounts)
+        publish_vacancy(repaired)
+        click.echo('Repaired %d hall(s)%s.' % (len(repaired), '' if fix_accounts or not report['broken_accounts']
+                                                else '; accounts left alone (add --fix-accounts)'))
+    else:
+        raise click.ClickException('%d problem(s) found; rerun with --fix' % found)
+
+@db_cli.command('set-hall-capacity')
+@click.argument('hall')
+@click.argument('capacity', type=click.IntRange(min=0))
+def db_set_hall_capacity_command(hall, capacity):
+    """Set the number of beds in HALL and recount its vacancy."""
+    vacancy = hall_audit.set_capacity(get_db(), hall, capacity, is_postgres=IS_POSTGRES)
+    if vacancy is None:
+        raise click.ClickException('No hall named %r' % hall)
+    publish_vacancy({hall: vacancy})
+    click.echo('%s: capacity %d, vacancy %d' % (hall, capacity, vacancy))
+
+@db_cli.command('set-capacity')
+@click.argument('event')
+@click.argument('capacity', type=click.IntRange(min=0), required=False)
+def db_set_capacity_command(event, capacity):
+    """Cap registrations for EVENT (omit CAPACITY to remove the cap)."""
+    db = get_db()
     cursor = db.cursor()
-    
-    # Check if Hall table is empty and insert sample data
-    cursor.execute("SELECT COUNT(*) FROM Hall")
-    if cursor.fetchone()[0] == 0:
-        halls_data = [
-            ("LBS HALL", "Old Hijili", 50, 200),
-            ("MT HALL", "Main Building", 50, 200),
-            ("SNVH HALL", "Pepsi Cut", 50, 200),
-            ("VS HALL", "Jhan Ghosh", 50, 200),
-            ("JCB HALL", "Gymkhana", 50, 200)
-        ]
-        cursor.executemany("INSERT INTO Hall (name, location, vacancy, price) VALUES (?, ?, ?, ?)", halls_data)
-    
-    # Check if Event table is empty and insert sample data
-    cursor.execute("SELECT COUNT(*) FROM Event")
-    if cursor.fetchone()[0] == 0:
-        events_data = [
-            ("Battle of Bands", "Music competition between college bands", "2024-03-15", "18:00", "Main Auditorium"),
-            ("Dance Competition", "Inter-college dance competition", "2024-03-16", "19:00", "Open Air Theatre"),
-            ("Coding Contest", "Programming competition", "2024-03-17", "10:00", "Computer Lab"),
-            ("Art Exhibition", "Student art showcase", "2024-03-18", "14:00", "Art Gallery"),
-            ("Sports Meet", "Annual sports competition", "2024-03-19", "08:00", "Sports Ground")
-        ]
-        cursor.executemany("INSERT INTO Event (name, description, date, time, location) VALUES (?, ?, ?, ?, ?)", events_data)
-    
+    cursor.execute("SELECT 1 FROM Event WHERE name = ?", (event,))
+    if cursor.fetchone() is None:
+        raise click.ClickException('No event named %r' % event)
+    counters.set_capacity(cursor, event, capacity)
     db.commit()
+    click.echo('%s: %s' % (event, 'capacity %d' % capacity if capacity is not None else 'no capacity limit'))
+
+@db_cli.command('check-plans')
+def db_check_plans_command():
+    """Fail if any application query plans a full table scan."""
+    import query_plans
+    if IS_POSTGRES:
+        conn = psycopg2.connect(DATABASE_URL)
+        try:
+            failures = query_plans.check('postgres', pg_conn=conn)
+        finally:
+            conn.close()
+    else:
+        failures = query_plans.check('sqlite')
+    for label, sql, tables in failures:
+        click.echo('%s: full scan of %s\n    %s' % (label, ', '.join(tables), sql))
+    if failures:
+        raise click.ClickException('%d statement(s) fall back to a full table scan' % len(failures))
+    click.echo('All query plans use indexes.')
+
+app.cli.add_command(db_cli)
+app.cli.add_command(outbox_worker_command)
+
+@app.cli.command('import-participants')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--role', type=click.Choice(['student', 'external']), required=True)
+@click.option('--errors', 'error_path', default='import_errors.csv', show_default=True,
+              help='CSV file that receives every rejected row.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per transaction.')
+@click.option('--workers', default=0, help='Password hashing processes (default: CPU count).')
+def import_participants_command(path, role, error_path, chunk_size, workers):
+    """Bulk import students or external participants from CSV or JSONL."""
+    importer = ParticipantImporter(get_db(), role, chunk_size=chunk_size, workers=workers or None,
+                                   hash_password=functools.partial(generate_password_hash, method=PASSWORD_HASH_METHOD))
+    imported, rejected = importer.run(path, error_path)
+    if imported and role == 'external':
+        analytics.rebuild(get_db())  # college participant counts
+    click.echo('Imported %d %s participant(s); %d rejected (see %s).' % (imported, role, rejected, error_path))
+
+@app.cli.command('delete-users')
+@click.argument('emails', nargs=-1)
+@click.option('--from-file', 'path', type=click.Path(exists=True, dir_okay=False),
+              help='File with one email per line.')
+@click.option('--college', help='Every external participant of this college.')
+@click.option('--role', type=click.Choice(['STUDENT', 'EXTERNAL', 'ORGANIZER']), help='Every account with this role.')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted, then roll back.')
+def delete_users_command(emails, path, college, role, dry_run):
+    """Delete many accounts in one transaction, restoring hall vacancy."""
+    if path:
+        with open(path) as fh:
+            emails += tuple(line.strip() for line in fh)
+    try:
+        report = delete_users(get_db(), emails=list(emails) if emails else None, college=college, role=role,
+                              dry_run=dry_run)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if not dry_run:
+        _after_delete(report)
+    click.echo('%s %d account(s) (%s).' % ('Would delete' if dry_run else 'Deleted', report['accounts'],
+                                          ', '.join('%s %d' % item for item in sorted(report['roles'].items()))
+                                          or 'none'))
+    click.echo('Removed %d booking(s), %d registration(s), %d volunteer sign-up(s), %d organiser link(s).' % (
+        report['bookings'], report['registrations'], report['volunteering'], report['organising']))
+    for hall, vacancy in sorted(report['halls'].items()):
+        click.echo('  %s: vacancy now %d' % (hall, vacancy))
+    if report['not_found']:
+        click.echo('Not found: %s' % ', '.join(report['not_found']))
 
 @app.route('/')
+@cached_page()
 def homepage():
     """Homepage route"""
-    init_db()
     return render_template('homepage.html')
 
 @app.route('/login/', methods=['GET', 'POST'])
@@ -575,7 +989,15 @@ def login():
         cursor.execute("SELECT email, password, role FROM CustomUser WHERE email = ?", (email,))
         user_row = cursor.fetchone()
         
-        if user_row and user_row['password'] == password:
+        ok, new_hash = password_hasher.verify_and_update(user_row['password'] if user_row else None, password)
+        if ok:
+            if new_hash:
+                # Legacy plaintext (or outdated cost) row: upgrade it in place.
+                cursor.execute("UPDATE CustomUser SET password = ? WHERE email = ?", (new_hash, email))
+                role_table = ROLE_TABLES.get(user_row['role'])
+                if role_table:
+                    cursor.execute("UPDATE %s SET password = ? WHERE email = ?" % role_table, (new_hash, email))
+                db.commit()
             session['user_email'] = email
             session['user_role'] = user_row['role']
             
@@ -603,20 +1025,23 @@ def student_registration():
         password = request.form.get('password')
         password1 = request.form.get('password1')
         
+        if not password:
+            return render_template('register_student.html', error='Password is required')
         if password != password1:
             return render_template('register_student.html', error='Passwords do not match')
         
+        hashed = password_hasher.hash(password)
         db = get_db()
         cursor = db.cursor()
         
         try:
             # Insert into CustomUser first
             cursor.execute("INSERT INTO CustomUser (email, password, role) VALUES (?, ?, ?)", 
-                         (email, password, 'STUDENT'))
+                         (email, hashed, 'STUDENT'))
             
             # Insert into Student table
             cursor.execute("INSERT INTO Student (name, email, roll_number, password) VALUES (?, ?, ?, ?)", 
-                         (name, email, roll_number, password))
+                         (name, email, roll_number, hashed))
             
             db.commit()
             flash('Student registered successfully! Please login.', 'success')
@@ -638,20 +1063,24 @@ def external_registration():
         password = request.form.get('password')
         password1 = request.form.get('password1')
         
+        if not password:
+            return render_template('register_external.html', error='Password is required')
         if password != password1:
             return render_template('register_external.html', error='Passwords do not match')
         
+        hashed = password_hasher.hash(password)
         db = get_db()
         cursor = db.cursor()
         
         try:
             # Insert into CustomUser first
             cursor.execute("INSERT INTO CustomUser (email, password, role) VALUES (?, ?, ?)", 
-                         (email, password, 'EXTERNAL'))
+                         (email, hashed, 'EXTERNAL'))
             
             # Insert into ExternalParticipant table
             cursor.execute("INSERT INTO ExternalParticipant (name, email, college_name, password) VALUES (?, ?, ?, ?)", 
-                         (name, email, college_name, password))
+                         (name, email, college_name, hashed))
+            analytics.record_participant(cursor, college_name)
             
             db.commit()
             flash('External participant registered successfully! Please login.', 'success')
@@ -672,20 +1101,23 @@ def organiser_registration():
         password = request.form.get('password')
         password1 = request.form.get('password1')
         
+        if not password:
+            return render_template('register_organiser.html', error='Password is required')
         if password != password1:
             return render_template('register_organiser.html', error='Passwords do not match')
         
+        hashed = password_hasher.hash(password)
         db = get_db()
         cursor = db.cursor()
         
         try:
             # Insert into CustomUser first
             cursor.execute("INSERT INTO CustomUser (email, password, role) VALUES (?, ?, ?)", 
-                         (email, password, 'ORGANIZER'))
+                         (email, hashed, 'ORGANIZER'))
             
             # Insert into Organiser table
             cursor.execute("INSERT INTO Organiser (name, email, password) VALUES (?, ?, ?)", 
-                         (name, email, password))
+                         (name, email, hashed))
             
             db.commit()
             flash('Organizer registered successfully! Please login.', 'success')
@@ -703,12 +1135,7 @@ def student_dashboard():
     if 'user_email' not in session or session['user_role'] != 'STUDENT':
         return redirect(url_for('login'))
     
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM Event")
-    events = cursor.fetchall()
-    
-    return render_template('student.html', events=events)
+    return render_event_page('student.html')
 
 @app.route('/external/')
 def external_dashboard():
@@ -716,12 +1143,7 @@ def external_dashboard():
     if 'user_email' not in session or session['user_role'] != 'EXTERNAL':
         return redirect(url_for('login'))
     
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM Event")
-    events = cursor.fetchall()
-    
-    return render_template('external.html', events=events)
+    return render_event_page('external.html')
 
 @app.route('/organizer/')
 def organizer_dashboard():
@@ -729,12 +1151,7 @@ def organizer_dashboard():
     if 'user_email' not in session or session['user_role'] != 'ORGANIZER':
         return redirect(url_for('login'))
     
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM Event")
-    events = cursor.fetchall()
-    
-    return render_template('organiser.html', events=events)
+    return render_event_page('organiser.html', with_counts=True)
 
 @app.route('/admin_url/')
 def admin_dashboard():
@@ -744,20 +1161,32 @@ def admin_dashboard():
     
     return render_template('admin.html')
 
+@app.route('/admin_analytics/')
+def admin_analytics():
+    """Admin analytics: per event, college, day and hall, from the summary tables"""
+    if 'user_email' not in session or session['user_role'] != 'ADMIN':
+        return redirect(url_for('login'))
+    
+    data = analytics.summary(get_db().cursor(), top=ANALYTICS_TOP)
+    if request.args.get('format') == 'json':
+        return jsonify(data)
+    return render_template('admin_analytics.html', **data)
+
 @app.route('/admin_event_dashboard/')
 def admin_event_dashboard():
     """Admin event dashboard route"""
     if 'user_email' not in session or session['user_role'] != 'ADMIN':
         return redirect(url_for('login'))
     
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM Event")
-    events = cursor.fetchall()
-    
-    return render_template('admin_event.html', events=events)
+    return render_event_page('admin_event.html', with_counts=True)
+
+def event_exists(cursor, event_name):
+    """Sign-ups for an unknown or stale event name would fail the EventCounter foreign key."""
+    cursor.execute("SELECT 1 FROM Event WHERE name = ?", (event_name,))
+    return cursor.fetchone() is not None
 
 @app.route('/event_registration/', methods=['POST'])
+@admission_controlled
 def event_registration():
     """Event registration for students"""
     if 'user_email' not in session or session['user_role'] != 'STUDENT':
@@ -774,9 +1203,19 @@ def event_registration():
                   (student_email, event_name))
     
     if cursor.fetchone() is None:
-        cursor.execute("INSERT INTO EventRegistration (event, student_email) VALUES (?, ?)", 
-                      (event_name, student_email))
+        if not event_exists(cursor, event_name):
+            flash('Event not found.', 'error')
+            return redirect(url_for('student_dashboard'))
+        if not counters.record_registration(cursor, event_name, 'STUDENT'):
+            db.rollback()
+            flash('Sorry, this event is full.', 'warning')
+            return redirect(url_for('student_dashboard'))
+        registered_at = datetime.datetime.now()
+        analytics.record_registration(cursor, student_email, 'STUDENT', registered_at)
+        cursor.execute("INSERT INTO EventRegistration (event, student_email, registered_at) VALUES (?, ?, ?)", 
+                      (event_name, student_email, registered_at))
         db.commit()
+        roster_service.invalidate(event_name)
         flash('Registered successfully for the event!', 'success')
     else:
         flash('Already registered for this event.', 'warning')
@@ -784,6 +1223,7 @@ def event_registration():
     return redirect(url_for('student_dashboard'))
 
 @app.route('/event_ext_registration/', methods=['POST'])
+@admission_controlled
 def event_ext_registration():
     """Event registration for external participants"""
     if 'user_email' not in session or session['user_role'] != 'EXTERNAL':
@@ -800,9 +1240,19 @@ def event_ext_registration():
                   (student_email, event_name))
     
     if cursor.fetchone() is None:
-        cursor.execute("INSERT INTO EventRegistration (event, student_email) VALUES (?, ?)", 
-                      (event_name, student_email))
+        if not event_exists(cursor, event_name):
+            flash('Event not found.', 'error')
+            return redirect(url_for('external_dashboard'))
+        if not counters.record_registration(cursor, event_name, 'EXTERNAL'):
+            db.rollback()
+            flash('Sorry, this event is full.', 'warning')
+            return redirect(url_for('external_dashboard'))
+        registered_at = datetime.datetime.now()
+        analytics.record_registration(cursor, student_email, 'EXTERNAL', registered_at)
+        cursor.execute("INSERT INTO EventRegistration (event, student_email, registered_at) VALUES (?, ?, ?)", 
+                      (event_name, student_email, registered_at))
         db.commit()
+        roster_service.invalidate(event_name)
         flash('Registered successfully for the event!', 'success')
     else:
         flash('Already registered for this event.', 'warning')
@@ -836,17 +1286,40 @@ def accomadation_portal():
     return render_template('accomodation.html', booked_accommodation=booked_accommodation_details)
 
 @app.route('/hall_portal/')
+@cached_page('halls')
 def hall_portal():
     """Hall portal showing available halls"""
     db = get_db()
     cursor = db.cursor()
     
-    cursor.execute("SELECT * FROM Hall")
-    halls = cursor.fetchall()
+    after, before, size = page_args(request.args)
+    halls = fetch_page(cursor, "SELECT * FROM Hall", [], 'name', after, before, size)
     
-    return render_template('bookedhalls.html', halls=halls)
+    return render_template('bookedhalls.html', halls=halls.items, page=halls)
+
+def load_hall_vacancy():
+    """Current vacancy of every hall, on a connection returned straight away."""
+    db = get_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT name, vacancy FROM Hall")
+        return [(row['name'], row['vacancy']) for row in cursor.fetchall()]
+    finally:
+        close_db()
+
+@app.route('/hall_portal/stream/')
+def hall_vacancy_stream():
+    """Server-Sent Events: a vacancy snapshot of every hall, then changes"""
+    vacancy_feed.subscribe()
+    frames = vacancy_feed.stream(load_hall_vacancy, heartbeat=VACANCY_STREAM_HEARTBEAT)
+    response = app.response_class(stream_with_context(frames), mimetype='text/event-stream')
+    response.call_on_close(vacancy_feed.unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/volunteer_registration/', methods=['POST'])
+@admission_controlled
 def volunteer_registration():
     """Volunteer registration for students"""
     if 'user_email' not in session or session['user_role'] != 'STUDENT':
@@ -858,18 +1331,24 @@ def volunteer_registration():
     db = get_db()
     cursor = db.cursor()
     
-    # Get student name
-    cursor.execute("SELECT name FROM Student WHERE email = ?", (student_email,))
-    student_name = cursor.fetchone()['name']
-    
     # Check if already volunteered
     cursor.execute("SELECT * FROM Volunteer WHERE student_email = ? AND event_name = ?", 
                   (student_email, event_name))
     
     if cursor.fetchone() is None:
+        cursor.execute("SELECT name FROM Student WHERE email = ?", (student_email,))
+        student = cursor.fetchone()
+        if student is None:
+            flash('Student profile not found.', 'error')
+            return redirect(url_for('student_dashboard'))
+        if not event_exists(cursor, event_name):
+            flash('Event not found.', 'error')
+            return redirect(url_for('student_dashboard'))
+        counters.record_volunteer(cursor, event_name)
         cursor.execute("INSERT INTO Volunteer (event_name, student_name, student_email) VALUES (?, ?, ?)", 
-                      (event_name, student_name, student_email))
+                      (event_name, student['name'], student_email))
         db.commit()
+        roster_service.invalidate(event_name)
         flash(f'Successfully volunteered for {event_name}!', 'success')
     else:
         flash('Already volunteered for this event.', 'warning')
@@ -877,6 +1356,7 @@ def volunteer_registration():
     return redirect(url_for('student_dashboard'))
 
 @app.route('/mybooking_portal/', methods=['POST'])
+@admission_controlled
 def mybooking_portal():
     """Booking accommodation for external participants"""
     if 'user_email' not in session or session['user_role'] != 'EXTERNAL':
@@ -885,45 +1365,62 @@ def mybooking_portal():
     name_hall = request.form.get('name_hall')
     ep_mail = session['user_email']
     
-    db = get_db()
-    cursor = db.cursor()
-    
-    # Check vacancy
-    cursor.execute("SELECT vacancy FROM Hall WHERE name = ?", (name_hall,))
-    row = cursor.fetchone()
+    try:
+        booked = book_hall(get_db(), ep_mail, name_hall, is_postgres=IS_POSTGRES,
+                           record=lambda cursor, b: analytics.record_booking(cursor, ep_mail, b['name_hall'], b['price']))
+    except BookingError as e:
+        return str(e), 400
+    publish_vacancy({booked['name_hall']: booked['vacancy']})
     
-    if row is None:
-        return 'Hall not found', 400
+    return render_template('payment.html')
+
+@app.route('/admin_stats/')
+def admin_stats():
+    """Runtime statistics (connection pool, caches) for this worker process"""
+    if 'user_email' not in session or session['user_role'] != 'ADMIN':
+        return redirect(url_for('login'))
     
-    # Check if already has accommodation
-    cursor.execute("SELECT * FROM Accomadation WHERE email = ?", (ep_mail,))
-    if cursor.fetchall():
-        return 'More than one booking not allowed', 400
+    return jsonify(collect_stats())
+
+@app.route('/metrics')
+def metrics_view():
+    """Prometheus metrics for this worker process"""
+    supplied = request.headers.get('Authorization', '')
+    authorized = bool(METRICS_TOKEN) and hmac.compare_digest(supplied, 'Bearer ' + METRICS_TOKEN)
+    if not authorized and session.get('user_role') != 'ADMIN':
+        return 'Forbidden', 403
     
-    vac = row['vacancy']
-    if vac > 0:
-        # Get external participant info
-        cursor.execute("SELECT name, email FROM ExternalParticipant WHERE email = ?", (ep_mail,))
-        ep_info = cursor.fetchone()
-        
-        # Get hall info
-        cursor.execute("SELECT name, price FROM Hall WHERE name = ?", (name_hall,))
-        hall_info = cursor.fetchone()
-        
-        current_date = datetime.date.today()
-        
-        # Insert accommodation booking
-        cursor.execute("""INSERT INTO Accomadation (name_par, email, date, name_hall, price) 
-                         VALUES (?, ?, ?, ?, ?)""", 
-                      (ep_info['name'], ep_info['email'], current_date, hall_info['name'], hall_info['price']))
-        
-        # Update vacancy
-        cursor.execute("UPDATE Hall SET vacancy = ? WHERE name = ?", (vac - 1, name_hall))
-        
-        db.commit()
-        return render_template('payment.html')
-    
-    return 'No vacancies available', 400
+    gauges = {
+        'cfms_event_cache_hit_ratio': ('Event catalog cache hit ratio.', event_catalog.stats()['hit_ratio']),
+        'cfms_roster_cache_hit_ratio': ('Event roster cache hit ratio.', roster_service.stats()['hit_ratio']),
+    }
+    if IS_POSTGRES and _pg_pool is not None:
+        pool = _pg_pool.stats()
+        gauges['cfms_db_pool_in_use'] = ('Pooled connections checked out.', pool['in_use'])
+        gauges['cfms_db_pool_size'] = ('Open pooled connections.', pool['size'])
+    gauges['cfms_vacancy_stream_subscribers'] = ('Open hall vacancy streams.', vacancy_feed.stats()['subscribers'])
+    admission = admission_gate.stats()
+    gauges['cfms_admission_inflight'] = ('Admitted registration/booking writes running.', admission['inflight'])
+    gauges['cfms_admission_queue_depth'] = ('Tickets waiting for a write slot.', admission['queue_depth'])
+    gauges['cfms_admission_wait_seconds_avg'] = ('Average queue wait of admitted tickets.', admission['wait_time_avg'])
+    gauges['cfms_admission_wait_seconds_max'] = ('Longest queue wait of an admitted ticket.', admission['wait_time_max'])
+    gauges['cfms_admission_rejected'] = ('Requests shed because the queue was full.', admission['rejected'])
+    cached = page_cache.stats()
+    gauges['cfms_page_cache_hit_ratio'] = ('Page cache hit ratio.', cached['page_hit_ratio'])
+    gauges['cfms_fragment_cache_hit_ratio'] = ('Fragment cache hit ratio.', cached['fragment_hit_ratio'])
+    gauges['cfms_page_cache_bytes'] = ('Bytes held by the page and fragment cache.', cached['bytes'])
+    gauges['cfms_page_cache_entries'] = ('Pages and fragments held by the cache.', cached['entries'])
+    audit = hall_auditor.stats()
+    if audit['runs']:
+        gauges['cfms_hall_audit_drift'] = ('Halls whose vacancy disagreed with their bookings at the last audit.',
+                                           audit['drift'] + audit['unknown_capacity'])
+        gauges['cfms_hall_audit_orphaned_bookings'] = ('Orphaned bookings at the last audit.',
+                                                       audit['orphaned_bookings'])
+        gauges['cfms_hall_audit_broken_accounts'] = ('Accounts missing their role row at the last audit.',
+                                                     audit['broken_accounts'])
+    response = make_response(metrics.render(gauges))
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
 
 @app.route('/logout/')
 def logout_view():
@@ -940,36 +1437,14 @@ def event_details():
     
     if request.method == 'POST':
         event_name = request.form.get('event')
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Get participants
-        cursor.execute("""
-            SELECT DISTINCT cu.email, s.name 
-            FROM CustomUser cu 
-            INNER JOIN EventRegistration er ON cu.email = er.student_email 
-            INNER JOIN Student s ON s.email = er.student_email 
-            WHERE er.event = ?
-        """, (event_name,))
-        participants = cursor.fetchall()
-        
-        # Get volunteers
-        cursor.execute("""
-            SELECT DISTINCT cu.email, s.name 
-            FROM CustomUser cu 
-            INNER JOIN Volunteer v ON cu.email = v.student_email 
-            INNER JOIN Student s ON s.email = v.student_email 
-            WHERE v.event_name = ?
-        """, (event_name,))
-        volunteers = cursor.fetchall()
+        after, before, size = page_args(request.form)
+        roster = roster_service.get(get_db, event_name, after, before, size)
+        participants = roster['participants']
+        volunteers = roster['volunteers']
+        org_name = roster['organisers'][0]['name'] if roster['organisers'] else "No organizer assigned"
         
-        # Get organizer
-        cursor.execute("SELECT org_name FROM Event_has_organiser WHERE event_name = ?", (event_name,))
-        row = cursor.fetchone()
-        org_name = row['org_name'] if row else "No organizer assigned"
-        
-        return render_template('admin_event_details.html', participants=participants, 
-                             volunteers=volunteers, org_name=org_name)
+        return render_template('admin_event_details.html', participants=participants.items, 
+                             volunteers=volunteers, org_name=org_name, page=participants)
     
     return render_template('event_details.html', participants=participants, 
                          volunteers=volunteers, org_name=org_name)
@@ -982,10 +1457,10 @@ def hall_admin_portal():
     
     db = get_db()
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM Hall")
-    halls = cursor.fetchall()
+    after, before, size = page_args(request.args)
+    halls = fetch_page(cursor, "SELECT * FROM Hall", [], 'name', after, before, size)
     
-    return render_template('hall_admin.html', halls=halls)
+    return render_template('hall_admin.html', halls=halls.items, page=halls)
 
 @app.route('/hall_details/', methods=['POST'])
 def hall_details():
@@ -994,17 +1469,21 @@ def hall_details():
     db = get_db()
     cursor = db.cursor()
     
-    cursor.execute("SELECT email, name_par FROM Accomadation WHERE name_hall = ?", (name_hall,))
-    participants = cursor.fetchall()
+    after, before, size = page_args(request.values)
+    participants = fetch_page(cursor, "SELECT id, email, name_par FROM Accomadation WHERE name_hall = ?",
+                              (name_hall,), 'id', after, before, size)
     
-    return render_template('hall_details.html', name_hall=name_hall, participants=participants)
+    return render_template('hall_details.html', name_hall=name_hall, participants=participants.items,
+                           page=participants)
 
 @app.route('/contact.html')
+@cached_page()
 def contact():
     """Contact page"""
     return render_template('contact.html')
 
 @app.route('/sponsors.html')
+@cached_page()
 def sponsor():
     """Sponsors page"""
     return render_template('sponsors.html')
@@ -1015,47 +1494,38 @@ def winner():
     winners = []
     
     if request.method == 'POST':
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Get all events
-        cursor.execute("SELECT name FROM Event")
-        events = [row['name'] for row in cursor.fetchall()]
-        
-        # Determine winners for each event
-        for event in events:
-            cursor.execute("SELECT student_email FROM EventRegistration WHERE event = ?", (event,))
-            registrations = cursor.fetchall()
-            
-            if registrations:
-                first_registration = registrations[0]['student_email']
-                
-                # Check if external participant
-                cursor.execute("SELECT name FROM ExternalParticipant WHERE email = ?", (first_registration,))
-                ep_check = cursor.fetchone()
-                
-                if ep_check:
-                    winners.append([event, ep_check['name'], first_registration])
-                else:
-                    # Check if student
-                    cursor.execute("SELECT name FROM Student WHERE email = ?", (first_registration,))
-                    std_check = cursor.fetchone()
-                    if std_check:
-                        winners.append([event, std_check['name'], first_registration])
-        
-        # Insert winners into database
-        cursor.execute("SELECT COUNT(*) FROM Winners")
-        existing_winners = cursor.fetchone()[0]
-        
-        if existing_winners < len(events):
-            for winner in winners:
-                cursor.execute("INSERT OR IGNORE INTO Winners (event, name_par, email) VALUES (?, ?, ?)", 
-                              (winner[0], winner[1], winner[2]))
-        
-        db.commit()
+        incremental = request.form.get('mode') == 'incremental'
+        winners = compute_winners(get_db(), is_postgres=IS_POSTGRES, incremental=incremental)
     
     return render_template('winner.html', winners=winners)
 
+@app.route('/export/<kind>/')
+def export(kind):
+    """Stream a roster as CSV or XLSX (participants, volunteers, hall, winners)"""
+    if 'user_email' not in session or session['user_role'] != 'ADMIN':
+        return redirect(url_for('login'))
+    
+    spec = EXPORTS.get(kind)
+    fmt = request.args.get('format', 'csv')
+    if spec is None or fmt not in FORMATS:
+        return 'Unknown export', 404
+    value = request.args.get(spec['param']) if spec['param'] else None
+    if spec['param'] and not value:
+        return 'Missing %s' % spec['param'], 400
+    
+    filename = secure_filename('%s-%s.%s' % (kind, value, fmt) if value else '%s.%s' % (kind, fmt))
+    chunks = stream_export(get_db(), kind, fmt, value, batch_size=EXPORT_BATCH_SIZE)
+    response = app.response_class(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _after_delete(report):
+    """Refresh what caches and subscribers hold about the deleted accounts."""
+    roster_service.invalidate()
+    if report['halls']:
+        publish_vacancy(report['halls'])
+
 @app.route('/delete/', methods=['POST'])
 def delete():
     """Delete user route for admin"""
@@ -1063,35 +1533,49 @@ def delete():
         return redirect(url_for('login'))
     
     email = request.form.get('email')
-    db = get_db()
-    cursor = db.cursor()
-    
-    # Get user role
-    cursor.execute("SELECT role FROM CustomUser WHERE email = ?", (email,))
-    row = cursor.fetchone()
-    if not row:
+    report = delete_users(get_db(), emails=[email] if email else [])
+    if not report['accounts']:
         return 'User not found', 404
     
-    role = row['role']
+    _after_delete(report)
+    flash(f'User {email} deleted successfully', 'success')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/bulk_delete/', methods=['POST'])
+def bulk_delete():
+    """Delete many users at once: a list of emails, or everyone of a college and/or role"""
+    if 'user_email' not in session or session['user_role'] != 'ADMIN':
+        return redirect(url_for('login'))
     
-    # Delete from CustomUser (cascade will handle related tables)
-    cursor.execute("DELETE FROM CustomUser WHERE email = ?", (email,))
+    if request.is_json:
+        body = request.get_json(silent=True) or {}
+        emails = body.get('emails')
+        college, role, dry_run = body.get('college'), body.get('role'), bool(body.get('dry_run'))
+    else:
+        emails = re.split(r'[\s,;]+', request.form['emails']) if request.form.get('emails') else None
+        college, role = request.form.get('college'), request.form.get('role')
+        dry_run = request.form.get('dry_run') == '1'
     
-    # Handle specific cleanup for external participants
-    if role == 'EXTERNAL':
-        # Update hall vacancy if accommodation exists
-        cursor.execute("SELECT name_hall FROM Accomadation WHERE email = ?", (email,))
-        accommodation = cursor.fetchone()
-        if accommodation:
-            hall_name = accommodation['name_hall']
-            cursor.execute("UPDATE Hall SET vacancy = vacancy + 1 WHERE name = ?", (hall_name,))
+    try:
+        report = delete_users(get_db(), emails=emails, college=college or None, role=role or None,
+                              dry_run=dry_run)
+    except ValueError as e:
+        if request.is_json:
+            return jsonify(error=str(e)), 400
+        flash(str(e), 'error')
+        return redirect(url_for('admin_dashboard'))
     
-    db.commit()
-    flash(f'User {email} deleted successfully', 'success')
+    if not dry_run:
+        _after_delete(report)
+    if request.is_json:
+        return jsonify(dict(report, dry_run=dry_run))
+    flash('%s %d user(s), %d booking(s), %d registration(s)' % (
+        'Would delete' if dry_run else 'Deleted', report['accounts'], report['bookings'], report['registrations']),
+        'success')
     return redirect(url_for('admin_dashboard'))
 
 if __name__ == '__main__':
     with app.app_context():
-        init_db()
+        init_db(log=print)
     port = int(os.getenv('PORT', '8000'))
     app.run(host='0.0.0.0', port=port, debug=True)
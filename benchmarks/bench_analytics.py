@@ -0,0 +1,92 @@
+"""Admin analytics: summary tables against on-the-fly aggregation.
+
+For each ``--registrations`` size, fills a temporary SQLite database with
+the synthetic generator (datagen.py), builds the summary tables and times
+what ``/admin_analytics/`` does (``analytics.summary`` plus JSON encoding)
+against computing the same figures from the base tables per view.  The
+summary column should stay flat as registrations grow.
+
+    python benchmarks/bench_analytics.py --registrations 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import counters  # noqa: E402
+import migrate  # noqa: E402
+from datagen import Generator  # noqa: E402
+
+# What the page would have to run without the summary tables.
+LIVE_QUERIES = (
+    """SELECT er.event, COUNT(*) AS registrations,
+              SUM(CASE WHEN u.role = 'STUDENT' THEN 1 ELSE 0 END) AS students,
+              SUM(CASE WHEN u.role = 'EXTERNAL' THEN 1 ELSE 0 END) AS externals
+       FROM EventRegistration er LEFT JOIN CustomUser u ON u.email = er.student_email
+       GROUP BY er.event ORDER BY registrations DESC LIMIT 20""",
+    "SELECT event_name, COUNT(*) FROM Volunteer GROUP BY event_name",
+    """SELECT ep.college_name, COUNT(DISTINCT ep.email), COUNT(er.event)
+       FROM ExternalParticipant ep LEFT JOIN EventRegistration er ON er.student_email = ep.email
+       GROUP BY ep.college_name ORDER BY 3 DESC LIMIT 20""",
+    """SELECT DATE(registered_at) AS day, COUNT(*) FROM EventRegistration
+       WHERE registered_at IS NOT NULL GROUP BY DATE(registered_at) ORDER BY day""",
+    """SELECT h.name, h.vacancy, COUNT(a.id), COALESCE(SUM(a.price), 0)
+       FROM Hall h LEFT JOIN Accomadation a ON a.name_hall = h.name GROUP BY h.name, h.vacancy""",
+)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def build(path, registrations):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate.upgrade(conn, 'sqlite')
+    started = time.perf_counter()
+    Generator(users=max(1000, registrations // 10), registrations=registrations).generate(conn)
+    counters.rebuild(conn)
+    analytics.rebuild(conn)
+    return conn, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--registrations', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50, help='timed page views per size')
+    args = parser.parse_args()
+
+    print('%14s %12s %16s %16s' % ('registrations', 'load s', 'summary page ms', 'on-the-fly ms'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.registrations:
+            conn, load_time = build(os.path.join(tmp, 'analytics-%d.db' % size), size)
+
+            def page():
+                json.dumps(analytics.summary(conn.cursor()))
+
+            def live():
+                cursor = conn.cursor()
+                for sql in LIVE_QUERIES:
+                    cursor.execute(sql)
+                    cursor.fetchall()
+
+            page_time = timed(page, args.repeat)
+            live_time = timed(live, max(3, args.repeat // 10))
+            print('%14d %12.1f %16.2f %16.1f' % (size, load_time, page_time * 1000, live_time * 1000))
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
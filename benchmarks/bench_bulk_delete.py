@@ -0,0 +1,94 @@
+"""Bulk user deletion: one set-based transaction against one delete per user.
+
+Builds a synthetic SQLite database (datagen.py), copies it for every run and
+deletes ``--accounts`` external participants (the ones with bookings first)
+with ``bulk_delete.delete_users``, then the same accounts one call and one
+commit each, which is what deleting them through ``/delete/`` costs.  After each run it checks that
+every hall's beds (vacancy plus bookings) are unchanged and that the event
+counters have not drifted.
+
+    python benchmarks/bench_bulk_delete.py --accounts 100 1000 5000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import counters  # noqa: E402
+import migrate  # noqa: E402
+from bulk_delete import delete_users  # noqa: E402
+from datagen import Generator  # noqa: E402
+
+BEDS = """
+    SELECT h.name, h.vacancy + (SELECT COUNT(*) FROM Accomadation a WHERE a.name_hall = h.name)
+    FROM Hall h ORDER BY h.name
+"""
+VICTIMS = """
+    SELECT ep.email FROM ExternalParticipant ep
+    ORDER BY EXISTS (SELECT 1 FROM Accomadation a WHERE a.email = ep.email) DESC, ep.email
+    LIMIT ?
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def run(template, path, emails, one_by_one):
+    shutil.copy(template, path)
+    conn = connect(path)
+    beds = conn.execute(BEDS).fetchall()
+    started = time.perf_counter()
+    if one_by_one:
+        deleted = sum(delete_users(conn, emails=[email])['accounts'] for email in emails)
+    else:
+        deleted = delete_users(conn, emails=emails)['accounts']
+    elapsed = time.perf_counter() - started
+    ok = [tuple(r) for r in conn.execute(BEDS).fetchall()] == [tuple(r) for r in beds] and not counters.drift(conn)
+    conn.close()
+    return deleted, elapsed, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--registrations', type=int, default=500000)
+    parser.add_argument('--one-by-one-limit', type=int, default=1000,
+                        help='skip the per-user comparison above this many accounts')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        conn = connect(template)
+        migrate.upgrade(conn, 'sqlite')
+        Generator(users=args.users, registrations=args.registrations).generate(conn)
+        counters.rebuild(conn)
+        analytics.rebuild(conn)
+        conn.execute('PRAGMA wal_checkpoint')
+        conn.close()
+
+        print('%9s %12s %14s %8s' % ('accounts', 'bulk s', 'one-by-one s', 'checks'))
+        for size in args.accounts:
+            conn = connect(template)
+            emails = [row['email'] for row in conn.execute(VICTIMS, (size,))]
+            conn.close()
+            deleted, bulk, ok = run(template, os.path.join(tmp, 'bulk.db'), emails, False)
+            single = '-'
+            if size <= args.one_by_one_limit:
+                _, elapsed, single_ok = run(template, os.path.join(tmp, 'single.db'), emails, True)
+                single, ok = '%.2f' % elapsed, ok and single_ok
+            print('%9d %12.2f %14s %8s' % (deleted, bulk, single, 'ok' if ok else 'FAILED'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Streaming export memory and latency.
+
+Builds a temporary SQLite database from the migrations with one event holding
+N registrations, then streams the participants export as CSV and XLSX through
+``exports.stream_export``.  Reports time to the first chunk, total time,
+bytes produced and peak Python memory (``tracemalloc``), which should stay
+flat as N grows.
+
+    python benchmarks/bench_export.py --rows 100000 1000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate  # noqa: E402
+from exports import stream_export  # noqa: E402
+
+
+class _Db:
+    """Just enough of app.DbWrapper for stream_export."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, name=None):
+        return self._conn.cursor()
+
+
+def build(path, rows):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate.upgrade(conn, 'sqlite')
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("INSERT INTO Event (name) VALUES ('Bench Event')")
+    emails = ['p%07d@example.com' % i for i in range(rows)]
+    conn.executemany("INSERT INTO Student (email, name, roll_number, password) VALUES (?, ?, ?, 'x')",
+                     ((e, 'Student %d' % i, 'R%d' % i) for i, e in enumerate(emails)))
+    conn.executemany("INSERT INTO EventRegistration (event, student_email) VALUES ('Bench Event', ?)",
+                     ((e,) for e in emails))
+    conn.commit()
+    return conn
+
+
+def measure(conn, fmt, batch_size):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in stream_export(_Db(conn), 'participants', fmt, 'Bench Event', batch_size=batch_size):
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first * 1000, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print('%9s  %-5s %12s %9s %10s %10s' % ('rows', 'fmt', 'first ms', 'total s', 'MiB out', 'peak KiB'))
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = build(os.path.join(tmp, 'bench.db'), rows)
+            for fmt in ('csv', 'xlsx'):
+                first, total, size, peak = measure(conn, fmt, args.batch_size)
+                print('%9d  %-5s %12.2f %9.2f %10.1f %10.1f' % (rows, fmt, first, total, size / 2 ** 20, peak / 1024))
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
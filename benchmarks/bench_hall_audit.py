@@ -0,0 +1,137 @@
+"""Hall audit at scale, and what it costs concurrent bookings.
+
+Fills a temporary SQLite database (production profile, WAL) with
+``--bookings`` bookings over ``--halls`` halls, knocks the vacancy of a few
+halls off and orphans a few bookings, then reports
+
+* how long ``hall_audit.audit`` and ``hall_audit.repair`` take, and
+* booking latency from another thread with and without audits running back
+  to back, to show that auditing does not hold up bookings.
+
+    python benchmarks/bench_hall_audit.py --bookings 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hall_audit  # noqa: E402
+import migrate  # noqa: E402
+import sqlite_profile  # noqa: E402
+from booking import BookingError, book_hall  # noqa: E402
+
+
+def build(path, bookings, halls, spare):
+    conn = sqlite_profile.connect(path)
+    migrate.upgrade(conn, 'sqlite')
+    rng = random.Random(7)
+    capacity = [rng.randrange(bookings // halls + 50, bookings // halls * 2 + 100) for _ in range(halls)]
+    hall_names = ['Hall %04d' % i for i in range(halls)]
+    people = ['guest%07d@bench.test' % i for i in range(bookings + spare)]
+    conn.executemany("INSERT INTO CustomUser (email, password, role) VALUES (?, 'x', 'EXTERNAL')",
+                     [(email,) for email in people])
+    conn.executemany("INSERT INTO ExternalParticipant (email, name, college_name, password) VALUES (?, ?, ?, 'x')",
+                     [(email, email, 'College %d' % (i % 40)) for i, email in enumerate(people)])
+    booked = [0] * halls
+    rows = []
+    for email in people[:bookings]:
+        hall = rng.randrange(halls)
+        while booked[hall] >= capacity[hall]:
+            hall = (hall + 1) % halls
+        booked[hall] += 1
+        rows.append((email, email, hall_names[hall]))
+    conn.executemany("INSERT INTO Hall (name, location, capacity, vacancy, price) VALUES (?, 'Bench', ?, ?, 200)",
+                     [(name, capacity[i], capacity[i] - booked[i]) for i, name in enumerate(hall_names)])
+    conn.executemany("INSERT INTO Accomadation (name_par, email, name_hall, price) VALUES (?, ?, ?, 200)", rows)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn, hall_names, people[bookings:]
+
+
+def damage(conn, hall_names):
+    conn.execute('PRAGMA foreign_keys = OFF')
+    for name in hall_names[:5]:
+        conn.execute("UPDATE Hall SET vacancy = vacancy + 3 WHERE name = ?", (name,))
+    conn.execute("DELETE FROM ExternalParticipant WHERE email IN (SELECT email FROM Accomadation ORDER BY id LIMIT 10)")
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = ON')
+
+
+def booking_latency(path, emails, hall_names):
+    conn = sqlite_profile.connect(path)
+    samples = []
+    for email in emails:
+        started = time.perf_counter()
+        try:
+            book_hall(conn, email, random.choice(hall_names))
+        except BookingError:
+            pass  # a full hall is answered just as quickly
+        samples.append(time.perf_counter() - started)
+    conn.close()
+    return samples
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--halls', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=10, help='timed audits')
+    parser.add_argument('--concurrent-bookings', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'audit.db')
+        conn, hall_names, spare = build(path, args.bookings, args.halls, 2 * args.concurrent_bookings)
+        damage(conn, hall_names)
+
+        timings = []
+        for _ in range(args.repeat):
+            report = hall_audit.audit(conn)
+            timings.append(report['elapsed'])
+        print('audit of %d bookings in %d halls: median %.0f ms, max %.0f ms' % (
+            report['bookings'], report['halls'], statistics.median(timings) * 1000, max(timings) * 1000))
+        print('found %d drifted hall(s), %d orphaned booking(s), %d broken account(s)' % (
+            len(report['drift']), len(report['orphaned_bookings']), len(report['broken_accounts'])))
+        started = time.perf_counter()
+        repaired = hall_audit.repair(conn, report, accounts=True)
+        print('repair: %d hall(s) in %.0f ms; clean afterwards: %s' % (
+            len(repaired), (time.perf_counter() - started) * 1000, not hall_audit.problems(hall_audit.audit(conn))))
+
+        half = args.concurrent_bookings
+        quiet = booking_latency(path, spare[:half], hall_names)
+        stop, audits = threading.Event(), []
+
+        def keep_auditing():
+            auditor = sqlite_profile.connect(path)
+            while not stop.is_set():
+                audits.append(hall_audit.audit(auditor)['elapsed'])
+            auditor.close()
+
+        thread = threading.Thread(target=keep_auditing)
+        thread.start()
+        try:
+            busy = booking_latency(path, spare[half:2 * half], hall_names)
+        finally:
+            stop.set()
+            thread.join()
+        print('booking latency p50/p99: %.2f/%.2f ms alone, %.2f/%.2f ms during %d back-to-back audits' % (
+            percentile(quiet, 0.5), percentile(quiet, 0.99), percentile(busy, 0.5), percentile(busy, 0.99),
+            len(audits)))
+        print('drift after concurrent bookings: %d hall(s)' % len(hall_audit.audit(conn)['drift']))
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
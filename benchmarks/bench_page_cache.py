@@ -0,0 +1,130 @@
+"""Page cache: requests per second for cached pages, with and without the cache.
+
+Seeds a temporary SQLite database with ``--halls`` halls, renders stand-in
+templates (the page shells extend a base layout and include the shared
+event-list fragment through ``cached_fragment``) and requests ``/``,
+``/contact.html`` and ``/hall_portal/`` ``--requests`` times each through the
+test client, first with the page cache disabled and then enabled.  A booking
+is published every ``--write-every`` hall portal requests, so the hall page
+is re-rendered at that rate.  Also reports the cache's hit ratios and memory
+and how long a cold worker takes to compile the templates with and without
+the Jinja bytecode cache.
+
+    python benchmarks/bench_page_cache.py --requests 2000 --halls 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+TEMPLATES = {
+    'base.html': """<!doctype html><html><head><title>{% block title %}CFMS{% endblock %}</title></head><body>
+<nav>{% for label in ['Home', 'Events', 'Halls', 'Contact', 'Sponsors', 'Login'] %}<a href="#">{{ label }}</a>
+{% endfor %}</nav>{% block content %}{% endblock %}
+<aside>{{ cached_fragment('fragments/event_list.html', 'events', events=events) }}</aside></body></html>""",
+    'fragments/event_list.html': """<ul>{% for e in events %}<li>{{ e.name }} &mdash; {{ e.date_time }}
+at {{ e.location }}: {{ e.description|truncate(80) }}</li>{% endfor %}</ul>""",
+    'homepage.html': """{% extends 'base.html' %}{% block content %}<h1>Welcome</h1>
+{% for i in range(40) %}<p class="feature-{{ i }}">{{ 'Feature %d'|format(i) }}</p>{% endfor %}{% endblock %}""",
+    'contact.html': """{% extends 'base.html' %}{% block content %}<h1>Contact</h1>
+{% for i in range(20) %}<p>{{ 'Desk %d'|format(i) }}: desk{{ i }}@cfms.test</p>{% endfor %}{% endblock %}""",
+    'bookedhalls.html': """{% extends 'base.html' %}{% block content %}<table>{% for h in halls %}
+<tr><td>{{ h['name'] }}</td><td>{{ h['location'] }}</td><td>{{ h['vacancy'] }}</td><td>{{ h['price'] }}</td></tr>
+{% endfor %}</table>{% endblock %}""",
+}
+
+
+def write_templates(root):
+    for name, source in TEMPLATES.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(source)
+
+
+def seed(path, halls):
+    import migrate
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    migrate.upgrade(conn, 'sqlite')
+    conn.executemany("INSERT INTO Hall (name, location, capacity, vacancy, price) VALUES (?, 'Bench', 100, 100, 200)",
+                     [('Hall %04d' % i,) for i in range(halls)])
+    conn.commit()
+    conn.close()
+
+
+def run(cfms, client, urls, requests, write_every):
+    results = {}
+    for url in urls:
+        started = time.perf_counter()
+        for i in range(requests):
+            if url == '/hall_portal/' and write_every and i % write_every == 0:
+                cfms.publish_vacancy({'Hall 0000': 100})
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+        results[url] = requests / (time.perf_counter() - started)
+    return results
+
+
+def compile_time(root, bytecode_dir):
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    env = Environment(loader=FileSystemLoader(root),
+                      bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None)
+    started = time.perf_counter()
+    for name in TEMPLATES:
+        env.get_template(name)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='requests per page and mode')
+    parser.add_argument('--halls', type=int, default=200)
+    parser.add_argument('--write-every', type=int, default=100, help='hall portal requests per booking (0: none)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'pages.db')
+        root = os.path.join(tmp, 'templates')
+        write_templates(root)
+        seed(path, args.halls)
+        os.environ.update(SQLITE_PATH=path, DATABASE_URL='sqlite:///' + path, HALL_AUDIT_INTERVAL='0')
+
+        from jinja2 import FileSystemLoader
+        import app as cfms
+
+        cfms.app.jinja_loader = FileSystemLoader(root)
+        client = cfms.app.test_client()
+        urls = ['/', '/contact.html', '/hall_portal/']
+
+        enabled = cfms.page_cache.max_bytes
+        cfms.page_cache.max_bytes = 0
+        off = run(cfms, client, urls, args.requests, args.write_every)
+        cfms.page_cache.max_bytes = enabled
+        on = run(cfms, client, urls, args.requests, args.write_every)
+
+        print('%-16s %12s %12s %8s' % ('page', 'uncached r/s', 'cached r/s', 'speedup'))
+        for url in urls:
+            print('%-16s %12.0f %12.0f %7.1fx' % (url, off[url], on[url], on[url] / off[url]))
+        stats = cfms.page_cache.stats()
+        print('page hit ratio %.3f, fragment hit ratio %.3f, %d entries, %.1f KiB of %.0f MiB' % (
+            stats['page_hit_ratio'], stats['fragment_hit_ratio'], stats['entries'], stats['bytes'] / 1024.0,
+            stats['max_bytes'] / 1048576.0))
+
+        bytecode_dir = os.path.join(tmp, 'bytecode')
+        os.makedirs(bytecode_dir)
+        cold = compile_time(root, None)
+        compile_time(root, bytecode_dir)  # fills the bytecode cache
+        warm = compile_time(root, bytecode_dir)
+        print('template load in a fresh worker: %.1f ms compiling, %.1f ms from the bytecode cache' % (
+            cold * 1000, warm * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Whole-table reads vs keyset pages.
+
+Fills a temporary SQLite database built from the migrations with one hall
+holding N bookings and times what ``hall_details`` used to do (fetch every
+booking) against fetching the first and a deep page with ``fetch_page``.
+Peak Python memory per request is measured with ``tracemalloc``.
+
+    python benchmarks/bench_pagination.py --rows 1000 10000 100000 --limit 50
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate  # noqa: E402
+from pagination import fetch_page  # noqa: E402
+
+QUERY = "SELECT id, email, name_par FROM Accomadation WHERE name_hall = ?"
+
+
+def build(path, rows):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate.upgrade(conn, 'sqlite')
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("INSERT INTO Hall (name, location, vacancy, price) VALUES ('Bench Hall', 'x', 0, 200)")
+    conn.executemany("INSERT INTO Accomadation (name_par, email, name_hall, price) VALUES (?, ?, 'Bench Hall', 200)",
+                     (('P%d' % i, 'p%d@example.com' % i) for i in range(rows)))
+    conn.commit()
+    return conn
+
+
+def measure(fn, repeat):
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print('%8s  %-12s %10s %10s' % ('rows', 'read', 'ms/req', 'peak KiB'))
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = build(os.path.join(tmp, 'bench.db'), rows)
+            cur = conn.cursor()
+
+            def full():
+                cur.execute(QUERY, ('Bench Hall',))
+                return cur.fetchall()
+
+            def first():
+                return fetch_page(cur, QUERY, ('Bench Hall',), 'id', size=args.limit)
+
+            def deep():
+                # Half way through the hall, as if the user had paged there.
+                return fetch_page(cur, QUERY, ('Bench Hall',), 'id', after=rows // 2, size=args.limit)
+
+            for label, fn in (('fetchall', full), ('first page', first), ('deep page', deep)):
+                ms, kib = measure(fn, args.repeat)
+                print('%8d  %-12s %10.3f %10.1f' % (rows, label, ms, kib))
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Logins per second per core for a password hashing method.
+
+Measures verification throughput of ``PasswordHasher`` on one thread and
+with ``--workers`` threads submitting concurrently, so the cost setting
+(``PASSWORD_HASH_METHOD``) can be chosen against the expected login rush.
+
+    python benchmarks/bench_password_hash.py --method scrypt --logins 40
+    python benchmarks/bench_password_hash.py --method pbkdf2:sha256:600000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'))
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(method=args.method, workers=args.workers, max_queue=args.logins)
+    stored = hasher.hash('correct horse battery staple')
+    print('method %s (%s), %d CPU(s)' % (args.method, hasher.hash_prefix(), os.cpu_count() or 1))
+
+    started = time.perf_counter()
+    for _ in range(args.logins):
+        assert hasher.verify(stored, 'correct horse battery staple')
+    serial = time.perf_counter() - started
+    print('1 thread:   %6.1f logins/s  (%.1f ms per verification)' % (
+        args.logins / serial, serial / args.logins * 1000))
+
+    def login():
+        assert hasher.verify(stored, 'correct horse battery staple')
+
+    threads = [threading.Thread(target=login) for _ in range(args.logins)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pooled = time.perf_counter() - started
+    rate = args.logins / pooled
+    print('%d workers: %6.1f logins/s  (%.1f logins/s per core)' % (
+        args.workers, rate, rate / (os.cpu_count() or 1)))
+
+
+if __name__ == '__main__':
+    main()
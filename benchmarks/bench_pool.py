@@ -0,0 +1,97 @@
+"""Connect-per-request vs pooled connections.
+
+No Postgres server is needed: connections go to a temporary SQLite file and
+``--connect-ms`` adds a sleep to every new connection to stand in for the
+TCP + auth handshake that ``psycopg2.connect`` pays.
+
+    python benchmarks/bench_pool.py --requests 2000 --threads 8 --connect-ms 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import ConnectionPool  # noqa: E402
+
+
+def make_connect(path, connect_ms):
+    def connect():
+        time.sleep(connect_ms / 1000.0)
+        return sqlite3.connect(path, check_same_thread=False)
+    return connect
+
+
+def handle_request(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT name, description FROM Event WHERE name = ?", ('Coding Contest',))
+    cur.fetchone()
+
+
+def run(label, checkout, checkin, requests, threads):
+    latencies = []
+    lock = threading.Lock()
+    per_thread = requests // threads
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            conn = checkout()
+            try:
+                handle_request(conn)
+            finally:
+                checkin(conn)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print('%-10s %8.0f req/s  p50 %7.2f ms  p99 %7.2f ms  mean %7.2f ms' % (
+        label, len(latencies) / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+        statistics.mean(latencies) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--connect-ms', type=float, default=5.0)
+    parser.add_argument('--pool-max', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE Event (name VARCHAR(200) PRIMARY KEY, description TEXT)")
+        conn.execute("INSERT INTO Event VALUES ('Coding Contest', 'Programming competition')")
+        conn.commit()
+        conn.close()
+
+        connect = make_connect(path, args.connect_ms)
+        run('connect', connect, lambda c: c.close(), args.requests, args.threads)
+
+        pool = ConnectionPool(connect, minconn=1, maxconn=args.pool_max)
+        run('pooled', pool.acquire, pool.release, args.requests, args.threads)
+        stats = pool.stats()
+        print('pool: connects=%(connects)d checkouts=%(checkouts)d '
+              'wait avg=%(wait_time_avg).5fs max=%(wait_time_max).5fs' % stats)
+        pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Concurrent reads and writes: legacy SQLite vs the production profile.
+
+``legacy`` is what the app did before: a new connection per request with
+SQLite's default rollback journal.  ``production`` reuses one connection per
+thread with WAL, synchronous=NORMAL, busy_timeout, mmap and a larger page
+cache (see sqlite_profile.py).  Each thread runs a mix of dashboard-style
+reads and registration-style writes against a migrated temporary database.
+
+    python benchmarks/bench_sqlite_profile.py --threads 8 --requests 4000 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate  # noqa: E402
+import sqlite_profile  # noqa: E402
+from db_pool import ThreadLocalConnections  # noqa: E402
+
+
+def prepare(path, students):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate.upgrade(conn, 'sqlite')
+    conn.executemany("INSERT INTO CustomUser (email, password, role) VALUES (?, 'x', 'STUDENT')",
+                     (('s%d@example.com' % i,) for i in range(students)))
+    conn.commit()
+    conn.close()
+
+
+def read(conn):
+    conn.execute("SELECT * FROM Event ORDER BY name").fetchall()
+    conn.execute("SELECT * FROM Hall ORDER BY name").fetchall()
+
+
+def write(conn, email, event):
+    conn.execute("INSERT OR IGNORE INTO EventRegistration (event, student_email) VALUES (?, ?)", (event, email))
+    conn.commit()
+
+
+def run(profile, path, threads, requests, write_ratio, students):
+    events = ['Battle of Bands', 'Dance Competition', 'Coding Contest', 'Art Exhibition', 'Sports Meet']
+    if profile == 'legacy':
+        def checkout():
+            return sqlite_profile.connect(path, 'legacy')
+
+        def checkin(conn):
+            conn.close()
+    else:
+        local = ThreadLocalConnections(lambda: sqlite_profile.connect(path, profile))
+        checkout, checkin = local.acquire, local.release
+
+    reads, writes, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        my_reads, my_writes, my_errors = [], [], 0
+        for _ in range(requests // threads):
+            is_write = rng.random() < write_ratio
+            started = time.perf_counter()
+            conn = checkout()
+            try:
+                if is_write:
+                    write(conn, 's%d@example.com' % rng.randrange(students), rng.choice(events))
+                else:
+                    read(conn)
+            except sqlite3.OperationalError:
+                my_errors += 1
+            finally:
+                checkin(conn)
+            (my_writes if is_write else my_reads).append(time.perf_counter() - started)
+        with lock:
+            reads.extend(my_reads)
+            writes.extend(my_writes)
+            errors.append(my_errors)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return elapsed, reads, writes, sum(errors)
+
+
+def pct(values, q):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--students', type=int, default=5000)
+    args = parser.parse_args()
+
+    print('%-11s %9s %12s %12s %13s %13s %7s' % ('profile', 'req/s', 'read p50 ms', 'read p95 ms',
+                                                 'write p50 ms', 'write p95 ms', 'errors'))
+    for profile in ('legacy', 'production'):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            prepare(path, args.students)
+            elapsed, reads, writes, errors = run(profile, path, args.threads, args.requests,
+                                                 args.write_ratio, args.students)
+            print('%-11s %9.0f %12.2f %12.2f %13.2f %13.2f %7d' % (
+                profile, (len(reads) + len(writes)) / elapsed, pct(reads, 50), pct(reads, 95),
+                pct(writes, 50), pct(writes, 95), errors))
+
+
+if __name__ == '__main__':
+    main()
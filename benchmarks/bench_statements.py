@@ -0,0 +1,81 @@
+"""Per-call cost of placeholder translation, and optionally of server-side PREPARE.
+
+The first part needs no database: it times the old ``query.replace('?', '%s')``
+against ``statements.translate`` on a cold and on a warm cache, using the
+statements the login and registration paths run.  With ``--dsn`` pointing at
+a PostgreSQL database it also times those lookups through a plain cursor and
+through prepared statements.
+
+    python benchmarks/bench_statements.py --calls 200000
+    python benchmarks/bench_statements.py --dsn postgresql://localhost/cfms --queries 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import statements  # noqa: E402
+
+HOT = [
+    "SELECT * FROM CustomUser WHERE email = ?",
+    "SELECT name FROM Student WHERE email = ?",
+    "SELECT * FROM EventRegistration WHERE event = ? AND student_email = ?",
+    "INSERT INTO EventRegistration (event, student_email, registered_at) VALUES (?, ?, ?)",
+    "SELECT * FROM Volunteer WHERE student_email = ? AND event_name = ?",
+]
+
+
+def per_call(fn, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        fn(HOT[i % len(HOT)])
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def translation(calls):
+    print('%-28s %10s' % ('translation', 'ns/call'))
+    print('%-28s %10.0f' % ("str.replace('?', '%s')", per_call(lambda q: q.replace('?', '%s'), calls)))
+    print('%-28s %10.0f' % ('translate (uncached scan)', per_call(statements.translate.__wrapped__, calls)))
+    statements.translate.cache_clear()
+    print('%-28s %10.0f' % ('translate (LRU cache)', per_call(statements.translate, calls)))
+
+
+def prepared(dsn, queries):
+    import psycopg2
+
+    def run(conn, threshold):
+        if threshold:
+            conn.prepared = statements.PreparedStatements(threshold, 100)
+        cur = conn.cursor()
+        sql = statements.translate("SELECT * FROM CustomUser WHERE email = ?")
+        started = time.perf_counter()
+        for i in range(queries):
+            statements.execute(cur, sql, ['user%d@example.com' % (i % 100)])
+            cur.fetchall()
+        conn.rollback()
+        return (time.perf_counter() - started) / queries * 1e6
+
+    print('\n%-28s %10s' % ('postgres lookup', 'us/query'))
+    conn = psycopg2.connect(dsn, connection_factory=statements.PreparingConnection)
+    try:
+        print('%-28s %10.1f' % ('plain execute', run(conn, 0)))
+        print('%-28s %10.1f' % ('prepared after 1 use', run(conn, 1)))
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--dsn', help='PostgreSQL DSN for the prepared statement comparison')
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+    translation(args.calls)
+    if args.dsn:
+        prepared(args.dsn, args.queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Hall vacancy stream fan-out: database reads against subscriber count.
+
+Starts the app in a threaded WSGI server on a temporary SQLite database,
+opens ``--subscribers`` connections to ``/hall_portal/stream/`` for each
+round, books ``--bookings`` halls through ``/mybooking_portal/`` and waits
+until every subscriber has seen the last change.  The vacancy map is read
+from the database once per process (plus one resync per
+``VACANCY_RESYNC_SECONDS``), so the "hall reads" column must not grow with
+the number of subscribers; the script exits non-zero if it does or if a
+subscriber misses the final vacancy.
+
+    python benchmarks/bench_vacancy_stream.py --subscribers 10 100 1000 --bookings 20
+"""
+import argparse
+import json
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def seed(path, externals):
+    import migrate
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate.upgrade(conn, 'sqlite')
+    conn.executemany("INSERT INTO CustomUser (email, password, role) VALUES (?, 'x', 'EXTERNAL')",
+                     [(e,) for e in externals])
+    conn.executemany("INSERT INTO ExternalParticipant (email, name, college_name, password) "
+                     "VALUES (?, ?, 'Bench College', 'x')", [(e, e.split('@')[0]) for e in externals])
+    conn.execute("UPDATE Hall SET vacancy = ?", (len(externals),))
+    halls = [row['name'] for row in conn.execute("SELECT name FROM Hall ORDER BY name")]
+    conn.commit()
+    conn.close()
+    return halls
+
+
+class Subscriber:
+    def __init__(self, port):
+        self.sock = socket.create_connection(('127.0.0.1', port), timeout=30)
+        self.sock.sendall(b'GET /hall_portal/stream/ HTTP/1.0\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n')
+        self.sock.setblocking(False)
+        self.buffer = b''
+        self.headers_done = False
+        self.version = -1
+        self.halls = {}
+        self.frames = 0
+
+    def feed(self, data):
+        self.buffer += data
+        if not self.headers_done:
+            if b'\r\n\r\n' not in self.buffer:
+                return
+            head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+            if not head.startswith(b'HTTP/1.0 200') and not head.startswith(b'HTTP/1.1 200'):
+                raise RuntimeError(head.split(b'\r\n', 1)[0].decode())
+            self.headers_done = True
+        while b'\n\n' in self.buffer:
+            frame, self.buffer = self.buffer.split(b'\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in frame.decode('utf-8').split('\n')
+                          if ': ' in line and not line.startswith(':'))
+            if 'data' not in fields:
+                continue
+            self.frames += 1
+            if fields.get('event') == 'snapshot':
+                self.halls = json.loads(fields['data'])
+            else:
+                self.halls.update(json.loads(fields['data']))
+            self.version = int(fields['id'])
+
+
+def pump(subscribers, done, timeout):
+    """Read every socket until ``done(subscriber)`` holds for all of them."""
+    selector = selectors.DefaultSelector()
+    pending = set()
+    for sub in subscribers:
+        if not done(sub):
+            selector.register(sub.sock, selectors.EVENT_READ, sub)
+            pending.add(sub)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            sub = key.data
+            data = sub.sock.recv(65536)
+            if not data:
+                raise RuntimeError('stream closed early')
+            sub.feed(data)
+            if done(sub):
+                selector.unregister(sub.sock)
+                pending.discard(sub)
+    selector.close()
+    return len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--bookings', type=int, default=20, help='bookings made while each round watches')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, 'stream.db')
+    externals = ['ext%05d@bench.test' % i for i in range(args.bookings * len(args.subscribers))]
+    halls = seed(path, externals)
+    os.environ.update(SQLITE_PATH=path, DATABASE_URL='sqlite:///' + path, VACANCY_STREAM_HEARTBEAT='1',
+                      VACANCY_STREAM_MAX=str(max(args.subscribers) + 16), SLOW_QUERY_MS='0')
+
+    import logging
+    from werkzeug.serving import make_server
+    import app as cfms
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, cfms.app, threaded=True)
+    server.socket.listen(4096)
+    port = server.socket.getsockname()[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = cfms.app.test_client()
+    booker = iter(externals)
+
+    print('%12s %12s %12s %14s %12s' % ('subscribers', 'bookings', 'hall reads', 'fan-out ms', 'frames'))
+    failed = False
+    reads = None
+    for count in args.subscribers:
+        loads_before = cfms.vacancy_feed.stats()['loads']
+        subscribers = [Subscriber(port) for _ in range(count)]
+        missed = pump(subscribers, lambda s: s.version >= 0, args.timeout)
+        if missed:
+            raise RuntimeError('%d subscribers got no snapshot' % missed)
+
+        started = time.perf_counter()
+        for i in range(args.bookings):
+            with client.session_transaction() as sess:
+                sess['user_email'] = next(booker)
+                sess['user_role'] = 'EXTERNAL'
+            client.post('/mybooking_portal/', data={'name_hall': halls[i % len(halls)]})
+        final = cfms.vacancy_feed.stats()['version']
+        missed = pump(subscribers, lambda s: s.version >= final, args.timeout)
+        elapsed = time.perf_counter() - started
+
+        with cfms.app.app_context():
+            expected = dict(cfms.load_hall_vacancy())
+        wrong = sum(1 for s in subscribers if s.halls != expected)
+        round_reads = cfms.vacancy_feed.stats()['loads'] - loads_before
+        frames = sum(s.frames for s in subscribers)
+        print('%12d %12d %12d %14.1f %12d' % (count, args.bookings, round_reads, elapsed * 1000, frames))
+        if missed or wrong:
+            print('  %d subscribers missed the last change, %d disagree with the database' % (missed, wrong))
+            failed = True
+        if reads is not None and round_reads > max(reads, 1):
+            failed = True
+        reads = round_reads
+        for sub in subscribers:
+            sub.sock.close()
+
+    print('feed stats:', cfms.vacancy_feed.stats())
+    server.shutdown()
+    tmp.cleanup()
+    if failed:
+        sys.exit('FAILED: hall reads grew with subscribers or a subscriber fell out of sync')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Email outbox against a local SMTP stand-in.
+
+Starts a minimal SMTP server on localhost, points the outbox at it and
+queues ``--messages`` emails, then checks that
+
+* a clean batch is sent over one SMTP connection,
+* a message the server refuses is retried after ``OUTBOX_BACKOFF_BASE``
+  seconds, doubled on the next failure, is not picked up again before then,
+  and is left as dead after ``--max-attempts`` failures, and
+* ``queue_depth``/``dead`` in ``OutboxSender.stats()`` match the table.
+
+Exits non-zero on any violation.
+
+    python benchmarks/check_outbox.py --messages 20
+"""
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Accepts everything except mail to the addresses in ``refuse``."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.delivered = []
+        self.refuse = set()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost stand-in')
+        recipients = []
+        for raw in self.rfile:
+            verb = raw.decode('utf-8', 'replace').strip().split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = raw.decode('utf-8').split(':', 1)[1].strip().strip('<>')
+                if address in server.refuse:
+                    self.reply('450 mailbox busy, try later')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                for line in self.rfile:
+                    if line in (b'.\r\n', b'.\n'):
+                        break
+                with server.lock:
+                    server.delivered.extend(recipients)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:  # RSET, NOOP
+                self.reply('250 OK')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--backoff-base', type=float, default=30.0)
+    args = parser.parse_args()
+
+    smtp = SMTPStandIn()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'outbox.db')
+        os.environ.update(DATABASE_URL='sqlite:///' + path, SQLITE_PATH=os.path.join(tmp, 'cfms.db'),
+                          MAIL_SERVER='127.0.0.1', MAIL_PORT=str(smtp.server_address[1]),
+                          MAIL_USERNAME='outbox-check')
+        os.environ.pop('MAIL_PASSWORD', None)
+        import app as cfms
+        from outbox import OutboxSender
+
+        sa_app, db, model = cfms.outbox_sender.app, cfms.db, cfms.EmailOutbox
+        sa_app.config['MAIL_USE_TLS'] = False  # the stand-in does not speak STARTTLS
+        cfms.mail.init_app(sa_app)
+        sender = OutboxSender(sa_app, db, model, cfms.mail, batch_size=args.messages,
+                              max_attempts=args.max_attempts, backoff_base=args.backoff_base)
+        failures = []
+
+        def check(ok, message):
+            print('%s %s' % ('ok  ' if ok else 'FAIL', message))
+            if not ok:
+                failures.append(message)
+
+        def queue(recipients):
+            with sa_app.app_context():
+                db.create_all()
+                for recipient in recipients:
+                    cfms.send_email(recipient, 'Registration', 'Welcome, %s' % recipient)
+                db.session.commit()
+
+        def make_due(recipient):
+            with sa_app.app_context():
+                row = model.query.filter_by(recipient=recipient).one()
+                row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+                db.session.commit()
+
+        def row(recipient):
+            with sa_app.app_context():
+                found = model.query.filter_by(recipient=recipient).one()
+                db.session.expunge(found)
+                return found
+
+        # 1. A clean batch goes out over a single connection.
+        good = ['guest%03d@check.test' % i for i in range(args.messages)]
+        queue(good)
+        check(sender.stats()['queue_depth'] == len(good), 'queue_depth counts %d queued messages' % len(good))
+        attempted = sender.drain_once()
+        check(attempted == len(good) and sorted(smtp.delivered) == good,
+              'batch of %d delivered (attempted %d, delivered %d)' % (len(good), attempted, len(smtp.delivered)))
+        check(smtp.connections == 1 and sender.stats()['smtp_connects'] == 1,
+              'one SMTP connection for the batch (server saw %d)' % smtp.connections)
+        check(sender.stats()['queue_depth'] == 0, 'queue_depth is 0 after the batch')
+
+        # 2. A refused message backs off, doubling, and ends up dead.
+        bounced = 'busy@check.test'
+        smtp.refuse.add(bounced)
+        queue([bounced])
+        for attempt in range(1, args.max_attempts + 1):
+            before = datetime.utcnow()
+            sender.drain_once()
+            failed = row(bounced)
+            delay = (failed.next_attempt_at - before).total_seconds()
+            expected = args.backoff_base * 2 ** (attempt - 1)
+            check(failed.attempts == attempt and failed.sent_at is None and expected - 1 <= delay <= expected + 1,
+                  'attempt %d refused, retry in %.0fs (expected %.0fs)' % (attempt, delay, expected))
+            if attempt == 1:
+                check(sender.drain_once() == 0, 'not retried before its backoff has passed')
+            if attempt < args.max_attempts:
+                stats = sender.stats()
+                check(stats['queue_depth'] == 1 and stats['dead'] == 0, 'still pending after %d attempt(s)' % attempt)
+                make_due(bounced)
+        stats = sender.stats()
+        check(stats['queue_depth'] == 0 and stats['dead'] == 1,
+              'dead after %d attempts (queue_depth %d, dead %d)' % (args.max_attempts, stats['queue_depth'],
+                                                                    stats['dead']))
+        check(sender.drain_once() == 0, 'dead message is not retried')
+
+        # 3. A refusal in the middle of a batch does not stop the rest, and the
+        #    retry succeeds once the server accepts it again.
+        flaky = 'flaky@check.test'
+        smtp.refuse = {flaky}
+        rest = ['late%03d@check.test' % i for i in range(3)]
+        queue([flaky] + rest)
+        check(sender.stats()['queue_depth'] == 4, 'queue_depth counts 4 new messages')
+        sender.drain_once()
+        check(all(row(r).sent_at is not None for r in rest) and row(flaky).sent_at is None,
+              'rest of the batch sent after a refusal')
+        check(sender.stats()['queue_depth'] == 1, 'queue_depth is 1 with the refused message pending')
+        smtp.refuse = set()
+        make_due(flaky)
+        sender.drain_once()
+        retried = row(flaky)
+        check(retried.sent_at is not None and retried.attempts == 2 and retried.last_error is None,
+              'retry delivered on attempt %d' % retried.attempts)
+        stats = sender.stats()
+        check(stats['queue_depth'] == 0 and stats['dead'] == 1 and stats['sent'] == len(good) + 4,
+              'final stats: sent %d, queue_depth %d, dead %d' % (stats['sent'], stats['queue_depth'], stats['dead']))
+
+    smtp.shutdown()
+    if failures:
+        print('FAIL: %d check(s) failed' % len(failures))
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+"""Fest-day load test against a local server on the SQLite backend.
+
+Builds a throwaway database (migrations plus seeded students, external
+participants, organisers and organiser assignments), starts the app in a
+threaded WSGI server in a child process and drives it with scripted
+scenarios from concurrent virtual users:
+
+* ``registration_rush``   - new students and external participants signing up
+* ``login_storm``         - seeded users logging in
+* ``dashboard_browsing``  - logged-in students revalidating their dashboard and the hall list
+* ``booking_stampede``    - external participants logging in and booking the popular halls
+* ``event_details_polling`` - organisers refreshing event rosters
+
+Throughput, status codes and p50/p95/p99 latency are reported per route and
+written to JSON; ``--compare`` prints the change against an earlier run.
+A scenario with any failed request (connection error or 5xx) is reported as
+failed and makes the script exit non-zero, since its latencies do not
+measure the real work.  Templates missing from ``templates/`` are served
+from a small stub, so without the real templates the numbers leave out
+most of the rendering cost.
+
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --scenario login_storm --users 32 --duration 20
+    python benchmarks/loadtest.py --out after.json --compare before.json
+"""
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+PASSWORD = 'loadtest-password'
+# Sign-ups pile onto a few headline events and the nearest halls.
+EVENT_WEIGHTS = [50, 20, 15, 10, 5]
+HALL_WEIGHTS = [60, 20, 10, 6, 4]
+
+SCENARIOS = {}
+
+
+def scenario(fn):
+    SCENARIOS[fn.__name__] = fn
+    return fn
+
+
+class Client:
+    """One virtual user: a cookie jar and the latency records of its requests."""
+
+    def __init__(self, port, timeout):
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self.etags = {}
+        self.records = []
+        self.recording = True
+
+    def request(self, method, path, form=None, revalidate=False):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join('%s=%s' % item for item in self.cookies.items())
+        if revalidate and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        route = path.split('?', 1)[0]
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            for header in response.headers.get_all('Set-Cookie') or []:
+                name, _, value = header.split(';', 1)[0].partition('=')
+                self.cookies[name.strip()] = value
+            if response.headers.get('ETag'):
+                self.etags[path] = response.headers['ETag']
+        except (OSError, http.client.HTTPException):
+            status = 0
+        finally:
+            conn.close()
+        if self.recording:
+            self.records.append((method + ' ' + route, status, time.perf_counter() - started))
+        return status
+
+    def login(self, email):
+        self.cookies.clear()
+        return self.request('POST', '/login/', {'email': email, 'password': PASSWORD})
+
+
+def _setup(client, fn, *args):
+    client.recording = False
+    try:
+        return fn(*args)
+    finally:
+        client.recording = True
+
+
+@scenario
+def registration_rush(client, rng, ctx, state):
+    n = next(ctx['signups'])
+    email = 'rush%d@load.test' % n
+    if n % 2:
+        client.request('POST', '/student_registration/', {
+            'name': 'Rush Student %d' % n, 'email': email, 'roll_number': 'RUSH%d' % n,
+            'password': PASSWORD, 'password1': PASSWORD})
+    else:
+        client.request('POST', '/external_registration/', {
+            'name': 'Rush Guest %d' % n, 'email': email, 'college_name': 'College %d' % (n % 40),
+            'password': PASSWORD, 'password1': PASSWORD})
+
+
+@scenario
+def login_storm(client, rng, ctx, state):
+    role = rng.choice(('students', 'externals', 'organisers'))
+    client.login(rng.choice(ctx[role]))
+
+
+@scenario
+def dashboard_browsing(client, rng, ctx, state):
+    if 'logged_in' not in state:
+        _setup(client, client.login, ctx['students'][rng.randrange(len(ctx['students']))])
+        state['logged_in'] = True
+    # Browsers revalidate with the ETag they were given.
+    client.request('GET', '/student/', revalidate=True)
+    client.request('GET', '/student/?limit=2', revalidate=True)
+    client.request('GET', '/hall_portal/')
+
+
+@scenario
+def booking_stampede(client, rng, ctx, state):
+    index = next(ctx['bookers'])
+    if index >= len(ctx['externals']):
+        return False  # every external participant has had a go
+    client.login(ctx['externals'][index])
+    hall = rng.choices(ctx['halls'], weights=HALL_WEIGHTS[:len(ctx['halls'])])[0]
+    client.request('POST', '/mybooking_portal/', {'name_hall': hall})
+
+
+@scenario
+def event_details_polling(client, rng, ctx, state):
+    if 'logged_in' not in state:
+        _setup(client, client.login, rng.choice(ctx['organisers']))
+        state['logged_in'] = True
+    event = rng.choices(ctx['events'], weights=EVENT_WEIGHTS[:len(ctx['events'])])[0]
+    client.request('POST', '/event_details/', {'event': event})
+
+
+def build_database(path, args):
+    """Migrated database with seeded users; returns the context scenarios draw from."""
+    import analytics
+    import counters
+    import migrate
+    from werkzeug.security import generate_password_hash
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate.upgrade(conn, 'sqlite')
+    hashed = generate_password_hash(PASSWORD, args.hash_method)  # one hash shared by every seeded user
+    students = ['student%d@load.test' % i for i in range(args.students)]
+    externals = ['guest%d@load.test' % i for i in range(args.externals)]
+    organisers = ['organiser%d@load.test' % i for i in range(args.organisers)]
+    conn.executemany("INSERT INTO CustomUser (email, password, role) VALUES (?, ?, ?)",
+                     [(e, hashed, 'STUDENT') for e in students] + [(e, hashed, 'EXTERNAL') for e in externals]
+                     + [(e, hashed, 'ORGANIZER') for e in organisers])
+    conn.executemany("INSERT INTO Student (name, email, roll_number, password) VALUES (?, ?, ?, ?)",
+                     [('Student %d' % i, e, 'LT%d' % i, hashed) for i, e in enumerate(students)])
+    conn.executemany("INSERT INTO ExternalParticipant (name, email, college_name, password) VALUES (?, ?, ?, ?)",
+                     [('Guest %d' % i, e, 'College %d' % (i % 40), hashed) for i, e in enumerate(externals)])
+    conn.executemany("INSERT INTO Organiser (name, email, password) VALUES (?, ?, ?)",
+                     [('Organiser %d' % i, e, hashed) for i, e in enumerate(organisers)])
+    events = [row['name'] for row in conn.execute("SELECT name FROM Event ORDER BY name")]
+    halls = [row['name'] for row in conn.execute("SELECT name FROM Hall ORDER BY name")]
+    conn.executemany("INSERT INTO Event_has_organiser (event_name, org_name, org_email) VALUES (?, ?, ?)",
+                     [(event, 'Organiser %d' % i, organisers[i % len(organisers)]) for i, event in enumerate(events)])
+    rng = random.Random(args.seed)
+    registrations = {(rng.choices(events, weights=EVENT_WEIGHTS[:len(events)])[0], e) for e in students}
+    conn.executemany("INSERT INTO EventRegistration (event, student_email, registered_at) VALUES (?, ?, ?)",
+                     [(event, e, datetime.datetime(2024, 3, 1) + datetime.timedelta(seconds=i))
+                      for i, (event, e) in enumerate(sorted(registrations))])
+    conn.commit()
+    # The rows above bypass the route helpers, so recount what those maintain.
+    counters.rebuild(conn)
+    analytics.rebuild(conn)
+    conn.close()
+    return {'students': students, 'externals': externals, 'organisers': organisers,
+            'events': events, 'halls': halls}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port, args):
+    env = dict(os.environ, SQLITE_PATH=db_path, DATABASE_URL='sqlite:///' + db_path,
+               PASSWORD_HASH_METHOD=args.hash_method, SLOW_QUERY_MS='0')
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', str(port)], env=env, cwd=BASE_DIR)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('server exited with status %d' % proc.returncode)
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError('server did not start listening on port %d' % port)
+
+
+def serve(port):
+    import logging
+    from jinja2 import ChoiceLoader, FunctionLoader
+    from werkzeug.serving import make_server
+    import app as cfms
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    # Missing templates would turn every rendering route into a 500.
+    stub = '<!doctype html><title>CFMS</title><p>stub page</p>'
+    cfms.app.jinja_loader = ChoiceLoader([cfms.app.jinja_loader, FunctionLoader(lambda name: stub)])
+    with cfms.app.app_context():
+        cfms.init_db()
+    make_server('127.0.0.1', port, cfms.app, threaded=True).serve_forever()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    index = max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(name, ctx, args):
+    fn = SCENARIOS[name]
+    records = []
+    lock = threading.Lock()
+    stop = time.monotonic() + args.duration
+
+    def virtual_user(index):
+        rng = random.Random('%s-%s-%d' % (args.seed, name, index))
+        client = Client(args.port, args.timeout)
+        state = {}
+        while time.monotonic() < stop:
+            if fn(client, rng, ctx, state) is False:
+                break
+        with lock:
+            records.extend(client.records)
+
+    started = time.monotonic()
+    users = [threading.Thread(target=virtual_user, args=(i,)) for i in range(args.users)]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.monotonic() - started
+
+    by_route = {}
+    for route, status, seconds in records:
+        by_route.setdefault(route, []).append((status, seconds))
+    results = []
+    for route, samples in sorted(by_route.items()):
+        latencies = sorted(seconds for _, seconds in samples)
+        statuses = {}
+        for status, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        results.append({
+            'scenario': name,
+            'route': route,
+            'requests': len(samples),
+            'errors': sum(1 for status, _ in samples if status == 0 or status >= 500),
+            'statuses': statuses,
+            'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        })
+    return results
+
+
+def print_results(results, baseline=None):
+    previous = {(r['scenario'], r['route']): r for r in (baseline or {}).get('results', [])}
+    header = '%-22s %-32s %7s %6s %8s %9s %9s %9s' % ('scenario', 'route', 'reqs', 'errs', 'req/s',
+                                                       'p50 ms', 'p95 ms', 'p99 ms')
+    print(header + ('  %9s %8s' % ('p95 chg', 'rps chg') if previous else ''))
+    for r in results:
+        line = '%-22s %-32s %7d %6d %8.1f %9.1f %9.1f %9.1f' % (
+            r['scenario'], r['route'], r['requests'], r['errors'], r['throughput_rps'],
+            r['p50_ms'], r['p95_ms'], r['p99_ms'])
+        old = previous.get((r['scenario'], r['route']))
+        if old:
+            line += '  %+8.0f%% %+7.0f%%' % (_change(old['p95_ms'], r['p95_ms']),
+                                              _change(old['throughput_rps'], r['throughput_rps']))
+        print(line)
+    failed = failed_scenarios(results)
+    for name in failed:
+        print('FAILED: %s had %d failed request(s); its latencies are not meaningful' % (
+            name, sum(r['errors'] for r in results if r['scenario'] == name)))
+
+
+def failed_scenarios(results):
+    return sorted({r['scenario'] for r in results if r['errors']})
+
+
+def _change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run (repeatable; default: all)')
+    parser.add_argument('--users', type=int, default=16, help='concurrent virtual users per scenario')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--externals', type=int, default=2000)
+    parser.add_argument('--organisers', type=int, default=20)
+    parser.add_argument('--hash-method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'))
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--out', default='loadtest-results.json')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve)
+
+    names = args.scenario or list(SCENARIOS)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'loadtest.db')
+        ctx = build_database(db_path, args)
+        ctx['signups'] = itertools.count()
+        ctx['bookers'] = itertools.count()
+        args.port = _free_port()
+        server = start_server(db_path, args.port, args)
+        try:
+            results = []
+            for name in names:
+                print('running %s for %.0fs with %d users...' % (name, args.duration, args.users), file=sys.stderr)
+                results.extend(run_scenario(name, ctx, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'scenarios': names,
+            'templates': os.path.isdir(os.path.join(BASE_DIR, 'templates')),
+            'args': {k: v for k, v in vars(args).items() if k not in ('serve', 'port')},
+        },
+        'results': results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    print_results(results, baseline)
+    with open(args.out, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print('results written to %s' % args.out, file=sys.stderr)
+    if failed_scenarios(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
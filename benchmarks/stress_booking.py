@@ -0,0 +1,109 @@
+"""Booking stampede against a single hall.
+
+Fires ``--bookers`` simultaneous bookings (one thread and connection each) at
+one hall with ``--vacancy`` free places, then checks that the hall was never
+overbooked, every participant holds at most one booking, and vacancy plus
+bookings still equals the starting vacancy.  Exits non-zero on any violation.
+
+    python benchmarks/stress_booking.py --bookers 500 --vacancy 50
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate  # noqa: E402
+from booking import book_hall, BookingError  # noqa: E402
+
+HALL = 'LBS HALL'
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookers', type=int, default=500)
+    parser.add_argument('--vacancy', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=2,
+                        help='booking attempts per participant (extra ones must be refused)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stress.db')
+        setup = connect(path)
+        migrate.upgrade(setup, 'sqlite')
+        emails = ['ext%05d@example.com' % i for i in range(args.bookers)]
+        setup.executemany("INSERT INTO CustomUser (email, password, role) VALUES (?, 'x', 'EXTERNAL')",
+                          [(e,) for e in emails])
+        setup.executemany("INSERT INTO ExternalParticipant (email, name, college_name, password) "
+                          "VALUES (?, ?, 'Stress College', 'x')", [(e, e.split('@')[0]) for e in emails])
+        setup.execute("UPDATE Hall SET vacancy = ? WHERE name = ?", (args.vacancy, HALL))
+        setup.commit()
+
+        barrier = threading.Barrier(args.bookers)
+        outcomes = {'booked': 0, 'refused': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def booker(email):
+            conn = connect(path)
+            barrier.wait()
+            for _ in range(args.repeat):
+                try:
+                    book_hall(conn, email, HALL)
+                    result = 'booked'
+                except BookingError:
+                    result = 'refused'
+                except sqlite3.Error:
+                    result = 'errors'
+                with lock:
+                    outcomes[result] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=booker, args=(e,)) for e in emails]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        vacancy = setup.execute("SELECT vacancy FROM Hall WHERE name = ?", (HALL,)).fetchone()[0]
+        bookings = setup.execute("SELECT COUNT(*) FROM Accomadation WHERE name_hall = ?", (HALL,)).fetchone()[0]
+        doubles = setup.execute("SELECT COUNT(*) FROM (SELECT email FROM Accomadation "
+                                "GROUP BY email HAVING COUNT(*) > 1)").fetchone()[0]
+        setup.close()
+
+    attempts = args.bookers * args.repeat
+    print('%d attempts in %.2fs (%.0f attempts/s, %.0f bookings/s)' % (
+        attempts, elapsed, attempts / elapsed, outcomes['booked'] / elapsed))
+    print('booked=%(booked)d refused=%(refused)d errors=%(errors)d' % outcomes)
+    print('final vacancy=%d bookings=%d double bookings=%d' % (vacancy, bookings, doubles))
+
+    failures = []
+    if vacancy < 0:
+        failures.append('vacancy went negative')
+    if vacancy + bookings != args.vacancy:
+        failures.append('vacancy + bookings != starting vacancy')
+    if bookings != min(args.vacancy, args.bookers):
+        failures.append('expected %d bookings' % min(args.vacancy, args.bookers))
+    if doubles:
+        failures.append('participant booked twice')
+    if outcomes['errors']:
+        failures.append('database errors during booking')
+    if failures:
+        print('FAIL: ' + '; '.join(failures))
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
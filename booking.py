@@ -0,0 +1,108 @@
+"""Hall booking engine.
+
+A booking is a conditional decrement of ``Hall.vacancy`` plus an
+``Accomadation`` insert, committed together.  ``vacancy > 0`` in the UPDATE's
+WHERE clause is what prevents overbooking (the row lock serialises concurrent
+bookers), and the unique index on ``Accomadation.email`` enforces one booking
+per participant.  The failure reason is only looked up when a booking fails.
+The hall's new vacancy comes back with the booking so callers can publish it.
+"""
+import datetime
+import sqlite3
+
+try:
+    import psycopg2
+except Exception:  # psycopg2 is optional
+    psycopg2 = None
+
+INTEGRITY_ERRORS = (sqlite3.IntegrityError,) + ((psycopg2.IntegrityError,) if psycopg2 else ())
+
+# Postgres: one round trip.  The data-modifying CTE runs even when the INSERT
+# selects nothing (participant row missing), so the caller rolls back unless a
+# row comes back.
+_PG_BOOK = """
+    WITH hall AS (
+        UPDATE Hall SET vacancy = vacancy - 1
+        WHERE name = ? AND vacancy > 0
+          AND NOT EXISTS (SELECT 1 FROM Accomadation WHERE email = ?)
+        RETURNING name, price, vacancy
+    ), booked AS (
+        INSERT INTO Accomadation (name_par, email, date, name_hall, price)
+        SELECT ep.name, ep.email, ?, hall.name, hall.price
+        FROM hall, ExternalParticipant ep
+        WHERE ep.email = ?
+        RETURNING name_hall, price
+    )
+    SELECT booked.name_hall, booked.price, hall.vacancy FROM booked, hall
+"""
+
+# SQLite has no data-modifying CTEs, so the decrement and the insert are two
+# statements inside the transaction the UPDATE opens.
+_SQLITE_DECREMENT = """
+    UPDATE Hall SET vacancy = vacancy - 1 WHERE name = ? AND vacancy > 0 RETURNING name, price, vacancy
+"""
+_SQLITE_INSERT = """
+    INSERT INTO Accomadation (name_par, email, date, name_hall, price)
+    SELECT name, email, ?, ?, ? FROM ExternalParticipant WHERE email = ?
+"""
+
+
+class BookingError(Exception):
+    """A booking was refused; ``str(e)`` is safe to show to the user."""
+
+
+def _failure_reason(cursor, email, name_hall):
+    cursor.execute("SELECT vacancy FROM Hall WHERE name = ?", (name_hall,))
+    row = cursor.fetchone()
+    if row is None:
+        return 'Hall not found'
+    cursor.execute("SELECT 1 FROM Accomadation WHERE email = ?", (email,))
+    if cursor.fetchone() is not None:
+        return 'More than one booking not allowed'
+    if row['vacancy'] <= 0:
+        return 'No vacancies available'
+    return 'Participant not found'
+
+
+def book_hall(db, email, name_hall, is_postgres=False, today=None, record=None):
+    """Book ``name_hall`` for ``email`` and commit.
+
+    Returns ``{'name_hall', 'price', 'vacancy'}`` on success and raises BookingError
+    (after rolling back) when the hall is missing or full, the participant
+    already has a booking, or is not an external participant.  ``record``,
+    if given, is called as ``record(cursor, booking)`` just before the commit
+    so derived tables change in the same transaction.
+    """
+    today = today or datetime.date.today()
+    cursor = db.cursor()
+    try:
+        if is_postgres:
+            cursor.execute(_PG_BOOK, (name_hall, email, today, email))
+            booked = cursor.fetchone()
+        else:
+            cursor.execute(_SQLITE_DECREMENT, (name_hall,))
+            hall = cursor.fetchone()
+            booked = None
+            if hall is not None:
+                cursor.execute(_SQLITE_INSERT, (today, hall['name'], hall['price'], email))
+                if cursor.rowcount == 1:
+                    booked = {'name_hall': hall['name'], 'price': hall['price'], 'vacancy': hall['vacancy']}
+    except INTEGRITY_ERRORS:
+        db.rollback()
+        raise BookingError('More than one booking not allowed')
+    except Exception:
+        db.rollback()
+        raise
+
+    if booked is None:
+        db.rollback()
+        raise BookingError(_failure_reason(cursor, email, name_hall))
+    booking = {'name_hall': booked['name_hall'], 'price': booked['price'], 'vacancy': booked['vacancy']}
+    if record is not None:
+        try:
+            record(cursor, booking)
+        except Exception:
+            db.rollback()
+            raise
+    db.commit()
+    return booking
@@ -0,0 +1,137 @@
+"""Set-based bulk deletion of user accounts.
+
+``delete_users`` resolves the accounts to remove (a list of emails, or every
+account matching a role and/or college) and then works on them a chunk at a
+time, in one transaction: every statement is prefixed with a ``WITH
+DeleteTarget (email, role) AS (VALUES ...)`` clause binding the chunk, so no
+table is created per call.  A single grouped ``UPDATE`` gives every hall back
+the beds the deleted participants had booked, the event counters and
+analytics summaries are decremented the same way, and one ``DELETE`` per
+table removes the rows.  Child rows are deleted explicitly rather than left
+to ``ON DELETE CASCADE``, so the result does not depend on SQLite's
+``foreign_keys`` pragma.
+"""
+import analytics
+import counters
+
+TARGETS = 'DeleteTarget'
+FILTER_ROLES = ('STUDENT', 'EXTERNAL', 'ORGANIZER')
+# Accounts per statement: two parameters each, under SQLite's older 999 limit.
+CHUNK_SIZE = 400
+
+_FIND_EMAILS = "SELECT email, role FROM CustomUser WHERE email IN ({marks})"
+_FIND_ROLE = "SELECT email, role FROM CustomUser WHERE role = ?"
+_FIND_COLLEGE = """
+    SELECT u.email, u.role
+    FROM ExternalParticipant ep
+    JOIN CustomUser u ON u.email = ep.email
+    WHERE ep.college_name = ? AND u.role = 'EXTERNAL'
+"""
+
+# One statement for every hall, whatever the number of deleted bookings.  Here
+# and in the grouped updates of counters.py and analytics.py, CROSS JOIN makes
+# SQLite drive the join from the staged accounts (an index probe per account)
+# instead of scanning the child table; Postgres treats it as a plain join.
+_FREE_BEDS = """
+    UPDATE Hall SET vacancy = Hall.vacancy + freed.beds
+    FROM (SELECT a.name_hall, COUNT(*) AS beds
+          FROM {targets} t
+          CROSS JOIN Accomadation a
+          WHERE a.email = t.email
+          GROUP BY a.name_hall) AS freed
+    WHERE Hall.name = freed.name_hall
+    RETURNING name, vacancy
+"""
+
+# Children before parents; the report keys are what each statement removes.
+# These take the chunk's emails as a plain IN list, so ``rowcount`` is set
+# (sqlite3 reports -1 for statements that start with WITH).
+_DELETE = (
+    ('bookings', "DELETE FROM Accomadation WHERE email IN ({marks})"),
+    ('registrations', "DELETE FROM EventRegistration WHERE student_email IN ({marks})"),
+    ('volunteering', "DELETE FROM Volunteer WHERE student_email IN ({marks})"),
+    ('organising', "DELETE FROM Event_has_organiser WHERE org_email IN ({marks})"),
+    ('students', "DELETE FROM Student WHERE email IN ({marks})"),
+    ('external_participants', "DELETE FROM ExternalParticipant WHERE email IN ({marks})"),
+    ('organisers', "DELETE FROM Organiser WHERE email IN ({marks})"),
+    ('accounts', "DELETE FROM CustomUser WHERE email IN ({marks})"),
+)
+
+
+def targets_sql(count):
+    """The ``WITH`` clause binding ``count`` ``(email, role)`` pairs as ``TARGETS``."""
+    return 'WITH %s (email, role) AS (VALUES %s) ' % (TARGETS, ', '.join(['(?, ?)'] * count))
+
+
+def in_list_sql(template, count):
+    return template.format(marks=', '.join('?' * count))
+
+
+def _find(cursor, emails, college, role):
+    """Map every matching account's email to its role."""
+    if emails is not None:
+        if college or role:
+            raise ValueError('give either a list of emails or a college/role filter, not both')
+        found = {}
+        for start in range(0, len(emails), CHUNK_SIZE):
+            chunk = emails[start:start + CHUNK_SIZE]
+            cursor.execute(in_list_sql(_FIND_EMAILS, len(chunk)), chunk)
+            found.update((row['email'], row['role']) for row in cursor.fetchall())
+        return found
+    if college:
+        if role not in (None, 'EXTERNAL'):
+            raise ValueError('only external participants have a college')
+        cursor.execute(_FIND_COLLEGE, (college,))
+    elif role:
+        if role not in FILTER_ROLES:
+            raise ValueError('role must be one of %s' % ', '.join(FILTER_ROLES))
+        cursor.execute(_FIND_ROLE, (role,))
+    else:
+        raise ValueError('refusing to delete without a list of emails or a filter')
+    return {row['email']: row['role'] for row in cursor.fetchall()}
+
+
+def purge(cursor, emails=None, college=None, role=None):
+    """Delete the matching accounts inside the caller's transaction; see ``delete_users``."""
+    emails = None if emails is None else list(dict.fromkeys(e.strip() for e in emails if e and e.strip()))
+    found = _find(cursor, emails, college, role)
+    report = {'roles': {}, 'not_found': [e for e in emails if e not in found] if emails else [], 'halls': {}}
+    for found_role in found.values():
+        report['roles'][found_role] = report['roles'].get(found_role, 0) + 1
+    for key, _ in _DELETE:
+        report[key] = 0
+
+    targets = list(found.items())
+    for start in range(0, len(targets), CHUNK_SIZE):
+        chunk = targets[start:start + CHUNK_SIZE]
+        prefix = targets_sql(len(chunk))
+        params = [value for pair in chunk for value in pair]
+        cursor.execute(prefix + _FREE_BEDS.format(targets=TARGETS), params)
+        report['halls'].update((row['name'], row['vacancy']) for row in cursor.fetchall())
+        counters.forget_users(cursor, TARGETS, prefix, params)
+        analytics.forget_users(cursor, TARGETS, prefix, params)
+        for key, sql in _DELETE:
+            cursor.execute(in_list_sql(sql, len(chunk)), [email for email, _ in chunk])
+            report[key] += cursor.rowcount
+    return report
+
+
+def delete_users(db, emails=None, college=None, role=None, dry_run=False):
+    """Delete the given accounts, or every account matching ``college``/``role``.
+
+    Everything happens in one transaction, which ``dry_run`` rolls back after
+    computing the report.  Returns ``{'accounts': n, 'roles': {role: n},
+    'not_found': [email, ...], 'bookings': n, 'registrations': n, ...,
+    'halls': {hall: new vacancy}}``.
+    """
+    cursor = db.cursor()
+    try:
+        report = purge(cursor, emails, college, role)
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return report
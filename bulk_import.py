@@ -0,0 +1,201 @@
+"""Bulk participant import.
+
+Streams a CSV or JSONL file of students or external participants, validates
+each row, hashes passwords in a process pool and inserts ``CustomUser`` plus
+the role row with ``executemany`` in one transaction per chunk.  Rows that
+cannot be imported (missing fields, duplicate email or roll number in the
+file or the database) are written to an error file instead of aborting the
+run.
+"""
+import csv
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+try:
+    import psycopg2
+except Exception:  # psycopg2 is optional
+    psycopg2 = None
+
+INTEGRITY_ERRORS = (sqlite3.IntegrityError,) + ((psycopg2.IntegrityError,) if psycopg2 else ())
+
+ROLES = {
+    'student': {
+        'role': 'STUDENT',
+        'fields': ('email', 'name', 'roll_number', 'password'),
+        'insert': "INSERT INTO Student (name, email, roll_number, password) VALUES (?, ?, ?, ?)",
+        'params': lambda r: (r['name'], r['email'], r['roll_number'], r['password']),
+    },
+    'external': {
+        'role': 'EXTERNAL',
+        'fields': ('email', 'name', 'college_name', 'password'),
+        'insert': "INSERT INTO ExternalParticipant (name, email, college_name, password) VALUES (?, ?, ?, ?)",
+        'params': lambda r: (r['name'], r['email'], r['college_name'], r['password']),
+    },
+}
+
+# Values already in the database, one placeholder per value (see existing_sql).
+_TAKEN_EMAILS = "SELECT email FROM CustomUser WHERE email IN ({marks})"
+_TAKEN_ROLLS = "SELECT roll_number FROM Student WHERE roll_number IN ({marks})"
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def read_rows(path):
+    """Yield ``(line_number, dict)`` from a .csv or .jsonl/.json-lines file."""
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path) as fh:
+            for number, line in enumerate(fh, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        yield number, {'_error': 'invalid JSON: %s' % e}
+    else:
+        with open(path, newline='') as fh:
+            for number, row in enumerate(csv.DictReader(fh), 2):
+                yield number, row
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def existing_sql(template, count):
+    return template.format(marks=', '.join('?' * count))
+
+
+def _existing(cursor, template, values):
+    if not values:
+        return set()
+    cursor.execute(existing_sql(template, len(values)), list(values))
+    return {row[0] if not isinstance(row, dict) else next(iter(row.values())) for row in cursor.fetchall()}
+
+
+class ImportReport:
+    def __init__(self, error_path):
+        self.imported = 0
+        self.rejected = 0
+        self._fh = open(error_path, 'w', newline='')
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(['line', 'email', 'roll_number', 'error'])
+
+    def reject(self, line, row, reason):
+        self.rejected += 1
+        self._writer.writerow([line, row.get('email', ''), row.get('roll_number', ''), reason])
+
+    def close(self):
+        self._fh.close()
+
+
+class ParticipantImporter:
+    def __init__(self, db, role, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, hash_password=generate_password_hash):
+        if role not in ROLES:
+            raise ValueError('role must be one of %s' % ', '.join(sorted(ROLES)))
+        self.db = db
+        self.spec = ROLES[role]
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.hash_password = hash_password
+        self._seen_emails = set()
+        self._seen_rolls = set()
+
+    def _validate(self, chunk, report):
+        """Drop invalid rows and in-file / in-database duplicates from ``chunk``."""
+        fields = self.spec['fields']
+        candidates = []
+        for line, raw in chunk:
+            if '_error' in raw:
+                report.reject(line, {}, raw['_error'])
+                continue
+            row = {f: (str(raw.get(f) or '')).strip() for f in fields}
+            missing = [f for f in fields if not row[f]]
+            if missing:
+                report.reject(line, row, 'missing %s' % ', '.join(missing))
+            elif '@' not in row['email']:
+                report.reject(line, row, 'invalid email')
+            elif row['email'] in self._seen_emails:
+                report.reject(line, row, 'duplicate email in file')
+            elif 'roll_number' in row and row['roll_number'] in self._seen_rolls:
+                report.reject(line, row, 'duplicate roll number in file')
+            else:
+                self._seen_emails.add(row['email'])
+                if 'roll_number' in row:
+                    self._seen_rolls.add(row['roll_number'])
+                candidates.append((line, row))
+
+        cursor = self.db.cursor()
+        taken_emails = _existing(cursor, _TAKEN_EMAILS, {r['email'] for _, r in candidates})
+        taken_rolls = set()
+        if 'roll_number' in fields:
+            taken_rolls = _existing(cursor, _TAKEN_ROLLS, {r['roll_number'] for _, r in candidates})
+        valid = []
+        for line, row in candidates:
+            if row['email'] in taken_emails:
+                report.reject(line, row, 'email already registered')
+            elif row.get('roll_number') in taken_rolls:
+                report.reject(line, row, 'roll number already registered')
+            else:
+                valid.append((line, row))
+        return valid
+
+    def _insert(self, rows):
+        cursor = self.db.cursor()
+        cursor.executemany("INSERT INTO CustomUser (email, password, role) VALUES (?, ?, ?)",
+                           [(r['email'], r['password'], self.spec['role']) for _, r in rows])
+        cursor.executemany(self.spec['insert'], [self.spec['params'](r) for _, r in rows])
+
+    def _write_chunk(self, rows, report):
+        try:
+            self._insert(rows)
+            self.db.commit()
+            report.imported += len(rows)
+            return
+        except INTEGRITY_ERRORS:
+            self.db.rollback()
+        # Something slipped past validation (e.g. a concurrent registration);
+        # retry row by row so only the offending rows are rejected.
+        for line, row in rows:
+            try:
+                self._insert([(line, row)])
+                self.db.commit()
+                report.imported += 1
+            except INTEGRITY_ERRORS as e:
+                self.db.rollback()
+                report.reject(line, row, 'integrity error: %s' % e)
+
+    def run(self, path, error_path):
+        """Import ``path``; returns ``(imported, rejected)``."""
+        report = ImportReport(error_path)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                pending = None  # (rows, iterator of hashed passwords) for the previous chunk
+                for chunk in _chunks(read_rows(path), self.chunk_size):
+                    rows = self._validate(chunk, report)
+                    # Hash this chunk across the pool while the previous one is inserted.
+                    batch = max(1, len(rows) // (self.workers * 4))
+                    hashed = executor.map(self.hash_password, [r['password'] for _, r in rows], chunksize=batch)
+                    if pending is not None:
+                        self._finish(pending, report)
+                    pending = (rows, hashed)
+                if pending is not None:
+                    self._finish(pending, report)
+        finally:
+            report.close()
+        return report.imported, report.rejected
+
+    def _finish(self, pending, report):
+        rows, hashed = pending
+        for (_, row), password in zip(rows, hashed):
+            row['password'] = password
+        if rows:
+            self._write_chunk(rows, report)
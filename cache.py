@@ -0,0 +1,130 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    ``get_or_load(key, loader)`` is the main entry point: on a miss the loader
+    runs outside the lock and its result is stored.  ``invalidate()`` drops one
+    key (or everything) and is what write paths call after changing the
+    underlying rows.
+    """
+
+    def __init__(self, ttl=60.0, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            # A load that started before an invalidation must not repopulate
+            # the cache with the rows it read before the write.
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+        generation = self._generation
+        value = loader()
+        self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def invalidate_matching(self, predicate):
+        """Drop every key for which ``predicate(key)`` is true."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+
+class EventCatalog:
+    """Cached copy of the Event table shared by all dashboards.
+
+    Besides the rows it keeps a content hash (used as the ETag) and the time
+    the content last changed in this process (used as Last-Modified), so two
+    workers holding the same rows hand out the same validator.
+    """
+
+    KEY = 'events'
+
+    def __init__(self, ttl=60.0):
+        self._cache = TTLCache(ttl=ttl, maxsize=1)
+        self._lock = threading.Lock()
+        self._etag = None
+        self._last_modified = time.time()
+
+    def _load(self, get_db):
+        cursor = get_db().cursor()
+        cursor.execute("SELECT * FROM Event ORDER BY name")
+        # Sorted in Python as well so bisect-based paging agrees with the order
+        # regardless of the database collation.
+        events = sorted((dict(row) for row in cursor.fetchall()), key=lambda e: e['name'])
+        digest = hashlib.sha1(repr([sorted(e.items()) for e in events]).encode('utf-8')).hexdigest()
+        with self._lock:
+            if digest != self._etag:
+                self._etag = digest
+                self._last_modified = time.time()
+            return {'rows': events, 'etag': digest, 'last_modified': self._last_modified}
+
+    def snapshot(self, get_db):
+        """Return ``{'rows', 'etag', 'last_modified'}`` for the current catalog."""
+        return self._cache.get_or_load(self.KEY, lambda: self._load(get_db))
+
+    def events(self, get_db):
+        return self.snapshot(get_db)['rows']
+
+    def invalidate(self):
+        self._cache.invalidate()
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,185 @@
+"""Denormalised per-event counters (``EventCounter``).
+
+The registration, volunteer and user-deletion paths call these helpers
+inside their own transaction, so a counter changes if and only if the rows
+it counts do.  Dashboards then read one row per event instead of counting
+``EventRegistration``/``Volunteer``.  Anything that writes those tables
+another way (bulk loads, manual SQL) should finish with ``rebuild`` or
+``reconcile(fix=True)``.
+
+Registration is a conditional upsert: when an event has a ``capacity`` the
+increment only happens below it, and the caller rolls back and reports the
+event as full when no row was written.
+"""
+COLUMNS = ('registrations', 'student_registrations', 'external_registrations', 'volunteers')
+_EMPTY = dict(dict.fromkeys(COLUMNS, 0), capacity=None)
+
+_REGISTER = """
+    INSERT INTO EventCounter (event, registrations, student_registrations, external_registrations)
+    VALUES (?, 1, ?, ?)
+    ON CONFLICT (event) DO UPDATE SET
+        registrations = EventCounter.registrations + 1,
+        student_registrations = EventCounter.student_registrations + excluded.student_registrations,
+        external_registrations = EventCounter.external_registrations + excluded.external_registrations
+    WHERE EventCounter.capacity IS NULL OR EventCounter.registrations < EventCounter.capacity
+"""
+
+_VOLUNTEER = """
+    INSERT INTO EventCounter (event, volunteers) VALUES (?, 1)
+    ON CONFLICT (event) DO UPDATE SET volunteers = EventCounter.volunteers + 1
+"""
+
+# {targets} names a table or WITH query of (email, role) rows about to be
+# deleted; these run before their registrations and sign-ups go, one grouped
+# UPDATE each.
+_FORGET_REGISTRATIONS = """
+    UPDATE EventCounter SET
+        registrations = EventCounter.registrations - gone.registrations,
+        student_registrations = EventCounter.student_registrations - gone.student_registrations,
+        external_registrations = EventCounter.external_registrations - gone.external_registrations
+    FROM (SELECT er.event,
+                 COUNT(*) AS registrations,
+                 SUM(CASE WHEN t.role = 'STUDENT' THEN 1 ELSE 0 END) AS student_registrations,
+                 SUM(CASE WHEN t.role = 'EXTERNAL' THEN 1 ELSE 0 END) AS external_registrations
+          FROM {targets} t
+          CROSS JOIN EventRegistration er
+          WHERE er.student_email = t.email
+          GROUP BY er.event) AS gone
+    WHERE EventCounter.event = gone.event
+"""
+_FORGET_VOLUNTEERING = """
+    UPDATE EventCounter SET volunteers = EventCounter.volunteers - gone.volunteers
+    FROM (SELECT v.event_name, COUNT(*) AS volunteers
+          FROM {targets} t
+          CROSS JOIN Volunteer v
+          WHERE v.student_email = t.email
+          GROUP BY v.event_name) AS gone
+    WHERE EventCounter.event = gone.event_name
+"""
+
+_ACTUAL_REGISTRATIONS = """
+    SELECT er.event,
+           COUNT(*) AS registrations,
+           SUM(CASE WHEN u.role = 'STUDENT' THEN 1 ELSE 0 END) AS student_registrations,
+           SUM(CASE WHEN u.role = 'EXTERNAL' THEN 1 ELSE 0 END) AS external_registrations
+    FROM EventRegistration er
+    LEFT JOIN CustomUser u ON u.email = er.student_email
+    GROUP BY er.event
+"""
+_ACTUAL_VOLUNTEERS = "SELECT event_name AS event, COUNT(*) AS volunteers FROM Volunteer GROUP BY event_name"
+_STORED = "SELECT * FROM EventCounter"
+_EVENTS = "SELECT name FROM Event"
+
+# Recounts one event from the base tables in a single statement, keeping capacity.
+_RECOUNT = """
+    INSERT INTO EventCounter (event, registrations, student_registrations, external_registrations, volunteers)
+    SELECT e.name,
+           (SELECT COUNT(*) FROM EventRegistration er WHERE er.event = e.name),
+           (SELECT COUNT(*) FROM EventRegistration er JOIN CustomUser u ON u.email = er.student_email
+            WHERE er.event = e.name AND u.role = 'STUDENT'),
+           (SELECT COUNT(*) FROM EventRegistration er JOIN CustomUser u ON u.email = er.student_email
+            WHERE er.event = e.name AND u.role = 'EXTERNAL'),
+           (SELECT COUNT(*) FROM Volunteer v WHERE v.event_name = e.name)
+    FROM Event e
+    WHERE e.name = ?
+    ON CONFLICT (event) DO UPDATE SET
+        registrations = excluded.registrations,
+        student_registrations = excluded.student_registrations,
+        external_registrations = excluded.external_registrations,
+        volunteers = excluded.volunteers
+"""
+
+_SET_CAPACITY = """
+    INSERT INTO EventCounter (event, capacity) VALUES (?, ?)
+    ON CONFLICT (event) DO UPDATE SET capacity = excluded.capacity
+"""
+
+
+def counts_sql(count):
+    return "SELECT * FROM EventCounter WHERE event IN (%s)" % ', '.join('?' * count)
+
+
+def record_registration(cursor, event, role):
+    """Count a new registration; False when the event is at capacity."""
+    cursor.execute(_REGISTER, (event, int(role == 'STUDENT'), int(role == 'EXTERNAL')))
+    return cursor.rowcount == 1
+
+
+def record_volunteer(cursor, event):
+    cursor.execute(_VOLUNTEER, (event,))
+
+
+def forget_users_sql(targets):
+    return tuple(sql.format(targets=targets) for sql in (_FORGET_REGISTRATIONS, _FORGET_VOLUNTEERING))
+
+
+def forget_users(cursor, targets, prefix='', params=()):
+    """Uncount every registration and volunteer sign-up of the users in ``targets``.
+
+    ``prefix`` is a ``WITH`` clause defining ``targets``, bound with ``params``.
+    """
+    for sql in forget_users_sql(targets):
+        cursor.execute(prefix + sql, params)
+
+
+def set_capacity(cursor, event, capacity):
+    cursor.execute(_SET_CAPACITY, (event, capacity))
+
+
+def counts(cursor, events):
+    """``{event: {column: n, ..., 'capacity': n or None}}``; events without a row count zero."""
+    events = list(events)
+    result = {event: dict(_EMPTY) for event in events}
+    if events:
+        cursor.execute(counts_sql(len(events)), events)
+        for row in cursor.fetchall():
+            result[row['event']] = {column: row[column] for column in COLUMNS + ('capacity',)}
+    return result
+
+
+def drift(db):
+    """``[(event, column, stored, actual), ...]`` for every counter that disagrees with the rows."""
+    cursor = db.cursor()
+    actual = {}
+    cursor.execute(_ACTUAL_REGISTRATIONS)
+    for row in cursor.fetchall():
+        actual[row['event']] = {column: row[column] for column in COLUMNS[:3]}
+    cursor.execute(_ACTUAL_VOLUNTEERS)
+    for row in cursor.fetchall():
+        actual.setdefault(row['event'], {})['volunteers'] = row['volunteers']
+    cursor.execute(_STORED)
+    stored = {row['event']: row for row in cursor.fetchall()}
+    cursor.execute(_EVENTS)
+    found = []
+    for row in cursor.fetchall():
+        event = row['name']
+        for column in COLUMNS:
+            have = stored[event][column] if event in stored else 0
+            want = actual.get(event, {}).get(column, 0)
+            if have != want:
+                found.append((event, column, have, want))
+    return sorted(found)
+
+
+def reconcile(db, fix=False):
+    """Report drift and, with ``fix``, recount the drifted events in one transaction."""
+    found = drift(db)
+    if fix and found:
+        cursor = db.cursor()
+        try:
+            cursor.executemany(_RECOUNT, [(event,) for event in sorted({f[0] for f in found})])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return found
+
+
+def rebuild(db):
+    """Recount every event (after bulk loads that bypass the write paths)."""
+    cursor = db.cursor()
+    cursor.execute(_EVENTS)
+    events = [(row['name'],) for row in cursor.fetchall()]
+    cursor.executemany(_RECOUNT, events)
+    db.commit()
+    return len(events)
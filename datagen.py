@@ -0,0 +1,213 @@
+"""Deterministic synthetic data for scale testing.
+
+``generate`` fills every application table from a seeded RNG, so the same
+arguments always produce the same database.  Traffic is skewed the way fest
+traffic is: event popularity follows a Zipf distribution (a handful of
+headline events take most sign-ups), a few keen participants register for
+many events, and external participants book the most popular halls first,
+spilling over to the next hall once one is full.
+
+Rows are streamed into the database in large batches: ``executemany`` on
+SQLite and ``COPY`` on Postgres.  Every generated user shares one password
+hash, because hashing 100k passwords would take far longer than the load.
+"""
+import bisect
+import csv
+import datetime
+import io
+import itertools
+import random
+import time
+
+EMAIL_DOMAIN = 'gen.cfms.test'
+BATCH_SIZE = 50000
+
+ROLE_SHARES = (('STUDENT', 0.70), ('EXTERNAL', 0.28), ('ORGANIZER', 0.02))
+COLLEGES = 60
+VOLUNTEER_SHARE = 0.05
+BOOKING_SHARE = 0.60
+REGISTRATION_WINDOW = datetime.timedelta(days=30)
+WINDOW_START = datetime.datetime(2024, 2, 1)
+
+
+class GenerationError(RuntimeError):
+    """The target database already holds users."""
+
+
+def zipf_weights(n, exponent):
+    return [1.0 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _timestamp(rng):
+    moment = WINDOW_START + datetime.timedelta(seconds=rng.random() * REGISTRATION_WINDOW.total_seconds())
+    return moment.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _batches(rows, size):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(db, is_postgres, table, columns, rows):
+    """Insert an iterable of tuples; returns the number of rows written."""
+    cursor = db.cursor()
+    count = 0
+    for batch in _batches(rows, BATCH_SIZE):
+        if is_postgres:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (table, ', '.join(columns)), buffer)
+        else:
+            cursor.executemany('INSERT INTO %s (%s) VALUES (%s)' % (table, ', '.join(columns),
+                                                                   ', '.join('?' * len(columns))), batch)
+        count += len(batch)
+    return count
+
+
+class Generator:
+    def __init__(self, users=100000, registrations=1000000, events=500, halls=50, seed=42,
+                 event_skew=1.1, password_hash=''):
+        self.users = users
+        self.registrations = registrations
+        self.events = events
+        self.halls = halls
+        self.seed = seed
+        self.event_skew = event_skew
+        self.password_hash = password_hash
+
+    def _rng(self, table):
+        # One stream per table keeps each table reproducible even if another changes.
+        return random.Random('%s:%s' % (self.seed, table))
+
+    def people(self):
+        """``{role: [(email, name), ...]}`` for every generated user."""
+        people = {}
+        start = 0
+        for role, share in ROLE_SHARES:
+            count = max(1, int(round(self.users * share)))
+            prefix = role.lower()
+            people[role] = [('%s%06d@%s' % (prefix, i, EMAIL_DOMAIN), '%s %d' % (role.title(), i))
+                            for i in range(start, start + count)]
+            start += count
+        return people
+
+    def event_rows(self):
+        rng = self._rng('events')
+        venues = ['Main Auditorium', 'Open Air Theatre', 'Computer Lab', 'Art Gallery', 'Sports Ground',
+                  'Seminar Hall %d' % rng.randrange(1, 10)]
+        for i in range(self.events):
+            day = WINDOW_START.date() + datetime.timedelta(days=30 + i % 5)
+            yield ('Generated Event %04d' % i, 'Synthetic event %d' % i, day.isoformat(),
+                   '%02d:00' % (8 + i % 12), venues[i % len(venues)])
+
+    def hall_rows(self):
+        rng = self._rng('halls')
+        for i in range(self.halls):
+            capacity = rng.randrange(100, 401)
+            yield 'Generated Hall %03d' % i, 'Block %d' % (i % 12), capacity, rng.choice((150, 200, 250, 300))
+
+    def registration_pairs(self, registrants, event_names):
+        """Distinct ``(event, email)`` pairs, Zipf-skewed over events and registrants."""
+        rng = self._rng('registrations')
+        target = min(self.registrations, len(registrants) * len(event_names))
+        event_cum = _cumulative(zipf_weights(len(event_names), self.event_skew))
+        # Mild skew over people too: some participants sign up for everything.
+        people_cum = _cumulative(zipf_weights(len(registrants), 0.3))
+        seen = set()
+        while len(seen) < target:
+            missing = target - len(seen)
+            events = rng.choices(event_names, cum_weights=event_cum, k=missing)
+            people = rng.choices(registrants, cum_weights=people_cum, k=missing)
+            seen.update(zip(events, people))
+        return sorted(seen)
+
+    def bookings(self, externals, halls):
+        """``(name, email, hall, price)`` for a share of externals, filling popular halls first."""
+        rng = self._rng('bookings')
+        capacity = {name: cap for name, _, cap, _ in halls}
+        price = {name: p for name, _, _, p in halls}
+        names = [name for name, _, _, _ in halls]
+        cum = _cumulative(zipf_weights(len(names), 1.0))
+        booked = {name: 0 for name in names}
+        rows = []
+        for email, person in externals:
+            if rng.random() >= BOOKING_SHARE:
+                continue
+            index = bisect.bisect_left(cum, rng.random() * cum[-1])
+            for hall in names[index:] + names[:index]:  # spill over to the next hall with room
+                if booked[hall] < capacity[hall]:
+                    booked[hall] += 1
+                    rows.append((person, email, hall, price[hall]))
+                    break
+            else:
+                break  # every hall is full
+        return rows, booked
+
+    def generate(self, db, is_postgres=False, log=None):
+        """Populate ``db``; returns ``{table: rows}``."""
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*) AS n FROM CustomUser")
+        if cursor.fetchone()['n']:
+            raise GenerationError('CustomUser is not empty; generate into a freshly migrated database')
+        counts = {}
+
+        def load(table, columns, rows):
+            started = time.perf_counter()
+            counts[table] = bulk_insert(db, is_postgres, table, columns, rows)
+            if log:
+                log('%-20s %9d rows  %6.2fs' % (table, counts[table], time.perf_counter() - started))
+
+        people = self.people()
+        students, externals, organisers = people['STUDENT'], people['EXTERNAL'], people['ORGANIZER']
+        rng = self._rng('users')
+        load('CustomUser', ('email', 'password', 'role'),
+             ((email, self.password_hash, role) for role, members in people.items() for email, _ in members))
+        load('Student', ('email', 'name', 'roll_number', 'password'),
+             ((email, name, 'GEN%07d' % i, self.password_hash) for i, (email, name) in enumerate(students)))
+        load('ExternalParticipant', ('email', 'name', 'college_name', 'password'),
+             ((email, name, 'College %02d' % rng.randrange(COLLEGES), self.password_hash)
+              for email, name in externals))
+        load('Organiser', ('email', 'name', 'password'),
+             ((email, name, self.password_hash) for email, name in organisers))
+
+        events = list(self.event_rows())
+        load('Event', ('name', 'description', 'date', 'time', 'location'), events)
+        event_names = [row[0] for row in events]
+
+        rng = self._rng('organisers')
+        load('Event_has_organiser', ('event_name', 'org_name', 'org_email'),
+             ((event, name, email) for event in event_names
+              for email, name in rng.sample(organisers, min(len(organisers), rng.randint(1, 3)))))
+
+        registrants = [email for email, _ in students] + [email for email, _ in externals]
+        pairs = self.registration_pairs(registrants, event_names)
+        rng = self._rng('registered_at')
+        load('EventRegistration', ('event', 'student_email', 'registered_at'),
+             ((event, email, _timestamp(rng)) for event, email in pairs))
+
+        rng = self._rng('volunteers')
+        volunteers = rng.sample(students, int(len(students) * VOLUNTEER_SHARE))
+        event_cum = _cumulative(zipf_weights(len(event_names), self.event_skew))
+        load('Volunteer', ('event_name', 'student_name', 'student_email'),
+             sorted({(rng.choices(event_names, cum_weights=event_cum)[0], name, email)
+                     for email, name in volunteers}))
+
+        halls = list(self.hall_rows())
+        bookings, booked = self.bookings(externals, halls)
+        load('Hall', ('name', 'location', 'capacity', 'vacancy', 'price'),
+             ((name, location, capacity, capacity - booked[name], price) for name, location, capacity, price in halls))
+        load('Accomadation', ('name_par', 'email', 'name_hall', 'price'), bookings)
+
+        db.commit()
+        cursor.execute('ANALYZE')
+        db.commit()
+        return counts
@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection could be checked out in time."""
+
+
+class ConnectionPool:
+    """Thread-safe, per-process pool of DB-API connections.
+
+    ``connect`` is a zero-argument factory returning a new connection and
+    ``ping`` an optional callable that raises (or returns False) when a
+    connection is no longer usable.  Connections are rolled back when they
+    are returned so the next borrower never inherits an open transaction.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=5.0, ping=None, ping_interval=0.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError('invalid pool size: min=%r max=%r' % (minconn, maxconn))
+        self._connect = connect
+        self._ping = ping
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (conn, last_used) pairs, most recently used on the right
+        self._in_use = 0
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'connects': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+        for _ in range(minconn):
+            self._idle.append((self._new_connection(), time.monotonic()))
+            self._size += 1
+
+    def _new_connection(self):
+        conn = self._connect()
+        self._stats['connects'] += 1
+        return conn
+
+    def _is_alive(self, conn, last_used):
+        if self._ping is None:
+            return True
+        if self.ping_interval and time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            return self._ping(conn) is not False
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._stats['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a live connection, waiting up to ``timeout`` seconds."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('connection pool is closed')
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    self._in_use += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout('timed out after %.1fs waiting for a database connection' % self.timeout)
+                self._cond.wait(remaining)
+            waited = time.monotonic() - started
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+
+        # Connecting and pinging happen outside the lock so a slow server
+        # does not serialise every other checkout behind it.
+        try:
+            if conn is not None and not self._is_alive(conn, last_used):
+                with self._cond:
+                    self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._stats['connects'] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return ``conn`` to the pool, rolling back any open transaction."""
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(conn)
+            self._cond.notify_all()
+
+    @property
+    def pid(self):
+        return self._pid
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                'min': self.minconn,
+                'max': self.maxconn,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+        checkouts = data['checkouts']
+        data['wait_time_avg'] = data['wait_time_total'] / checkouts if checkouts else 0.0
+        return data
+
+
+class ThreadLocalConnections:
+    """One persistent connection per thread, with the ``ConnectionPool`` interface.
+
+    Meant for SQLite, where connecting is cheap but every new connection
+    loses its page cache, mmap and pragma setup.  A connection is rolled back
+    on release so it never carries a read snapshot or write lock between
+    requests; after a fork the child opens its own connections.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'checkouts': 0, 'connects': 0, 'discarded': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def acquire(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._count('connects')
+        self._count('checkouts')
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._local.conn = None
+            self._count('discarded')
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @property
+    def pid(self):
+        return self._pid
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data['reuse_ratio'] = 1 - data['connects'] / data['checkouts'] if data['checkouts'] else 0.0
+        return data
@@ -0,0 +1,185 @@
+"""Streaming roster exports (CSV and XLSX).
+
+Rows are read in batches (``fetchmany`` on SQLite, a server-side named
+cursor on Postgres) and encoded as they arrive, so an export of any size
+holds one batch in memory and the download starts with the first batch.
+XLSX files are written as a zip stream of inline-string SpreadsheetML,
+which needs no third-party library and no seekable output.
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+EXPORTS = {
+    'participants': {
+        'param': 'event',
+        'columns': ('email', 'name'),
+        'sql': """
+            SELECT er.student_email AS email, COALESCE(s.name, ep.name) AS name
+            FROM EventRegistration er
+            LEFT JOIN Student s ON s.email = er.student_email
+            LEFT JOIN ExternalParticipant ep ON ep.email = er.student_email
+            WHERE er.event = ?
+            ORDER BY er.student_email
+        """,
+    },
+    'volunteers': {
+        'param': 'event',
+        'columns': ('email', 'name'),
+        'sql': """
+            SELECT student_email AS email, student_name AS name
+            FROM Volunteer
+            WHERE event_name = ?
+            ORDER BY student_email
+        """,
+    },
+    'hall': {
+        'param': 'hall',
+        'columns': ('id', 'name', 'email', 'date', 'price'),
+        'sql': """
+            SELECT id, name_par AS name, email, date, price
+            FROM Accomadation
+            WHERE name_hall = ?
+            ORDER BY id
+        """,
+    },
+    'winners': {
+        'param': None,
+        'columns': ('event', 'name', 'email'),
+        'sql': "SELECT event, name_par AS name, email FROM Winners ORDER BY event",
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+_FORMULA_START = ('=', '+', '-', '@', '\t', '\r')
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def iter_rows(db, sql, params, columns, batch_size=1000):
+    """Yield tuples of ``columns`` for ``sql``, ``batch_size`` rows at a time."""
+    cursor = db.cursor(name='cfms_export')
+    try:
+        cursor.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield tuple(row[c] for c in columns)
+    finally:
+        cursor.close()
+
+
+def _csv_cell(value):
+    # Names come from self-registration; keep spreadsheets from running them.
+    if isinstance(value, str) and value.startswith(_FORMULA_START):
+        return "'" + value
+    return value
+
+
+def csv_stream(rows, columns, flush_rows=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # lets Excel detect UTF-8
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(v) for v in row])
+        if count % flush_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+_XLSX_PARTS = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Target="xl/workbook.xml" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+     '</Relationships>'),
+)
+
+_SHEET_HEAD = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+               '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return '<c><v>%s</v></c>' % value
+    text = _XML_ILLEGAL.sub('', str(value))
+    return '<c t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % escape(text)
+
+
+class _Sink:
+    """Write-only file object that hands back whatever zipfile wrote since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def xlsx_stream(rows, columns, flush_rows=500):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, body in _XLSX_PARTS:
+            archive.writestr(name, body)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_HEAD.encode('utf-8'))
+            sheet.write(('<row>%s</row>' % ''.join(_xlsx_cell(c) for c in columns)).encode('utf-8'))
+            for count, row in enumerate(rows, 1):
+                sheet.write(('<row>%s</row>' % ''.join(_xlsx_cell(v) for v in row)).encode('utf-8'))
+                if count % flush_rows == 0:
+                    yield sink.drain()
+            sheet.write(_SHEET_TAIL.encode('utf-8'))
+    yield sink.drain()
+
+
+def stream_export(db, kind, fmt, value=None, batch_size=1000):
+    """Return an iterator of encoded chunks for export ``kind`` in format ``fmt``."""
+    spec = EXPORTS[kind]
+    params = [value] if spec['param'] else []
+    rows = iter_rows(db, spec['sql'], params, spec['columns'], batch_size)
+    encode = xlsx_stream if fmt == 'xlsx' else csv_stream
+    return encode(rows, spec['columns'])
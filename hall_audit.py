@@ -0,0 +1,223 @@
+"""Hall occupancy audit and repair.
+
+``Hall.capacity`` (migration 0011) is the number of beds; ``Hall.vacancy``
+is the running count of free ones that booking and deletion adjust.
+``audit`` recomputes occupancy for every hall with one grouped query over
+``Accomadation`` and reports
+
+* drift: halls whose vacancy is not ``capacity - bookings`` (0 when a hall
+  is overbooked), and halls without a capacity,
+* orphaned bookings: ``Accomadation`` rows whose participant or hall is gone,
+* broken accounts: ``CustomUser`` rows without their role-table row.
+
+Auditing only reads, so it never holds up bookings.  ``repair`` fixes what
+an audit found in one short transaction: orphaned bookings are deleted (and
+taken out of the analytics summaries), broken accounts optionally go through
+the bulk deletion path, and the affected halls get their vacancy recounted
+in the same statement that writes it.  On Postgres those halls are locked
+first so a booking committing meanwhile is counted; bookings for other
+halls carry on.  ``HallAuditor`` runs audits on a schedule from a daemon
+thread.
+"""
+import threading
+import time
+
+import analytics
+import bulk_delete
+
+_OCCUPANCY = """
+    SELECT h.name, h.capacity, h.vacancy, COALESCE(b.bookings, 0) AS bookings
+    FROM Hall h
+    LEFT JOIN (SELECT name_hall, COUNT(*) AS bookings FROM Accomadation GROUP BY name_hall) b
+        ON b.name_hall = h.name
+    ORDER BY h.name
+"""
+_ORPHANED_BOOKINGS = """
+    SELECT a.id, a.email, a.name_hall,
+           CASE WHEN ep.email IS NULL THEN 'participant missing' ELSE 'hall missing' END AS reason
+    FROM Accomadation a
+    LEFT JOIN ExternalParticipant ep ON ep.email = a.email
+    LEFT JOIN Hall h ON h.name = a.name_hall
+    WHERE ep.email IS NULL OR h.name IS NULL
+    ORDER BY a.id
+"""
+_BROKEN_ACCOUNTS = """
+    SELECT u.email, u.role
+    FROM CustomUser u
+    WHERE (u.role = 'STUDENT' AND NOT EXISTS (SELECT 1 FROM Student s WHERE s.email = u.email))
+       OR (u.role = 'EXTERNAL' AND NOT EXISTS (SELECT 1 FROM ExternalParticipant ep WHERE ep.email = u.email))
+       OR (u.role = 'ORGANIZER' AND NOT EXISTS (SELECT 1 FROM Organiser o WHERE o.email = u.email))
+    ORDER BY u.email
+"""
+
+# Deletes the booking only if it is still orphaned.
+_DELETE_ORPHAN = """
+    DELETE FROM Accomadation
+    WHERE id = ?
+      AND (NOT EXISTS (SELECT 1 FROM ExternalParticipant ep WHERE ep.email = Accomadation.email)
+           OR NOT EXISTS (SELECT 1 FROM Hall h WHERE h.name = Accomadation.name_hall))
+    RETURNING email, name_hall, price
+"""
+# A hall without a capacity adopts its current beds, as migration 0011 did.
+_ADOPT_CAPACITY = """
+    UPDATE Hall SET capacity = vacancy + (SELECT COUNT(*) FROM Accomadation a WHERE a.name_hall = Hall.name)
+    WHERE name = ? AND capacity IS NULL
+"""
+# Counted and written in one statement, under the hall's row lock.
+_RECOUNT = """
+    UPDATE Hall SET vacancy = (
+        SELECT CASE WHEN Hall.capacity > COUNT(*) THEN Hall.capacity - COUNT(*) ELSE 0 END
+        FROM Accomadation a WHERE a.name_hall = Hall.name)
+    WHERE name = ? AND capacity IS NOT NULL
+    RETURNING name, vacancy
+"""
+_SET_CAPACITY = "UPDATE Hall SET capacity = ? WHERE name = ?"
+
+
+def lock_sql(count):
+    """Postgres: lock ``count`` halls (in name order, like every other locker) for the repair."""
+    return "SELECT name FROM Hall WHERE name IN (%s) ORDER BY name FOR UPDATE" % ', '.join('?' * count)
+
+
+def expected_vacancy(capacity, bookings):
+    return max(capacity - bookings, 0)
+
+
+def audit(db):
+    """Read-only check; returns a report dict for ``repair`` and the callers to print."""
+    started = time.perf_counter()
+    cursor = db.cursor()
+    cursor.execute(_OCCUPANCY)
+    report = {'halls': 0, 'bookings': 0, 'drift': [], 'unknown_capacity': [], 'overbooked': []}
+    for row in cursor.fetchall():
+        report['halls'] += 1
+        report['bookings'] += row['bookings']
+        if row['capacity'] is None:
+            report['unknown_capacity'].append(row['name'])
+            continue
+        expected = expected_vacancy(row['capacity'], row['bookings'])
+        if row['bookings'] > row['capacity']:
+            report['overbooked'].append(row['name'])
+        if row['vacancy'] != expected:
+            report['drift'].append({'hall': row['name'], 'capacity': row['capacity'], 'bookings': row['bookings'],
+                                    'vacancy': row['vacancy'], 'expected': expected})
+    cursor.execute(_ORPHANED_BOOKINGS)
+    report['orphaned_bookings'] = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(_BROKEN_ACCOUNTS)
+    report['broken_accounts'] = [dict(row) for row in cursor.fetchall()]
+    db.rollback()  # end the read transaction so it does not pin a snapshot
+    report['elapsed'] = time.perf_counter() - started
+    return report
+
+
+def problems(report, accounts=True):
+    return (len(report['drift']) + len(report['unknown_capacity']) + len(report['orphaned_bookings'])
+            + (len(report['broken_accounts']) if accounts else 0))
+
+
+def repair(db, report, is_postgres=False, accounts=False):
+    """Fix what ``report`` found in one transaction; returns ``{hall: new vacancy}``.
+
+    ``accounts`` also deletes the broken accounts (with everything they own)
+    through bulk_delete; otherwise they are left for an admin to look at.
+    """
+    halls = {d['hall'] for d in report['drift']} | set(report['unknown_capacity'])
+    halls.update(o['name_hall'] for o in report['orphaned_bookings'])
+    broken = [a['email'] for a in report['broken_accounts']] if accounts else []
+    cursor = db.cursor()
+    try:
+        if is_postgres and halls:
+            cursor.execute(lock_sql(len(halls)), sorted(halls))
+        if broken:
+            halls.update(bulk_delete.purge(cursor, emails=broken)['halls'])
+        gone = []
+        for orphan in report['orphaned_bookings']:
+            cursor.execute(_DELETE_ORPHAN, (orphan['id'],))
+            gone.extend(cursor.fetchall())
+        analytics.forget_bookings(cursor, [(row['email'], row['name_hall'], row['price']) for row in gone])
+        vacancy = {}
+        for hall in sorted(halls):
+            cursor.execute(_ADOPT_CAPACITY, (hall,))
+            cursor.execute(_RECOUNT, (hall,))
+            row = cursor.fetchone()
+            if row is not None:
+                vacancy[row['name']] = row['vacancy']
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return vacancy
+
+
+def set_capacity(db, hall, capacity, is_postgres=False):
+    """Give ``hall`` ``capacity`` beds and recount its vacancy; None if there is no such hall."""
+    cursor = db.cursor()
+    try:
+        if is_postgres:
+            cursor.execute(lock_sql(1), (hall,))
+        cursor.execute(_SET_CAPACITY, (capacity, hall))
+        cursor.execute(_RECOUNT, (hall,))
+        row = cursor.fetchone()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return row['vacancy'] if row else None
+
+
+class HallAuditor:
+    """Runs ``job()`` (audit, and repair if configured) every ``interval`` seconds."""
+
+    def __init__(self, job, interval, log=print):
+        self.job = job
+        self.interval = interval
+        self.log = log
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'failures': 0, 'repairs': 0, 'last_run': None, 'last_elapsed': None,
+                       'drift': 0, 'orphaned_bookings': 0, 'broken_accounts': 0, 'unknown_capacity': 0}
+
+    def run_once(self):
+        report, repaired = self.job()
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['repairs'] += bool(repaired)
+            self._stats['last_run'] = time.time()
+            self._stats['last_elapsed'] = report['elapsed']
+            for key in ('drift', 'orphaned_bookings', 'broken_accounts', 'unknown_capacity'):
+                self._stats[key] = len(report[key])
+        return report
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                report = self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                self.log('Hall audit failed: %s' % e)
+                continue
+            if problems(report):
+                self.log('Hall audit: %d drifted hall(s), %d orphaned booking(s), %d broken account(s)' % (
+                    len(report['drift']) + len(report['unknown_capacity']), len(report['orphaned_bookings']),
+                    len(report['broken_accounts'])))
+
+    def start(self):
+        if self.interval > 0 and (self._thread is None or not self._thread.is_alive()):
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name='hall-audit', daemon=True)
+                    self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data['interval'] = self.interval
+        return data
@@ -0,0 +1,168 @@
+"""Per-request query instrumentation and Prometheus metrics.
+
+``ParamCursor`` reports every statement to ``record_query``; the statements
+are attributed to the request profile that ``start_request`` installed for
+the current context (a ``ContextVar``, so concurrent requests on other
+threads never mix).  At the end of a request the profile feeds the
+per-route histograms in ``Metrics``, which ``Metrics.render`` writes out in
+the Prometheus text exposition format.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+
+log = logging.getLogger('cfms.sql')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar('cfms_request_profile', default=None)
+
+
+def shape(sql):
+    """Statement text with whitespace collapsed; parameters are placeholders already."""
+    return ' '.join(sql.split())
+
+
+class RequestProfile:
+    def __init__(self, route, slow_query_seconds=None):
+        self.route = route
+        self.slow_query_seconds = slow_query_seconds
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.slow_queries = 0
+        self.db_time = 0.0
+        self.slowest = (0.0, None)
+        self.shapes = Counter()
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        key = shape(sql)
+        self.shapes[key] += 1
+        if elapsed > self.slowest[0]:
+            self.slowest = (elapsed, key)
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            self.slow_queries += 1
+            log.warning('slow query %.1f ms on %s: %s', elapsed * 1000, self.route, key)
+
+    def add_fetch(self, elapsed):
+        self.db_time += elapsed
+
+    def repeated(self, threshold):
+        """Statement shapes run more than ``threshold`` times (likely N+1 loops)."""
+        return [(sql, count) for sql, count in self.shapes.most_common() if count > threshold]
+
+
+def start_request(route, slow_query_seconds=None):
+    profile = RequestProfile(route, slow_query_seconds)
+    return profile, _current.set(profile)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_query(sql, elapsed):
+    profile = _current.get()
+    if profile is not None:
+        profile.add_query(sql, elapsed)
+
+
+def record_fetch(elapsed):
+    profile = _current.get()
+    if profile is not None:
+        profile.add_fetch(elapsed)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield '%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative)
+        yield '%s_sum{%s} %r' % (name, labels, self.sum)
+        yield '%s_count{%s} %d' % (name, labels, cumulative)
+
+
+def _labels(**values):
+    return ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                    for k, v in values.items())
+
+
+class Metrics:
+    """Per-process request and database metrics, keyed by route pattern."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}    # (route, method) -> Histogram
+        self._db_time = {}    # route -> Histogram
+        self._queries = {}    # route -> Histogram of queries per request
+        self._slowest = {}    # route -> Histogram of each request's slowest statement
+        self._responses = Counter()  # (route, method, status) -> count
+        self._slow = Counter()       # route -> slow queries
+
+    def observe(self, profile, method, status):
+        elapsed = time.perf_counter() - profile.started
+        route = profile.route
+        with self._lock:
+            self._latency.setdefault((route, method), Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self._db_time.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(profile.db_time)
+            self._queries.setdefault(route, Histogram(QUERY_COUNT_BUCKETS)).observe(profile.queries)
+            if profile.queries:
+                self._slowest.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(profile.slowest[0])
+            self._responses[(route, method, status)] += 1
+            if profile.slow_queries:
+                self._slow[route] += profile.slow_queries
+        return elapsed
+
+    def render(self, gauges=None):
+        """Prometheus text format; ``gauges`` maps metric name to ``(help, value)``."""
+        out = []
+        with self._lock:
+            out.append('# HELP cfms_http_request_duration_seconds Request latency by route.')
+            out.append('# TYPE cfms_http_request_duration_seconds histogram')
+            for (route, method), hist in sorted(self._latency.items()):
+                out.extend(hist.lines('cfms_http_request_duration_seconds', _labels(route=route, method=method)))
+            out.append('# HELP cfms_http_responses_total Responses by route and status.')
+            out.append('# TYPE cfms_http_responses_total counter')
+            for (route, method, status), count in sorted(self._responses.items()):
+                out.append('cfms_http_responses_total{%s} %d' % (_labels(route=route, method=method, status=status),
+                                                                  count))
+            out.append('# HELP cfms_db_time_seconds Time spent in the database per request.')
+            out.append('# TYPE cfms_db_time_seconds histogram')
+            for route, hist in sorted(self._db_time.items()):
+                out.extend(hist.lines('cfms_db_time_seconds', _labels(route=route)))
+            out.append('# HELP cfms_db_queries_per_request Statements executed per request.')
+            out.append('# TYPE cfms_db_queries_per_request histogram')
+            for route, hist in sorted(self._queries.items()):
+                out.extend(hist.lines('cfms_db_queries_per_request', _labels(route=route)))
+            out.append('# HELP cfms_db_slowest_query_seconds Duration of the slowest statement of each request.')
+            out.append('# TYPE cfms_db_slowest_query_seconds histogram')
+            for route, hist in sorted(self._slowest.items()):
+                out.extend(hist.lines('cfms_db_slowest_query_seconds', _labels(route=route)))
+            out.append('# HELP cfms_db_slow_queries_total Statements slower than the slow-query threshold.')
+            out.append('# TYPE cfms_db_slow_queries_total counter')
+            for route, count in sorted(self._slow.items()):
+                out.append('cfms_db_slow_queries_total{%s} %d' % (_labels(route=route), count))
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            out.append('# HELP %s %s' % (name, help_text))
+            out.append('# TYPE %s gauge' % name)
+            out.append('%s %r' % (name, value))
+        return '\n'.join(out) + '\n'
@@ -0,0 +1,118 @@
+"""Numbered schema migrations.
+
+Migrations live in ``migrations/<dialect>/NNNN_description.sql`` with one
+directory per backend (``sqlite`` and ``postgres``).  Applied versions are
+recorded in the ``schema_version`` table; each migration and its version row
+are committed together so a failed migration leaves nothing behind.
+"""
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+DIALECTS = ('sqlite', 'postgres')
+_FILENAME_RE = re.compile(r'^(\d{4})_([a-z0-9_]+)\.sql$')
+
+# Arbitrary constant so concurrent `flask db upgrade` runs on Postgres queue up.
+_PG_LOCK_KEY = 424242
+
+SCHEMA_VERSION_DDL = '''
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+def discover(dialect):
+    """Return ``[(version, name, path), ...]`` for ``dialect`` in version order."""
+    if dialect not in DIALECTS:
+        raise MigrationError('unknown dialect %r' % dialect)
+    directory = os.path.join(MIGRATIONS_DIR, dialect)
+    found = []
+    for filename in os.listdir(directory):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    found.sort()
+    versions = [m[0] for m in found]
+    if len(set(versions)) != len(versions):
+        raise MigrationError('duplicate migration version in %s' % directory)
+    return found
+
+
+def applied_versions(db):
+    cursor = db.cursor()
+    cursor.execute(SCHEMA_VERSION_DDL)
+    db.commit()
+    cursor.execute("SELECT version FROM schema_version")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def pending(db, dialect):
+    """Migrations for ``dialect`` that have not been applied to ``db`` yet."""
+    done = applied_versions(db)
+    return [m for m in discover(dialect) if m[0] not in done]
+
+
+def _apply_sqlite(db, version, name, sql):
+    # executescript() commits before it runs, so the BEGIN/COMMIT pair has to
+    # live inside the script for the DDL and the version row to be atomic.
+    script = 'BEGIN IMMEDIATE;\n%s;\nINSERT INTO schema_version (version, name) VALUES (%d, \'%s\');\nCOMMIT;' % (
+        sql, version, name)
+    try:
+        db.executescript(script)
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _apply_postgres(db, version, name, sql):
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(?)", (_PG_LOCK_KEY,))
+        cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+        if cursor.fetchone() is not None:
+            db.rollback()
+            return False
+        db.executescript(sql)
+        cursor.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return True
+
+
+def upgrade(db, dialect, log=None):
+    """Apply every pending migration in order; returns the versions applied."""
+    applied = []
+    for version, name, path in pending(db, dialect):
+        with open(path) as fh:
+            sql = fh.read()
+        if log:
+            log('Applying %04d_%s' % (version, name))
+        if dialect == 'postgres':
+            if not _apply_postgres(db, version, name, sql):
+                continue
+        else:
+            _apply_sqlite(db, version, name, sql)
+        applied.append(version)
+    return applied
+
+
+def verify(db, dialect):
+    """Raise MigrationError unless ``db`` is at the latest schema version."""
+    missing = pending(db, dialect)
+    if missing:
+        raise MigrationError('database has %d pending migration(s): %s' % (
+            len(missing), ', '.join('%04d_%s' % (v, n) for v, n, _ in missing)))
+    known = {m[0] for m in discover(dialect)}
+    unknown = applied_versions(db) - known
+    if unknown:
+        raise MigrationError('database has migration(s) this code does not know about: %s' % (
+            ', '.join('%04d' % v for v in sorted(unknown))))
@@ -0,0 +1,17 @@
+-- Sample halls and events; rows that already exist are left untouched.
+
+INSERT INTO Hall (name, location, vacancy, price) VALUES
+    ('LBS HALL', 'Old Hijili', 50, 200),
+    ('MT HALL', 'Main Building', 50, 200),
+    ('SNVH HALL', 'Pepsi Cut', 50, 200),
+    ('VS HALL', 'Jhan Ghosh', 50, 200),
+    ('JCB HALL', 'Gymkhana', 50, 200)
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO Event (name, description, date, time, location) VALUES
+    ('Battle of Bands', 'Music competition between college bands', '2024-03-15', '18:00', 'Main Auditorium'),
+    ('Dance Competition', 'Inter-college dance competition', '2024-03-16', '19:00', 'Open Air Theatre'),
+    ('Coding Contest', 'Programming competition', '2024-03-17', '10:00', 'Computer Lab'),
+    ('Art Exhibition', 'Student art showcase', '2024-03-18', '14:00', 'Art Gallery'),
+    ('Sports Meet', 'Annual sports competition', '2024-03-19', '08:00', 'Sports Ground')
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,10 @@
+-- Secondary indexes for the per-user and per-hall lookups.
+-- EventRegistration.event, Volunteer.event_name and Event_has_organiser.event_name
+-- are already the leading column of their unique/primary keys, and
+-- Accomadation.email has ux_accomadation_email (0003).
+
+CREATE INDEX IF NOT EXISTS ix_eventregistration_event_time ON EventRegistration (event, registered_at);
+CREATE INDEX IF NOT EXISTS ix_eventregistration_student_email ON EventRegistration (student_email);
+CREATE INDEX IF NOT EXISTS ix_volunteer_student_email ON Volunteer (student_email);
+CREATE INDEX IF NOT EXISTS ix_accomadation_name_hall ON Accomadation (name_hall);
+CREATE INDEX IF NOT EXISTS ix_event_has_organiser_org_email ON Event_has_organiser (org_email);
@@ -0,0 +1,3 @@
+-- Bulk import checks roll numbers against existing students.
+
+CREATE INDEX IF NOT EXISTS ix_student_roll_number ON Student (roll_number);
@@ -0,0 +1,6 @@
+-- Password hashes (scrypt/pbkdf2) are longer than the original VARCHAR(100).
+
+ALTER TABLE CustomUser ALTER COLUMN password TYPE VARCHAR(255);
+ALTER TABLE Student ALTER COLUMN password TYPE VARCHAR(255);
+ALTER TABLE ExternalParticipant ALTER COLUMN password TYPE VARCHAR(255);
+ALTER TABLE Organiser ALTER COLUMN password TYPE VARCHAR(255);
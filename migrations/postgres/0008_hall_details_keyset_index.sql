@@ -0,0 +1,5 @@
+-- hall_details pages a hall's bookings by id (keyset pagination); extend the
+-- per-hall index with id so each page is a single range scan with no sort.
+
+DROP INDEX IF EXISTS ix_accomadation_name_hall;
+CREATE INDEX IF NOT EXISTS ix_accomadation_name_hall_id ON Accomadation (name_hall, id);
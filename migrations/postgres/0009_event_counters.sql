@@ -0,0 +1,25 @@
+-- Per-event registration and volunteer counts, kept up to date by the
+-- registration, volunteer and user-deletion paths (see counters.py) so the
+-- organiser and admin dashboards read them without counting rows.  The
+-- student/external split follows CustomUser.role.  capacity is optional;
+-- when set, registrations stop at it.
+
+CREATE TABLE IF NOT EXISTS EventCounter (
+    event VARCHAR(200) PRIMARY KEY,
+    registrations INTEGER NOT NULL DEFAULT 0,
+    student_registrations INTEGER NOT NULL DEFAULT 0,
+    external_registrations INTEGER NOT NULL DEFAULT 0,
+    volunteers INTEGER NOT NULL DEFAULT 0,
+    capacity INTEGER,
+    FOREIGN KEY (event) REFERENCES Event (name) ON DELETE CASCADE
+);
+
+INSERT INTO EventCounter (event, registrations, student_registrations, external_registrations, volunteers)
+SELECT e.name,
+       (SELECT COUNT(*) FROM EventRegistration er WHERE er.event = e.name),
+       (SELECT COUNT(*) FROM EventRegistration er JOIN CustomUser u ON u.email = er.student_email
+        WHERE er.event = e.name AND u.role = 'STUDENT'),
+       (SELECT COUNT(*) FROM EventRegistration er JOIN CustomUser u ON u.email = er.student_email
+        WHERE er.event = e.name AND u.role = 'EXTERNAL'),
+       (SELECT COUNT(*) FROM Volunteer v WHERE v.event_name = e.name)
+FROM Event e;
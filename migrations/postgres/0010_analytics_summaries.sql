@@ -0,0 +1,44 @@
+-- Summary tables behind /admin_analytics/, maintained incrementally by the
+-- registration, booking and user-deletion paths (see analytics.py) and
+-- rebuilt by `flask db refresh-analytics`.  Per-event figures come from
+-- EventCounter (0009).
+
+CREATE TABLE IF NOT EXISTS CollegeSummary (
+    college_name VARCHAR(100) PRIMARY KEY,
+    participants INTEGER NOT NULL DEFAULT 0,
+    registrations INTEGER NOT NULL DEFAULT 0,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    revenue BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS DailyRegistrations (
+    day DATE PRIMARY KEY,
+    registrations INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS HallSummary (
+    name VARCHAR(100) PRIMARY KEY,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    revenue BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (name) REFERENCES Hall (name) ON DELETE CASCADE
+);
+
+INSERT INTO CollegeSummary (college_name, participants, registrations, bookings, revenue)
+SELECT ep.college_name,
+       COUNT(*),
+       COALESCE(SUM((SELECT COUNT(*) FROM EventRegistration er WHERE er.student_email = ep.email)), 0),
+       COALESCE(SUM((SELECT COUNT(*) FROM Accomadation a WHERE a.email = ep.email)), 0),
+       COALESCE(SUM((SELECT COALESCE(SUM(a.price), 0) FROM Accomadation a WHERE a.email = ep.email)), 0)
+FROM ExternalParticipant ep
+GROUP BY ep.college_name;
+
+INSERT INTO DailyRegistrations (day, registrations)
+SELECT DATE(registered_at), COUNT(*)
+FROM EventRegistration
+WHERE registered_at IS NOT NULL
+GROUP BY DATE(registered_at);
+
+INSERT INTO HallSummary (name, bookings, revenue)
+SELECT name_hall, COUNT(*), COALESCE(SUM(price), 0)
+FROM Accomadation
+GROUP BY name_hall;
@@ -0,0 +1,9 @@
+-- Beds per hall.  Hall.vacancy counts down from it as halls are booked, so
+-- vacancy = capacity - bookings is what the hall audit (hall_audit.py,
+-- `flask db audit-halls`) checks.  Existing halls take their current
+-- vacancy plus bookings; correct any that were already off with
+-- `flask db set-hall-capacity`.
+
+ALTER TABLE Hall ADD COLUMN capacity INTEGER;
+
+UPDATE Hall SET capacity = vacancy + (SELECT COUNT(*) FROM Accomadation a WHERE a.name_hall = Hall.name);
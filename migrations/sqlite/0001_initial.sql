@@ -0,0 +1,88 @@
+-- Initial CFMS schema (sqlite).
+
+CREATE TABLE IF NOT EXISTS CustomUser (
+    email VARCHAR(100) PRIMARY KEY,
+    password VARCHAR(100) NOT NULL,
+    role VARCHAR(20) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Student (
+    email VARCHAR(100) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    roll_number VARCHAR(20) NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ExternalParticipant (
+    email VARCHAR(100) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    college_name VARCHAR(100) NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Organiser (
+    email VARCHAR(100) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    FOREIGN KEY (email) REFERENCES CustomUser (email) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Event (
+    name VARCHAR(200) PRIMARY KEY,
+    description TEXT,
+    date DATE DEFAULT CURRENT_DATE,
+    time TIME,
+    location VARCHAR(200)
+);
+
+CREATE TABLE IF NOT EXISTS EventRegistration (
+    event VARCHAR(200),
+    student_email VARCHAR(100),
+    FOREIGN KEY (event) REFERENCES Event (name) ON DELETE CASCADE,
+    FOREIGN KEY (student_email) REFERENCES CustomUser (email) ON DELETE CASCADE,
+    UNIQUE(event, student_email)
+);
+
+CREATE TABLE IF NOT EXISTS Hall (
+    name VARCHAR(100) PRIMARY KEY,
+    location VARCHAR(200),
+    vacancy INTEGER DEFAULT 50,
+    price INTEGER DEFAULT 200
+);
+
+CREATE TABLE IF NOT EXISTS Accomadation (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name_par VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    date DATE DEFAULT CURRENT_DATE,
+    name_hall VARCHAR(100) NOT NULL,
+    price INTEGER,
+    FOREIGN KEY (email) REFERENCES ExternalParticipant (email) ON DELETE CASCADE,
+    FOREIGN KEY (name_hall) REFERENCES Hall (name) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Volunteer (
+    event_name VARCHAR(100),
+    student_name VARCHAR(100),
+    student_email VARCHAR(100),
+    FOREIGN KEY (event_name) REFERENCES Event (name) ON DELETE CASCADE,
+    FOREIGN KEY (student_email) REFERENCES Student (email) ON DELETE CASCADE,
+    PRIMARY KEY(event_name, student_email)
+);
+
+CREATE TABLE IF NOT EXISTS Event_has_organiser (
+    event_name VARCHAR(100),
+    org_name VARCHAR(100),
+    org_email VARCHAR(100),
+    FOREIGN KEY (event_name) REFERENCES Event (name) ON DELETE CASCADE,
+    FOREIGN KEY (org_email) REFERENCES Organiser (email) ON DELETE CASCADE,
+    PRIMARY KEY(event_name, org_email)
+);
+
+CREATE TABLE IF NOT EXISTS Winners (
+    event VARCHAR(200) PRIMARY KEY,
+    name_par VARCHAR(100),
+    email VARCHAR(100)
+);
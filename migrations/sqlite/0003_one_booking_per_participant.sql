@@ -0,0 +1,3 @@
+-- mybooking_portal relies on this to reject a second booking atomically.
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_accomadation_email ON Accomadation (email);
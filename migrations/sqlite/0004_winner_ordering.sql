@@ -0,0 +1,7 @@
+-- Registration time gives winners a deterministic order; Winners remembers
+-- the registration count and latest registration it was computed from so
+-- an incremental run can skip unchanged events.
+
+ALTER TABLE EventRegistration ADD COLUMN registered_at TIMESTAMP;
+ALTER TABLE Winners ADD COLUMN registrations INTEGER;
+ALTER TABLE Winners ADD COLUMN last_registered_at TIMESTAMP;
@@ -0,0 +1,3 @@
+-- Password hashes (scrypt/pbkdf2) are longer than the original VARCHAR(100).
+-- SQLite does not enforce VARCHAR lengths, so there is nothing to change here;
+-- the file keeps version numbers aligned with the postgres dialect.
@@ -0,0 +1,4 @@
+-- hall_details pages a hall's bookings by id (keyset pagination).  On SQLite
+-- Accomadation.id is the rowid, which every index already carries as its
+-- last column, so ix_accomadation_name_hall serves the seek and its order.
+-- Nothing to do; the Postgres migration widens the index to (name_hall, id).
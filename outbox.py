@@ -0,0 +1,183 @@
+"""Background sender for the transactional email outbox.
+
+Request handlers only add an outbox row to the session they are about to
+commit, so the email is queued if and only if the registration commits.
+``OutboxSender`` drains pending rows in batches over a single SMTP
+connection that stays open while there is work, and retries failed messages
+with exponential backoff.  ``run`` drains in the foreground (the
+``flask outbox-worker`` command); ``start`` runs it on a daemon thread.
+"""
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask_mail import Message
+
+
+class OutboxSender:
+    def __init__(self, app, db, model, mail, batch_size=50, poll_interval=2.0,
+                 max_attempts=5, backoff_base=30.0, backoff_max=3600.0, idle_disconnect=30.0):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.mail = mail
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_disconnect = idle_disconnect
+        self._conn = None
+        self._last_used = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'sent': 0,
+            'failed_attempts': 0,
+            'batches': 0,
+            'smtp_connects': 0,
+            'send_time_total': 0.0,
+            'send_time_max': 0.0,
+            'queue_latency_total': 0.0,
+            'queue_latency_max': 0.0,
+        }
+
+    # -- SMTP connection ---------------------------------------------------
+
+    def _dev_mode(self):
+        return not self.app.config.get('MAIL_USERNAME')
+
+    def _connection(self):
+        if self._conn is None:
+            conn = self.mail.connect()
+            conn.__enter__()
+            self._conn = conn
+            self._stats['smtp_connects'] += 1
+        return self._conn
+
+    def _disconnect(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.__exit__(None, None, None)
+            except Exception:
+                pass
+
+    def _deliver(self, row):
+        if self._dev_mode():
+            print(f'[EMAIL-DEV] To: {row.recipient} | {row.subject} | {row.body}')
+            return
+        msg = Message(subject=row.subject, recipients=[row.recipient], body=row.body)
+        try:
+            self._connection().send(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Stale or dropped connection: reconnect once before counting a failure.
+            self._disconnect()
+            self._connection().send(msg)
+        self._last_used = time.monotonic()
+
+    # -- draining ----------------------------------------------------------
+
+    def _backoff(self, attempts):
+        return timedelta(seconds=min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max))
+
+    def drain_once(self):
+        """Send one batch of due messages; returns how many were attempted."""
+        model = self.model
+        with self.app.app_context():
+            now = datetime.utcnow()
+            query = (model.query
+                     .filter(model.sent_at.is_(None),
+                             model.attempts < self.max_attempts,
+                             model.next_attempt_at <= now)
+                     .order_by(model.id)
+                     .limit(self.batch_size))
+            if self.db.engine.dialect.name == 'postgresql':
+                # Lets several sender processes share one outbox.
+                query = query.with_for_update(skip_locked=True)
+            batch = query.all()
+            if not batch:
+                self.db.session.rollback()
+                return 0
+
+            for row in batch:
+                started = time.monotonic()
+                try:
+                    self._deliver(row)
+                except Exception as e:
+                    self._disconnect()
+                    row.attempts += 1
+                    row.last_error = str(e)[:1000]
+                    row.next_attempt_at = datetime.utcnow() + self._backoff(row.attempts)
+                    with self._lock:
+                        self._stats['failed_attempts'] += 1
+                    continue
+                elapsed = time.monotonic() - started
+                row.attempts += 1
+                row.sent_at = datetime.utcnow()
+                row.last_error = None
+                queued_for = (row.sent_at - row.created_at).total_seconds()
+                with self._lock:
+                    self._stats['sent'] += 1
+                    self._stats['send_time_total'] += elapsed
+                    self._stats['send_time_max'] = max(self._stats['send_time_max'], elapsed)
+                    self._stats['queue_latency_total'] += queued_for
+                    self._stats['queue_latency_max'] = max(self._stats['queue_latency_max'], queued_for)
+            self.db.session.commit()
+            with self._lock:
+                self._stats['batches'] += 1
+            return len(batch)
+
+    def run(self):
+        """Drain until ``stop()`` is called."""
+        try:
+            while not self._stop.is_set():
+                try:
+                    attempted = self.drain_once()
+                except Exception as e:
+                    print('Email outbox drain failed:', e)
+                    attempted = 0
+                if attempted:
+                    continue
+                if self._conn is not None and time.monotonic() - self._last_used > self.idle_disconnect:
+                    self._disconnect()
+                self._stop.wait(self.poll_interval)
+        finally:
+            self._disconnect()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self.run, name='email-outbox', daemon=True)
+                    self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # -- reporting ---------------------------------------------------------
+
+    def stats(self):
+        model = self.model
+        with self.app.app_context():
+            pending = model.query.filter(model.sent_at.is_(None), model.attempts < self.max_attempts).count()
+            dead = model.query.filter(model.sent_at.is_(None), model.attempts >= self.max_attempts).count()
+            oldest = (self.db.session.query(self.db.func.min(model.created_at))
+                      .filter(model.sent_at.is_(None), model.attempts < self.max_attempts).scalar())
+        with self._lock:
+            data = dict(self._stats)
+        sent = data['sent']
+        data.update({
+            'queue_depth': pending,
+            'dead': dead,
+            'oldest_pending_age': (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+            'send_time_avg': data['send_time_total'] / sent if sent else 0.0,
+            'queue_latency_avg': data['queue_latency_total'] / sent if sent else 0.0,
+            'running': self._thread is not None and self._thread.is_alive(),
+        })
+        return data
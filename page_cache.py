@@ -0,0 +1,102 @@
+"""Rendered page and fragment cache.
+
+``PageCache`` keeps rendered page bodies and template fragments in one LRU
+bounded by entry count and by total size, so a burst of distinct pages
+evicts the least recently used ones instead of growing the worker.  Callers
+key entries by route, the viewer's role and the version of the data the
+output shows (``DataVersions``), so a write only has to bump a version:
+entries for the old version are never asked for again and age out of the
+LRU.  Entries also expire after ``ttl`` seconds, which bounds how long a page
+can lag behind a write made in another worker process.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+KINDS = ('page', 'fragment')
+
+# Rough per-entry cost of the key, tuple and OrderedDict slot.
+_ENTRY_OVERHEAD = 256
+
+
+class DataVersions:
+    """Per-process version numbers for data that cached output depends on."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def get(self, name):
+        return self._versions.get(name, 0)
+
+
+class PageCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=5000, ttl=30.0):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # (kind, key) -> (expires_at, size, value)
+        self._bytes = 0
+        self._stats = {'evictions': 0, 'expired': 0, 'too_large': 0}
+        for kind in KINDS:
+            self._stats[kind + '_hits'] = 0
+            self._stats[kind + '_misses'] = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def _drop(self, slot):
+        self._bytes -= self._data.pop(slot)[1]
+
+    def get(self, kind, key):
+        slot = (kind, key)
+        with self._lock:
+            entry = self._data.get(slot)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(slot)
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats[kind + '_misses'] += 1
+                return None
+            self._data.move_to_end(slot)
+            self._stats[kind + '_hits'] += 1
+            return entry[2]
+
+    def set(self, kind, key, value, size=None):
+        """Store ``value``; ``size`` defaults to its ``sys.getsizeof`` (bytes or str bodies)."""
+        size = (sys.getsizeof(value) if size is None else size) + _ENTRY_OVERHEAD
+        slot = (kind, key)
+        with self._lock:
+            if size > self.max_bytes // 4:
+                self._stats['too_large'] += 1
+                return
+            if slot in self._data:
+                self._drop(slot)
+            self._data[slot] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update({'entries': len(self._data), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                         'max_entries': self.max_entries, 'ttl': self.ttl})
+        for kind in KINDS:
+            lookups = data[kind + '_hits'] + data[kind + '_misses']
+            data[kind + '_hit_ratio'] = data[kind + '_hits'] / lookups if lookups else 0.0
+        return data
@@ -0,0 +1,103 @@
+"""Keyset (seek) pagination.
+
+Listing routes never fetch a whole table: ``fetch_page`` wraps a query in
+``WHERE key > ? ORDER BY key LIMIT n + 1`` (or the reverse for a previous
+page), so every page costs one index seek no matter how deep it is.  Cursors
+are the opaque, URL-safe encoding of the boundary key value.
+"""
+import base64
+import bisect
+import json
+import os
+
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '200'))
+
+_FIRST = "SELECT * FROM ({sql}) page ORDER BY {key} LIMIT ?"
+_AFTER = "SELECT * FROM ({sql}) page WHERE {key} > ? ORDER BY {key} LIMIT ?"
+_BEFORE = "SELECT * FROM ({sql}) page WHERE {key} < ? ORDER BY {key} DESC LIMIT ?"
+
+
+class Page:
+    def __init__(self, items, size, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.size = size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(value):
+    raw = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Return the key value in ``token``, or None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page_args(values):
+    """``(after, before, size)`` from request args/form (``after``, ``before``, ``limit``)."""
+    try:
+        size = int(values.get('limit', PAGE_SIZE))
+    except (TypeError, ValueError):
+        size = PAGE_SIZE
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    return decode_cursor(values.get('after')), decode_cursor(values.get('before')), size
+
+
+def keyset_sql(sql, key, after=None, before=None):
+    """Wrap ``sql`` (which must select ``key``) in the seek query for one page."""
+    if before is not None:
+        return _BEFORE.format(sql=sql, key=key)
+    if after is not None:
+        return _AFTER.format(sql=sql, key=key)
+    return _FIRST.format(sql=sql, key=key)
+
+
+def build_page(rows, size, key_of, after=None, before=None):
+    """Turn up to ``size + 1`` rows read towards the boundary into a Page.
+
+    For a ``before`` page the rows are expected nearest-first (descending).
+    """
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if before is not None:
+        rows.reverse()
+        next_cursor = encode_cursor(key_of(rows[-1])) if rows else encode_cursor(before)
+        prev_cursor = encode_cursor(key_of(rows[0])) if rows and has_more else None
+    else:
+        next_cursor = encode_cursor(key_of(rows[-1])) if rows and has_more else None
+        prev_cursor = encode_cursor(key_of(rows[0])) if rows and after is not None else None
+    return Page(rows, size, next_cursor, prev_cursor)
+
+
+def fetch_page(cursor, sql, params, key, after=None, before=None, size=PAGE_SIZE):
+    """Run one page of ``sql`` ordered by the unique column ``key``."""
+    boundary = [before] if before is not None else [after] if after is not None else []
+    cursor.execute(keyset_sql(sql, key, after, before), list(params) + boundary + [size + 1])
+    return build_page(cursor.fetchall(), size, lambda row: row[key], after, before)
+
+
+def paginate_sorted(items, key, after=None, before=None, size=PAGE_SIZE):
+    """Same cursors over an in-memory list already sorted by ``key`` (e.g. a cached catalog)."""
+    keys = [item[key] for item in items]
+    if before is not None:
+        end = bisect.bisect_left(keys, before)
+        rows = items[max(0, end - size - 1):end][::-1]
+    else:
+        start = bisect.bisect_right(keys, after) if after is not None else 0
+        rows = items[start:start + size + 1]
+    return build_page(list(rows), size, lambda row: row[key], after, before)
@@ -0,0 +1,114 @@
+"""Password hashing on a bounded worker pool.
+
+Hashing and verification are CPU-bound by design.  ``PasswordHasher`` runs
+them on a fixed number of threads (hashlib releases the GIL while it works)
+and refuses new work with ``HasherBusy`` once ``max_queue`` jobs are waiting,
+so a login rush degrades into fast 503s instead of every worker thread
+sitting in a hash.  A job that does not finish within ``timeout`` seconds
+raises ``HasherBusy`` as well.
+"""
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(RuntimeError):
+    """Too many hashing jobs are already queued, or one took too long."""
+
+
+def is_hashed(stored):
+    """True if ``stored`` is a werkzeug hash rather than a legacy plaintext password."""
+    method, sep, _ = (stored or '').partition('$')
+    return bool(sep) and method.split(':', 1)[0] in ('pbkdf2', 'scrypt')
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_queue=64, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._stats = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected_busy': 0, 'timed_out': 0}
+        self._prefix = None
+        self._dummy = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected_busy'] += 1
+            raise HasherBusy('password hashing queue is full')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            self._count('timed_out')
+            raise HasherBusy('password hashing timed out') from None
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def hash(self, password):
+        result = self._run(generate_password_hash, password, self.method)
+        self._prefix = result.split('$', 1)[0]
+        self._count('hashed')
+        return result
+
+    def hash_prefix(self):
+        """``method:params`` part of hashes made with the configured method."""
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def _dummy_hash(self):
+        if self._dummy is None:
+            self._dummy = generate_password_hash(secrets.token_urlsafe(16), self.method)
+        return self._dummy
+
+    def needs_rehash(self, stored):
+        """True for legacy plaintext rows and hashes made with a different method/cost."""
+        return not is_hashed(stored) or stored.split('$', 1)[0] != self.hash_prefix()
+
+    def verify(self, stored, password):
+        """Check ``password`` against a stored hash or legacy plaintext value.
+
+        Unknown accounts (``stored`` None) and legacy rows are checked against
+        a dummy hash as well, so the response time does not reveal whether an
+        email is registered.
+        """
+        if password is None:
+            return False
+        self._count('verified')
+        if stored is not None and is_hashed(stored):
+            return self._run(check_password_hash, stored, password)
+        self._run(check_password_hash, self._dummy_hash(), password)
+        if stored is None:
+            return False
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+
+    def verify_and_update(self, stored, password):
+        """Return ``(ok, new_hash)``; ``new_hash`` is set when the row should be upgraded."""
+        if not self.verify(stored, password):
+            return False, None
+        if not self.needs_rehash(stored):
+            return True, None
+        new_hash = self.hash(password)
+        self._count('rehashed')
+        return True, new_hash
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data.update({'method': self.method, 'workers': self.workers, 'max_queue': self.max_queue})
+        return data
@@ -0,0 +1,252 @@
+"""Query-plan regression check.
+
+Collects the SQL the application runs and reports every statement whose plan
+reads a whole table.  Statements are gathered from two places:
+
+* literal first arguments of ``.execute(...)`` calls in the modules listed in
+  ``SOURCE_MODULES`` (found with ``ast``, so new queries are picked up
+  without registering them), and
+* module-level SQL constants in those modules.  A ``_PG_`` or ``_SQLITE_``
+  prefix limits a constant to that backend.
+* literal queries passed to ``fetch_page(...)``, expanded into their keyset
+  page variants.  Paged statements must also be served in key order straight
+  from an index: a sort step is reported like a full scan.
+
+On SQLite the check runs ``EXPLAIN QUERY PLAN`` against a throwaway database
+built from the migrations; on Postgres it runs ``EXPLAIN (FORMAT JSON)`` on a
+generic plan with sequential scans disabled, so only unavoidable seq scans
+remain.  Run it with ``flask --app app db check-plans``.
+"""
+import ast
+import os
+import re
+import sqlite3
+import tempfile
+
+import exports
+import migrate
+import analytics
+import bulk_delete
+import bulk_import
+import counters
+import hall_audit
+import pagination
+import roster
+import statements
+import winners
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_MODULES = ('analytics.py', 'app.py', 'booking.py', 'bulk_delete.py', 'bulk_import.py', 'cache.py',
+                  'counters.py', 'hall_audit.py', 'roster.py', 'winners.py')
+
+_SQL_START = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+_SQLITE_SORT = re.compile(r'^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+SORT = '(sort)'
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+# Statements that read a whole table on purpose, with the tables they may scan.
+ALLOWED_SCANS = {
+    normalize("SELECT * FROM Hall"): {'hall'},
+    normalize("SELECT * FROM Event ORDER BY name"): {'event'},
+    # Ranking every event necessarily reads every registration once.
+    normalize(winners.upsert_sql(False, False)): {'eventregistration'},
+    normalize(winners.upsert_sql(False, True)): {'eventregistration'},
+    normalize(winners.upsert_sql(True, True)): {'eventregistration'},
+    # One row per event.
+    normalize(winners._PRUNE): {'winners'},
+    # The first page walks the primary key index from the start.
+    normalize(pagination.keyset_sql("SELECT * FROM Hall", 'name')): {'hall'},
+    normalize("SELECT event, name_par, email FROM Winners ORDER BY event"): {'winners'},
+    normalize(exports.EXPORTS['winners']['sql']): {'winners'},
+    # The vacancy feed's (re)load, at most once per resync interval.
+    normalize("SELECT name, vacancy FROM Hall"): {'hall'},
+    # Counter reconciliation recounts everything on purpose.
+    normalize(counters._ACTUAL_REGISTRATIONS): {'eventregistration', 'customuser'},
+    normalize(counters._ACTUAL_VOLUNTEERS): {'volunteer'},
+    normalize(counters._STORED): {'eventcounter'},
+    normalize(counters._EVENTS): {'event'},
+    # The analytics page reads whole summary tables: one row per event, college, day or hall.
+    normalize(analytics._TOP_EVENTS): {'eventcounter'},
+    normalize(analytics._TOTALS): {'eventcounter'},
+    normalize(analytics._COLLEGES): {'collegesummary'},
+    normalize(analytics._DAYS): {'dailyregistrations'},
+    normalize(analytics._HALLS): {'hall'},
+    # Bulk deletion by role or college picks every matching account.
+    normalize(bulk_delete._FIND_ROLE): {'customuser'},
+    normalize(bulk_delete._FIND_COLLEGE): {'externalparticipant'},
+    # The hall audit recounts every booking and checks every account on purpose.
+    normalize(hall_audit._OCCUPANCY): {'hall', 'accomadation'},
+    normalize(hall_audit._ORPHANED_BOOKINGS): {'accomadation'},
+    normalize(hall_audit._BROKEN_ACCOUNTS): {'customuser'},
+    normalize(analytics._PRUNE[0]): {'collegesummary'},
+    normalize(analytics._PRUNE[1]): {'dailyregistrations'},
+    normalize(analytics._PRUNE[2]): {'hallsummary'},
+}
+
+
+def _literal_queries(path):
+    with open(path) as fh:
+        tree = ast.parse(fh.read(), path)
+    found = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == 'execute' and node.args
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)
+                and _SQL_START.match(node.args[0].value)):
+            found.append(('%s:%d' % (os.path.basename(path), node.lineno), node.args[0].value, None))
+        elif (isinstance(node, ast.Assign) and len(node.targets) == 1
+              and isinstance(node.targets[0], ast.Name) and node.targets[0].id.isupper()
+              and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+              and '{' not in node.value.value and _SQL_START.match(node.value.value)):
+            name = node.targets[0].id
+            dialect = 'postgres' if name.startswith('_PG_') else 'sqlite' if name.startswith('_SQLITE_') else None
+            found.append(('%s:%s' % (os.path.basename(path), name), node.value.value, dialect))
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id == 'fetch_page' and len(node.args) >= 4
+              and isinstance(node.args[1], ast.Constant) and isinstance(node.args[3], ast.Constant)):
+            label = '%s:%d' % (os.path.basename(path), node.lineno)
+            found.extend(_page_variants(label, node.args[1].value, node.args[3].value))
+    return found
+
+
+def _page_variants(label, sql, key):
+    return [('%s(%s page)' % (label, which), pagination.keyset_sql(sql, key, after, before), 'paged')
+            for which, after, before in (('first', None, None), ('next', '', None), ('previous', None, ''))]
+
+
+def collect_queries(dialect):
+    """Return ``[(label, sql, paged), ...]`` for every statement run on ``dialect``."""
+    queries = []
+    for module in SOURCE_MODULES:
+        for label, sql, only in _literal_queries(os.path.join(BASE_DIR, module)):
+            if only == 'paged':
+                queries.append((label, sql, True))
+            elif only is None or only == dialect:
+                queries.append((label, sql, False))
+    is_pg = dialect == 'postgres'
+    queries.append(('winners.upsert_sql(full)', winners.upsert_sql(is_pg, False), False))
+    queries.append(('winners.upsert_sql(incremental)', winners.upsert_sql(is_pg, True), False))
+    # The roster seeks its participant page itself; the outer ORDER BY only
+    # sorts that page plus the volunteer and organiser rows, so sorts are fine.
+    queries.append(('roster.roster_sql(first page)', roster.roster_sql(), False))
+    queries.append(('roster.roster_sql(next page)', roster.roster_sql(after=''), False))
+    queries.append(('roster.roster_sql(previous page)', roster.roster_sql(before=''), False))
+    queries.append(('counters.counts_sql(1)', counters.counts_sql(1), False))
+    # Bulk deletion binds its accounts in a WITH clause ahead of each statement.
+    with_targets = bulk_delete.targets_sql(1)
+    queries.append(('bulk_delete._FREE_BEDS', with_targets + bulk_delete._FREE_BEDS.format(targets=bulk_delete.TARGETS),
+                    False))
+    for sql in counters.forget_users_sql(bulk_delete.TARGETS):
+        queries.append(('counters.forget_users_sql', with_targets + sql, False))
+    for sql in analytics.forget_users_sql(bulk_delete.TARGETS):
+        queries.append(('analytics.forget_users_sql', with_targets + sql, False))
+    for sql in analytics._PRUNE:
+        queries.append(('analytics._PRUNE', sql, False))
+    for key, template in (('find', bulk_delete._FIND_EMAILS),) + bulk_delete._DELETE:
+        for count in (1, bulk_delete.CHUNK_SIZE):
+            queries.append(('bulk_delete.%s(%d)' % (key, count), bulk_delete.in_list_sql(template, count), False))
+    for name in ('_TAKEN_EMAILS', '_TAKEN_ROLLS'):
+        template = getattr(bulk_import, name)
+        for count in (1, bulk_import.DEFAULT_CHUNK_SIZE):
+            queries.append(('bulk_import.%s(%d)' % (name, count), bulk_import.existing_sql(template, count), False))
+    if is_pg:
+        queries.append(('hall_audit.lock_sql(1)', hall_audit.lock_sql(1), False))
+    for kind, spec in sorted(exports.EXPORTS.items()):
+        queries.append(('exports.EXPORTS[%r]' % kind, spec['sql'], False))
+    seen, unique = set(), []
+    for label, sql, paged in queries:
+        key = normalize(sql)
+        if key not in seen:
+            seen.add(key)
+            unique.append((label, sql, paged))
+    return unique
+
+
+def _aliases(sql):
+    """Map every table name and alias in ``sql`` (lower-cased) to its table."""
+    mapping = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        mapping[table.lower()] = table.lower()
+        if alias:
+            mapping.setdefault(alias.lower(), table.lower())
+    return mapping
+
+
+def sqlite_full_scans(conn, sql):
+    """Tables read in full by ``sql``, plus ``SORT`` if it needs a temporary sort."""
+    tables = {row[0].lower() for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = _aliases(sql)
+    scans = set()
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, [None] * statements.translate(sql).count):
+        if _SQLITE_SORT.match(row[3]):
+            scans.add(SORT)
+        match = _SQLITE_SCAN.match(row[3])
+        if match:
+            table = aliases.get(match.group(1).lower(), match.group(1).lower())
+            if table in tables:
+                scans.add(table)
+    return scans
+
+
+def _pg_seq_scans(plan, scans):
+    if plan.get('Node Type') == 'Seq Scan':
+        scans.add(plan['Relation Name'].lower())
+    elif plan.get('Node Type') in ('Sort', 'Incremental Sort'):
+        scans.add(SORT)
+    for child in plan.get('Plans', []):
+        _pg_seq_scans(child, scans)
+    return scans
+
+
+def postgres_full_scans(conn, sql):
+    """``conn`` is a raw psycopg2 connection; nothing is committed."""
+    statement = statements.translate(sql)
+    cur = conn.cursor()
+    try:
+        cur.execute('SET LOCAL enable_seqscan = off')
+        cur.execute('SET LOCAL plan_cache_mode = force_generic_plan')
+        cur.execute('PREPARE cfms_plan_check AS ' + statement.numbered)
+        args = ', '.join(['NULL'] * statement.count)
+        cur.execute('EXPLAIN (FORMAT JSON) EXECUTE cfms_plan_check' + ('(%s)' % args if args else ''))
+        plan = cur.fetchone()[0][0]['Plan']
+        return _pg_seq_scans(plan, set())
+    finally:
+        conn.rollback()
+        cur.execute('DEALLOCATE ALL')
+        conn.rollback()
+
+
+def check(dialect, pg_conn=None):
+    """Return ``[(label, sql, tables), ...]`` for statements with unexpected full scans."""
+    failures = []
+    if dialect == 'postgres':
+        def scans_for(sql):
+            return postgres_full_scans(pg_conn, sql)
+        tmpdir = None
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        conn = sqlite3.connect(os.path.join(tmpdir.name, 'plans.db'))
+        conn.row_factory = sqlite3.Row
+        migrate.upgrade(conn, 'sqlite')
+
+        def scans_for(sql):
+            return sqlite_full_scans(conn, sql)
+    try:
+        for label, sql, paged in collect_queries(dialect):
+            scans = scans_for(sql)
+            if not paged:
+                scans.discard(SORT)
+            unexpected = scans - ALLOWED_SCANS.get(normalize(sql), set())
+            if unexpected:
+                failures.append((label, normalize(sql), sorted(unexpected)))
+    finally:
+        if tmpdir is not None:
+            conn.close()
+            tmpdir.cleanup()
+    return failures
@@ -0,0 +1,80 @@
+"""Per-event roster (participants, volunteers, organisers).
+
+One UNION ALL query returns all three lists for an event.  Participants
+are taken from ``EventRegistration`` with names resolved from either role
+table, so external participants are listed as well as students.  Results
+are cached per event and page; the registration, volunteer and delete paths
+call ``invalidate``.
+"""
+from cache import TTLCache
+from pagination import PAGE_SIZE, build_page
+
+# Participants are paged by email (keyset); volunteers and organisers are
+# short lists and come back in full.  {seek} and {direction} select the page.
+_ROSTER_SQL = """
+    SELECT * FROM (
+        SELECT 'participant' AS kind, er.student_email AS email, COALESCE(s.name, ep.name) AS name
+        FROM EventRegistration er
+        LEFT JOIN Student s ON s.email = er.student_email
+        LEFT JOIN ExternalParticipant ep ON ep.email = er.student_email
+        WHERE er.event = ?{seek}
+        ORDER BY er.student_email{direction}
+        LIMIT ?
+    ) participants
+    UNION ALL
+    SELECT 'volunteer', v.student_email, v.student_name
+    FROM Volunteer v
+    WHERE v.event_name = ?
+    UNION ALL
+    SELECT 'organiser', o.org_email, o.org_name
+    FROM Event_has_organiser o
+    WHERE o.event_name = ?
+    ORDER BY 1, 2
+"""
+
+_LISTS = {'participant': 'participants', 'volunteer': 'volunteers', 'organiser': 'organisers'}
+
+
+def roster_sql(after=None, before=None):
+    if before is not None:
+        return _ROSTER_SQL.format(seek=' AND er.student_email < ?', direction=' DESC')
+    if after is not None:
+        return _ROSTER_SQL.format(seek=' AND er.student_email > ?', direction='')
+    return _ROSTER_SQL.format(seek='', direction='')
+
+
+class RosterService:
+    def __init__(self, ttl=30.0, maxsize=512):
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def _load(self, get_db, event_name, after, before, size):
+        boundary = [before] if before is not None else [after] if after is not None else []
+        cursor = get_db().cursor()
+        cursor.execute(roster_sql(after, before), [event_name] + boundary + [size + 1, event_name, event_name])
+        lists = {name: [] for name in _LISTS.values()}
+        for row in cursor.fetchall():
+            lists[_LISTS[row['kind']]].append({'email': row['email'], 'name': row['name']})
+        participants = lists['participants']
+        if before is not None:
+            participants.reverse()  # build_page wants a backwards page nearest-first
+        lists['participants'] = build_page(participants, size, lambda p: p['email'], after, before)
+        return lists
+
+    def get(self, get_db, event_name, after=None, before=None, size=PAGE_SIZE):
+        """Return ``{'participants', 'volunteers', 'organisers'}`` for one event.
+
+        ``participants`` is a Page of ``{'email', 'name'}``; the other two are
+        plain lists.
+        """
+        key = (event_name, after, before, size)
+        return self._cache.get_or_load(key, lambda: self._load(get_db, event_name, after, before, size))
+
+    def invalidate(self, event_name=None):
+        """Drop one event's roster pages, or every roster when ``event_name`` is None."""
+        if event_name is None:
+            self._cache.invalidate()
+        else:
+            self._cache.invalidate_matching(lambda key: key[0] == event_name)
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,199 @@
+"""Placeholder translation and server-side prepared statements for Postgres.
+
+The application writes SQL with SQLite's ``?`` placeholders.  ``translate``
+turns a statement into psycopg2's ``%s`` form (and a ``$n`` form for
+``PREPARE``) while leaving ``?`` inside string literals, quoted identifiers
+and comments alone, and doubling literal ``%`` signs that psycopg2 would
+otherwise treat as format markers.  Results are kept in an LRU cache keyed
+by the source string, so a hot statement is scanned once per process.
+
+With ``PG_PREPARE_THRESHOLD`` set, each pooled connection also prepares a
+statement on the server after it has run that many times and executes it
+by name from then on, skipping parse and plan on the hot paths.
+"""
+import functools
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import psycopg2.extensions
+except Exception:  # psycopg2 is optional
+    psycopg2 = None
+
+STATEMENT_CACHE_SIZE = int(os.getenv('STATEMENT_CACHE_SIZE', '512'))
+
+_PREPARABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'VALUES')
+
+
+class Statement:
+    __slots__ = ('source', 'pyformat', 'numbered', 'count', 'preparable')
+
+    def __init__(self, source, pyformat, numbered, count):
+        self.source = source
+        self.pyformat = pyformat
+        self.numbered = numbered
+        self.count = count
+        self.preparable = source.lstrip().upper().startswith(_PREPARABLE)
+
+    def execute_sql(self, name):
+        if not self.count:
+            return 'EXECUTE ' + name
+        return 'EXECUTE %s (%s)' % (name, ', '.join(['%s'] * self.count))
+
+
+def _skip_quoted(sql, i, quote):
+    """Index just past the literal/identifier opened by ``quote`` at ``i``."""
+    n = len(sql)
+    i += 1
+    while i < n:
+        if sql[i] == quote:
+            if i + 1 < n and sql[i + 1] == quote:  # doubled quote is an escaped quote
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return n
+
+
+def _skip_dollar(sql, i):
+    """Index just past a ``$tag$ ... $tag$`` body starting at ``i``, or None if it is not one."""
+    end = sql.find('$', i + 1)
+    if end == -1:
+        return None
+    tag = sql[i:end + 1]
+    if not all(c.isalnum() or c == '_' for c in tag[1:-1]) or tag[1:2].isdigit():
+        return None
+    close = sql.find(tag, end + 1)
+    return len(sql) if close == -1 else close + len(tag)
+
+
+def _scan(sql):
+    """Yield ``(text, is_code)`` segments of ``sql``; only code may hold placeholders."""
+    n = len(sql)
+    start = i = 0
+    while i < n:
+        c = sql[i]
+        if c in ("'", '"'):
+            end = _skip_quoted(sql, i, c)
+        elif c == '-' and sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+        elif c == '/' and sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+        elif c == '$':
+            end = _skip_dollar(sql, i)
+            if end is None:
+                i += 1
+                continue
+        else:
+            i += 1
+            continue
+        if start < i:
+            yield sql[start:i], True
+        yield sql[i:end], False
+        start = i = end
+    if start < n:
+        yield sql[start:], True
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def translate(sql):
+    """Return the ``Statement`` for ``sql`` written with ``?`` placeholders."""
+    pyformat, numbered = [], []
+    count = 0
+    for text, is_code in _scan(sql):
+        if not is_code:
+            pyformat.append(text.replace('%', '%%'))
+            numbered.append(text)
+            continue
+        pieces = text.split('?')
+        pyformat.append('%s'.join(p.replace('%', '%%') for p in pieces))
+        numbered.append(pieces[0])
+        for piece in pieces[1:]:
+            count += 1
+            numbered.append('$%d' % count)
+            numbered.append(piece)
+    return Statement(sql, ''.join(pyformat), ''.join(numbered), count)
+
+
+_counter_lock = threading.Lock()
+_counters = {'prepared': 0, 'deallocated': 0, 'executed_prepared': 0}
+
+
+def _count(key):
+    with _counter_lock:
+        _counters[key] += 1
+
+
+class PreparedStatements:
+    """Per-connection registry of server-side prepared statements.
+
+    A statement is prepared on its ``threshold``-th use; at most ``maxsize``
+    stay prepared, least recently used ones are deallocated first.
+    """
+
+    def __init__(self, threshold=5, maxsize=100):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._prepared = OrderedDict()  # source sql -> statement name
+        self._uses = {}
+        self._ids = itertools.count(1)
+
+    def name_for(self, cursor, statement):
+        """Name to EXECUTE ``statement`` under, preparing it if it just became hot."""
+        name = self._prepared.get(statement.source)
+        if name is not None:
+            self._prepared.move_to_end(statement.source)
+            return name
+        uses = self._uses.get(statement.source, 0) + 1
+        if uses < self.threshold:
+            if len(self._uses) >= self.maxsize * 4:
+                self._uses.clear()  # forget one-off statements rather than grow forever
+            self._uses[statement.source] = uses
+            return None
+        self._uses.pop(statement.source, None)
+        name = 'cfms_stmt_%d' % next(self._ids)
+        cursor.execute('PREPARE %s AS %s' % (name, statement.numbered))
+        _count('prepared')
+        self._prepared[statement.source] = name
+        while len(self._prepared) > self.maxsize:
+            _, stale = self._prepared.popitem(last=False)
+            cursor.execute('DEALLOCATE ' + stale)
+            _count('deallocated')
+        return name
+
+
+if psycopg2 is not None:
+    class PreparingConnection(psycopg2.extensions.connection):
+        """psycopg2 connection carrying its own ``PreparedStatements`` registry."""
+        prepared = None
+else:
+    PreparingConnection = None
+
+
+def execute(cursor, statement, params):
+    """Run a translated statement on a psycopg2 cursor, by name once it is prepared."""
+    registry = getattr(cursor.connection, 'prepared', None)
+    if registry is None or not statement.preparable:
+        return cursor.execute(statement.pyformat, params)
+    name = registry.name_for(cursor, statement)
+    if name is None:
+        return cursor.execute(statement.pyformat, params)
+    _count('executed_prepared')
+    return cursor.execute(statement.execute_sql(name), params)
+
+
+def stats():
+    info = translate.cache_info()
+    with _counter_lock:
+        data = dict(_counters)
+    data.update({
+        'translation_cache_hits': info.hits,
+        'translation_cache_misses': info.misses,
+        'translation_cache_size': info.currsize,
+        'translation_cache_maxsize': info.maxsize,
+    })
+    return data
@@ -0,0 +1,174 @@
+"""Live hall vacancy for Server-Sent Events subscribers.
+
+``VacancyFeed`` keeps the current ``{hall: vacancy}`` map of this process in
+memory.  Write paths ``publish`` the vacancy they just committed; every
+change gets a version number and is kept in a short history, and
+subscribers block on one shared condition until the version moves past the
+last one they sent.  A subscriber therefore costs one waiting thread (or
+greenlet) and an integer, and no database access: the map is loaded once,
+then re-read at most once per ``resync_interval`` to pick up bookings made by
+other worker processes, however many clients are watching.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+
+class FeedFull(Exception):
+    """The process already serves ``max_subscribers`` streams."""
+
+
+class VacancyFeed:
+    def __init__(self, resync_interval=30.0, history=1024, max_subscribers=5000):
+        self.resync_interval = resync_interval
+        self.max_subscribers = max_subscribers
+        self._cond = threading.Condition()
+        self._vacancy = None          # hall -> vacancy; None until the first load
+        self._version = 0
+        self._history = deque(maxlen=history)  # (version, {hall: vacancy or None})
+        self._loaded_at = 0.0
+        self._loading = False
+        self._subscribers = 0
+        self._stats = {'loads': 0, 'publishes': 0, 'changes': 0, 'rejected': 0, 'resets': 0}
+
+    # -- writers -----------------------------------------------------------
+
+    def _apply(self, changes):
+        """Record the entries of ``changes`` that differ; caller holds the lock."""
+        delta = {hall: vacancy for hall, vacancy in changes.items() if self._vacancy.get(hall) != vacancy}
+        if not delta:
+            return
+        for hall, vacancy in delta.items():
+            if vacancy is None:
+                self._vacancy.pop(hall, None)
+            else:
+                self._vacancy[hall] = vacancy
+        self._version += 1
+        self._history.append((self._version, delta))
+        self._stats['changes'] += len(delta)
+        self._cond.notify_all()
+
+    def publish(self, changes):
+        """Announce committed vacancies, ``{hall: vacancy}``; ``None`` marks a removed hall."""
+        with self._cond:
+            self._stats['publishes'] += 1
+            if self._vacancy is not None:  # before the first load there is nobody to tell
+                self._apply(changes)
+
+    def reset(self):
+        """Forget the map; the next reader reloads it (after bulk changes)."""
+        with self._cond:
+            self._loaded_at = 0.0
+            self._stats['resets'] += 1
+
+    # -- readers -----------------------------------------------------------
+
+    def _load(self, loader):
+        with self._cond:
+            while self._loading:
+                if self._vacancy is not None:
+                    return  # serve the current map while another thread resyncs
+                self._cond.wait()
+            if not self._stale():
+                return  # loaded while we waited
+            self._loading = True
+        try:
+            rows = dict(loader())
+        except Exception:
+            with self._cond:
+                self._loading = False
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._loading = False
+            self._stats['loads'] += 1
+            self._loaded_at = time.monotonic()
+            if self._vacancy is None:
+                self._vacancy = rows
+                self._cond.notify_all()
+            else:
+                changes = dict(rows)
+                changes.update({hall: None for hall in self._vacancy if hall not in rows})
+                self._apply(changes)
+
+    def _stale(self):
+        return self._vacancy is None or time.monotonic() - self._loaded_at >= self.resync_interval
+
+    def refresh(self, loader):
+        """Reload through ``loader`` if the map is missing or older than ``resync_interval``."""
+        with self._cond:
+            stale = self._stale()
+        if stale:
+            self._load(loader)
+
+    def snapshot(self, loader):
+        """``(version, {hall: vacancy})``, loading the map on first use."""
+        self.refresh(loader)
+        with self._cond:
+            return self._version, dict(self._vacancy)
+
+    def wait(self, version, timeout):
+        """Changes after ``version``: ``(version, kind, halls)`` or None on timeout.
+
+        ``kind`` is ``'delta'`` normally and ``'snapshot'`` when the subscriber
+        fell further behind than the history reaches.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._version > version, timeout):
+                return None
+            if not self._history or self._history[0][0] > version + 1:
+                return self._version, 'snapshot', dict(self._vacancy)
+            merged = {}
+            for entry_version, delta in self._history:
+                if entry_version > version:
+                    merged.update(delta)
+            return self._version, 'delta', merged
+
+    # -- subscriptions -----------------------------------------------------
+
+    def subscribe(self):
+        """Take a stream slot; pair with ``unsubscribe`` when the response closes."""
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                raise FeedFull()
+            self._subscribers += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def stream(self, loader, heartbeat=15.0, lifetime=300.0):
+        """Yield SSE frames: one snapshot, then deltas, with comment heartbeats.
+
+        Streams end after ``lifetime`` seconds and the browser's EventSource
+        reconnects, which spreads long-lived clients across workers again.
+        """
+        version, halls = self.snapshot(loader)
+        yield 'retry: 3000\n' + sse_frame('snapshot', version, halls)
+        deadline = time.monotonic() + lifetime
+        while time.monotonic() < deadline:
+            change = self.wait(version, heartbeat)
+            if change is None:
+                self.refresh(loader)
+                yield ': keepalive\n\n'
+                continue
+            version, kind, halls = change
+            yield sse_frame(kind, version, halls)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                'subscribers': self._subscribers,
+                'max_subscribers': self.max_subscribers,
+                'version': self._version,
+                'halls': len(self._vacancy) if self._vacancy is not None else None,
+            })
+        return data
+
+
+def sse_frame(event, version, halls):
+    return 'event: %s\nid: %d\ndata: %s\n\n' % (event, version, json.dumps(halls, sort_keys=True,
+                                                                           separators=(',', ':')))
@@ -0,0 +1,76 @@
+"""Set-based winner computation.
+
+The winner of an event is its earliest registrant (``registered_at``, then
+email as a tie-breaker; rows registered before ``registered_at`` existed sort
+first).  All events are ranked in one statement and upserted into
+``Winners`` in bulk instead of querying each event separately.
+"""
+
+# {changed} is empty for a full run.  For an incremental run it restricts the
+# ranking to events whose registration count or latest registration differs
+# from what the stored winner was computed from.
+_UPSERT = """
+    WITH {changed}ranked AS (
+        SELECT er.event, er.student_email,
+               ROW_NUMBER() OVER (PARTITION BY er.event
+                                  ORDER BY (er.registered_at IS NOT NULL), er.registered_at,
+                                           er.student_email) AS rn,
+               COUNT(*) OVER (PARTITION BY er.event) AS registrations,
+               MAX(er.registered_at) OVER (PARTITION BY er.event) AS last_registered_at
+        FROM EventRegistration er
+        INNER JOIN Event e ON e.name = er.event
+        {restrict}
+    )
+    INSERT INTO Winners (event, name_par, email, registrations, last_registered_at)
+    SELECT r.event, COALESCE(ep.name, s.name), r.student_email, r.registrations, r.last_registered_at
+    FROM ranked r
+    LEFT JOIN ExternalParticipant ep ON ep.email = r.student_email
+    LEFT JOIN Student s ON s.email = r.student_email
+    WHERE r.rn = 1 AND COALESCE(ep.name, s.name) IS NOT NULL
+    ON CONFLICT (event) DO UPDATE SET
+        name_par = excluded.name_par,
+        email = excluded.email,
+        registrations = excluded.registrations,
+        last_registered_at = excluded.last_registered_at
+"""
+
+_CHANGED = """changed AS (
+        SELECT cur.event
+        FROM (SELECT event, COUNT(*) AS registrations, MAX(registered_at) AS last_registered_at
+              FROM EventRegistration GROUP BY event) cur
+        LEFT JOIN Winners w ON w.event = cur.event
+        WHERE w.event IS NULL
+           OR w.registrations IS NULL
+           OR w.registrations <> cur.registrations
+           OR w.last_registered_at {distinct} cur.last_registered_at
+    ),
+    """
+
+# Events whose last registration was removed no longer have a winner.
+_PRUNE = "DELETE FROM Winners WHERE event NOT IN (SELECT event FROM EventRegistration)"
+
+
+def upsert_sql(is_postgres=False, incremental=False):
+    if not incremental:
+        return _UPSERT.format(changed='', restrict='')
+    changed = _CHANGED.format(distinct='IS DISTINCT FROM' if is_postgres else 'IS NOT')
+    return _UPSERT.format(changed=changed, restrict='WHERE er.event IN (SELECT event FROM changed)')
+
+
+def compute_winners(db, is_postgres=False, incremental=False):
+    """Recompute winners, commit, and return ``[[event, name, email], ...]``.
+
+    With ``incremental`` only events whose registrations changed since the
+    last run are re-ranked.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(upsert_sql(is_postgres, incremental))
+        cursor.execute(_PRUNE)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    cursor.execute("SELECT event, name_par, email FROM Winners ORDER BY event")
+    return [[row['event'], row['name_par'], row['email']] for row in cursor.fetchall()]